@@ -0,0 +1,121 @@
+"""
+Compare the vectorized batch board renderer against drawing each board with one
+``Image.paste()`` per square (how ``render_board_png()`` used to work), at the board
+sizes the bot sends.
+
+Positions come from seeded random games, so every frame is a realistic, different
+position and no cache is involved. "composite" times only building the pixels;
+"png" also includes encoding each frame.
+
+    python -m benchmarks.bench_board_rendering --n-positions 500
+"""
+
+import uvmcc.board_renderer as BR
+
+from typing import List
+
+import argparse
+import io
+import random
+import time
+
+import chess
+import numpy as np
+from PIL import Image
+
+
+def make_positions(n: int, *, seed: int = 0) -> List[BR.BoardPositionT]:
+    rng = random.Random(seed)
+    positions = []
+    board = chess.Board()
+    while len(positions) < n:
+        if board.is_game_over() or board.ply() > 120:
+            board = chess.Board()
+        move = rng.choice(list(board.legal_moves))
+        board.push(move)
+        positions.append((board.copy(stack=False), move.uci()))
+    return positions
+
+
+def scaled_sprites(size: int):
+    square_px = size // 8
+    return {symbol: sprite.resize((square_px, square_px), Image.LANCZOS)
+            for symbol, sprite in BR._load_sprites().items()}
+
+
+def paste_composite(board: chess.BaseBoard, last_move_uci: str | None, size: int, sprites) -> Image.Image:
+    """ Reference renderer: one ``paste()`` for each square and each piece. """
+    square_px = size // 8
+
+    highlighted = set()
+    if last_move_uci is not None:
+        move = chess.Move.from_uci(last_move_uci)
+        highlighted = {move.from_square, move.to_square}
+
+    img = Image.new('RGB', (square_px * 8, square_px * 8))
+    for square in chess.SQUARES:
+        file = chess.square_file(square)
+        rank = chess.square_rank(square)
+        x, y = file * square_px, (7 - rank) * square_px
+
+        is_light = (file + rank) % 2 == 1
+        if square in highlighted:
+            color = BR.LIGHT_LAST_MOVE_COLOR if is_light else BR.DARK_LAST_MOVE_COLOR
+        else:
+            color = BR.LIGHT_SQUARE_COLOR if is_light else BR.DARK_SQUARE_COLOR
+        img.paste(color, (x, y, x + square_px, y + square_px))
+
+        piece = board.piece_at(square)
+        if piece is not None:
+            sprite = sprites[piece.symbol()]
+            img.paste(sprite, (x, y), sprite)
+    return img
+
+
+def bench_paste(positions: List[BR.BoardPositionT], size: int, *, encode: bool) -> float:
+    sprites = scaled_sprites(size)
+    t0 = time.perf_counter()
+    for board, last_move_uci in positions:
+        img = paste_composite(board, last_move_uci, size, sprites)
+        if encode:
+            img.save(io.BytesIO(), format='PNG', compress_level=BR.PNG_COMPRESS_LEVEL)
+    return time.perf_counter() - t0
+
+
+def bench_vectorized(positions: List[BR.BoardPositionT], size: int, *, encode: bool) -> float:
+    BR._square_atlas(size // 8)
+    t0 = time.perf_counter()
+    if encode:
+        BR.render_boards(positions, size=size)
+    else:
+        for start in range(0, len(positions), BR.RENDER_CHUNK_SIZE):
+            chunk = positions[start:start + BR.RENDER_CHUNK_SIZE]
+            layouts = np.stack([BR.board_layout(board) for board, _ in chunk])
+            BR.composite_boards(layouts, np.zeros_like(layouts, dtype=bool), size=size)
+    return time.perf_counter() - t0
+
+
+def report(name: str, n: int, elapsed_s: float):
+    print(f'{name:<32} {n / elapsed_s:>8.1f} FPS   {elapsed_s / n * 1e3:>7.2f} ms/frame')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-positions', type=int, default=500)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[360, 500])
+    args = parser.parse_args()
+
+    positions = make_positions(args.n_positions)
+    print(f'{args.n_positions} positions\n')
+
+    for size in args.sizes:
+        print(f'{size}px ({BR.board_image_size(size)}px image)')
+        for encode in (False, True):
+            stage = 'png' if encode else 'composite'
+            report(f'  paste per square: {stage}', len(positions), bench_paste(positions, size, encode=encode))
+            report(f'  vectorized batch: {stage}', len(positions), bench_vectorized(positions, size, encode=encode))
+        print()
+
+
+if __name__ == '__main__':
+    main()
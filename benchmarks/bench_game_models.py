@@ -0,0 +1,90 @@
+"""
+Compare the memory held by live games and game stream packets as the parsed JSON dicts
+the bot used to keep, against the ``LM`` models it keeps now.
+
+Games are shaped like ``L.CLIENT.export_multi()`` returns them (random blitz/bullet games
+from the stand-in fixture, with all of their SAN ``moves`` and ``datetime`` timestamps), and
+decoded fresh from JSON for each side so nothing is shared with the fixture. Only what's
+still alive once the dicts are dropped counts, measured with ``tracemalloc``.
+
+    python -m benchmarks.bench_game_models --n-games 1000
+"""
+
+import uvmcc.lichess_api as L
+import uvmcc.lichess_models as LM
+from benchmarks.lichess_stand_in import make_fixture
+
+from typing import Any, Callable, Dict, List
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+import chess
+import orjson
+
+
+def decode_games(game_lines: List[bytes]) -> List[Dict[str, Any]]:
+    """ Like ``L.CLIENT.export_multi()`` does for every line of the export. """
+    return [L._convert_timestamps(orjson.loads(line), 'createdAt', 'lastMoveAt') for line in game_lines]
+
+
+def make_move_lines(n: int) -> List[bytes]:
+    board = chess.Board()
+    lines = []
+    for i in range(n):
+        if board.is_game_over():
+            board.reset()
+        move = next(iter(board.legal_moves))
+        board.push(move)
+        lines.append(orjson.dumps({'fen': board.fen(), 'lm': move.uci(), 'wc': 180 - i % 180, 'bc': 180 - i % 170}))
+    return lines
+
+
+def measure(build: Callable[[], List[Any]]) -> tuple[List[Any], int, float]:
+    """ Bytes still allocated by what ``build()`` returns (and how long it took). """
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kept, size, elapsed
+
+
+def report(name: str, n: int, size: int, elapsed: float, *, baseline: int | None = None):
+    ratio = f'{size / baseline:>6.1%} of dicts' if baseline else ''
+    print(f'{name:<34} {size / 1024:>9.1f} KB  {size / n:>7.0f} B/object  '
+          f'{elapsed / n * 1e6:>6.1f} us/object  {ratio}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-games', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    fixture = make_fixture(args.n_games, n_playing=args.n_games, seed=args.seed)
+    game_lines = [orjson.dumps({k: v for k, v in g.items() if k != 'startedAtTurn'}) for g in fixture['games']]
+    move_lines = make_move_lines(args.n_games)
+    print(f'{args.n_games} live games ({sum(map(len, game_lines)) / args.n_games:.0f} B of JSON each) '
+          f'and {args.n_games} stream move packets\n')
+
+    dicts, dicts_size, elapsed = measure(lambda: decode_games(game_lines))
+    report('live games as dicts', args.n_games, dicts_size, elapsed)
+    models, models_size, elapsed = measure(lambda: [LM.LiveGame.from_json(g) for g in decode_games(game_lines)])
+    report('live games as LM.LiveGame', args.n_games, models_size, elapsed, baseline=dicts_size)
+    assert [m.id for m in models] == [d['id'] for d in dicts]
+
+    packets, packets_size, elapsed = measure(lambda: [orjson.loads(line) for line in move_lines])
+    report('move packets as dicts', args.n_games, packets_size, elapsed)
+    moves, moves_size, elapsed = measure(lambda: [LM.GameMove.from_json(orjson.loads(line)) for line in move_lines])
+    report('move packets as LM.GameMove', args.n_games, moves_size, elapsed, baseline=packets_size)
+    assert [m.fen for m in moves] == [p['fen'] for p in packets]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Replay a recorded Lichess bullet game stream (``/api/stream/game/{id}``) through the
+packet parsing path of ``RSM.ResumableGameStream``, before and after switching to the
+chunked ``orjson`` decoder.
+
+- before: iterate the ``aiohttp.StreamReader`` line by line, ``ndjson.loads(line)[0]``
+  each packet, and fix fullmove numbers with ``FenUtils``
+- after: ``NdjsonDecoder`` over ``StreamReader.iter_any()`` chunks, labelled by
+  ``RSM.ResumableGameStream``
+
+Both read the same bytes from a real ``StreamReader``, split into TCP-sized chunks.
+By default a bullet game stream is synthesized (1+0, a few hundred plies, half of them
+already played when the stream starts). Pass ``--recording`` to replay the raw bytes of
+a real stream instead, ex. saved with
+``curl https://lichess.org/api/stream/game/<id> > game.ndjson``.
+
+    python -m benchmarks.bench_ndjson_stream --n-streams 200
+"""
+
+import uvmcc.FenUtils as F
+import uvmcc.ndjson_stream as NJ
+import uvmcc.resumable_stream as RSM
+
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+import aiohttp
+import argparse
+import asyncio
+import ndjson
+import orjson
+import random
+import time
+
+import chess
+
+
+def make_bullet_stream(*, seed: int = 0, n_plies: int = 300, already_played: int = 150) -> bytes:
+    """ Bytes shaped like a Lichess game stream for a 1+0 game, including the fullmove bug. """
+    rng = random.Random(seed)
+    board = chess.Board()
+    positions = []
+    while len(positions) < n_plies and not board.is_game_over():
+        move = rng.choice(list(board.legal_moves))
+        board.push(move)
+        positions.append((board.fen(), move.uci()))
+
+    players = {'white': {'user': {'name': 'Bullet1', 'id': 'bullet1'}, 'rating': 2801},
+               'black': {'user': {'name': 'Bullet2', 'id': 'bullet2'}, 'rating': 2779}}
+    start_fen, start_lm = positions[already_played - 1]
+    info = {'id': 'rEcOrDeD', 'variant': {'key': 'standard', 'name': 'Standard', 'short': 'Std'},
+            'speed': 'bullet', 'perf': 'bullet', 'rated': True, 'initialFen': 'startpos',
+            'fen': start_fen, 'player': 'white', 'turns': already_played, 'startedAtTurn': 0,
+            'source': 'pool', 'status': {'id': 20, 'name': 'started'}, 'createdAt': 1687000000000,
+            'lastMove': start_lm, 'players': players}
+
+    lines = [info]
+    clock = 60.0
+    for ply, (fen, lm) in enumerate(positions):
+        if ply < already_played:
+            fen = fen.rsplit(' ', 1)[0] + ' 1'
+        clock = max(0.0, clock - rng.uniform(0.05, 0.5) * (ply % 2))
+        lines.append({'fen': fen, 'lm': lm, 'wc': int(clock), 'bc': int(clock)})
+        if ply % 40 == 0:
+            lines.append(None)  # keep-alive
+
+    end_fen, end_lm = positions[-1]
+    lines.append({**info, 'fen': end_fen, 'lastMove': end_lm, 'turns': len(positions),
+                  'status': {'id': 35, 'name': 'outoftime'}, 'winner': 'white',
+                  'players': {c: {**p, 'ratingDiff': 5 if c == 'white' else -5} for c, p in players.items()}})
+
+    return b''.join(b'\n' if line is None else orjson.dumps(line) + b'\n' for line in lines)
+
+
+def split_chunks(data: bytes, *, seed: int = 0, max_chunk: int = 1460) -> List[bytes]:
+    """ Split ``data`` the way it might arrive over TCP: arbitrary sizes, cutting lines anywhere. """
+    rng = random.Random(seed)
+    chunks, i = [], 0
+    while i < len(data):
+        n = rng.randint(1, max_chunk)
+        chunks.append(data[i:i + n])
+        i += n
+    return chunks
+
+
+class _Protocol:
+    """ Just enough of ``aiohttp.BaseProtocol`` for a ``StreamReader`` that's never paused. """
+    _reading_paused = False
+
+    def pause_reading(self):
+        pass
+
+    def resume_reading(self):
+        pass
+
+
+def make_reader(chunks: List[bytes]) -> aiohttp.StreamReader:
+    reader = aiohttp.StreamReader(_Protocol(), 2 ** 30, loop=asyncio.get_running_loop())
+    for chunk in chunks:
+        reader.feed_data(chunk)
+    reader.feed_eof()
+    return reader
+
+
+async def before(reader: aiohttp.StreamReader) -> AsyncIterator[Tuple[Dict[str, Any], bool | None]]:
+    """ The parsing path game streams used to take. """
+    actual_current_fullmove_num = 0
+    past_already_played_moves = False
+    i = 0
+    async for line in reader:
+        if not line.strip():
+            continue
+        packet = ndjson.loads(line)[0]
+        i += 1
+        if i == 1:
+            yield packet, None
+            continue
+        elif 'id' in packet:
+            yield packet, None
+            break
+
+        if past_already_played_moves:
+            yield packet, True
+            continue
+
+        fen = packet['fen']
+        if F.FenUtils.get_component(fen, F.FenComponent.FULLMOVE_NUM, validate=False) != '1':
+            past_already_played_moves = True
+            continue
+
+        if F.FenUtils.get_component(fen, F.FenComponent.ACTIVE_COLOR, validate=False) == 'w':
+            actual_current_fullmove_num += 1
+
+        idx = F.FenUtils.index_of_component_start(fen, F.FenComponent.FULLMOVE_NUM, validate=False)
+        packet['fen'] = fen[:idx] + str(actual_current_fullmove_num)
+
+        yield packet, False
+
+
+async def after(reader: aiohttp.StreamReader) -> AsyncIterator[RSM.StreamItemT]:
+    stream = RSM.ResumableGameStream('rEcOrDeD', packets_factory=lambda _: NJ.iter_ndjson(reader.iter_any()))
+    async for item in stream:
+        yield item
+
+
+async def run(parse, chunks: List[bytes], n_streams: int) -> Tuple[float, List]:
+    readers = [make_reader(chunks) for _ in range(n_streams)]
+    items = []
+    t0 = time.perf_counter()
+    for reader in readers:
+        items = [item async for item in parse(reader)]
+    return time.perf_counter() - t0, items
+
+
+async def main_async(args):
+    if args.recording:
+        with open(args.recording, 'rb') as f:
+            data = f.read()
+    else:
+        data = make_bullet_stream()
+    chunks = split_chunks(data)
+    n_lines = data.count(b'\n')
+    print(f'{len(data) / 1024:.1f} KB stream, {n_lines} lines in {len(chunks)} chunks, '
+          f'replayed {args.n_streams} times\n')
+
+    results = {}
+    for name, parse in (('before (lines + ndjson)', before), ('after (chunks + orjson)', after)):
+        elapsed, items = await run(parse, chunks, args.n_streams)
+        results[name] = items
+        n_packets = len(items) * args.n_streams
+        print(f'{name:<26} {n_packets / elapsed:>12,.0f} packets/s   '
+              f'{elapsed / n_packets * 1e6:>6.2f} us/packet')
+
+    # The old path numbered already-played moves one fullmove short and dropped the first new one,
+    # so only compare the final position and the new moves it did yield
+    before_items, after_items = results.values()
+    before_new = [p['fen'] for p, is_new in before_items if is_new]
+    after_new = [p.fen for p, is_new in after_items if is_new]
+    assert before_items[-1][0]['fen'] == after_items[-1][0].fen, 'Parsers disagree!'
+    assert after_new[len(after_new) - len(before_new):] == before_new, 'Parsers disagree!'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-streams', type=int, default=200)
+    parser.add_argument('--recording', help='Raw NDJSON bytes of a recorded game stream')
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
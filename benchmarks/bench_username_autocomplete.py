@@ -0,0 +1,141 @@
+"""
+Compare ``UsernamePrefixIndex`` against the SQL ``LIKE 'x%'`` lookups that the
+username autocomplete callbacks used to make.
+
+By default the SQL side runs against an in-memory SQLite table. Pass
+``--database-url`` (or set ``DATABASE_URL``) to time the real ``db_query()`` path
+against PostgreSQL instead; a scratch ``bench_chess_usernames`` table is created
+and dropped.
+
+    python -m benchmarks.bench_username_autocomplete --n-usernames 10000
+"""
+
+from uvmcc.prefix_index import UsernamePrefixIndex
+
+from typing import List, Tuple
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import string
+import time
+
+
+def make_usernames(n: int, *, seed: int = 0) -> List[Tuple[str, str]]:
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + '_-'
+    # Usernames are unique case-insensitively, like the CITEXT primary key
+    usernames = {}
+    while len(usernames) < n:
+        username = ''.join(rng.choices(alphabet, k=rng.randint(3, 20)))
+        usernames[username.lower()] = username
+    return [(u, rng.choice(['lichess.org', 'chess.com'])) for u in usernames.values()]
+
+
+def make_prefixes(entries: List[Tuple[str, str]], n: int, *, seed: int = 1) -> List[str]:
+    """ Prefixes of real usernames, like someone typing one character at a time. """
+    rng = random.Random(seed)
+    prefixes = []
+    for _ in range(n):
+        username, _site = rng.choice(entries)
+        prefixes.append(username[:rng.randint(1, min(5, len(username)))])
+    return prefixes
+
+
+def report(name: str, timings_s: List[float]):
+    timings_us = sorted(t * 1e6 for t in timings_s)
+    p99 = timings_us[int(len(timings_us) * 0.99) - 1]
+    print(f'{name:<28} mean {statistics.fmean(timings_us):>10.1f} us   '
+          f'p50 {statistics.median(timings_us):>10.1f} us   p99 {p99:>10.1f} us')
+
+
+def bench_prefix_index(entries, prefixes, limit: int):
+    index = UsernamePrefixIndex(entries)
+    complete_timings, sites_timings = [], []
+    for prefix in prefixes:
+        t0 = time.perf_counter()
+        matches = index.complete(prefix, limit=limit)
+        t1 = time.perf_counter()
+        index.sites(matches[0] if matches else prefix)
+        t2 = time.perf_counter()
+        complete_timings.append(t1 - t0)
+        sites_timings.append(t2 - t1)
+    report('prefix index: complete', complete_timings)
+    report('prefix index: sites', sites_timings)
+
+
+def bench_sqlite(entries, prefixes, limit: int):
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE chess_usernames (username TEXT COLLATE NOCASE PRIMARY KEY, site TEXT)')
+    conn.executemany('INSERT INTO chess_usernames VALUES (?, ?)', entries)
+
+    complete_timings, sites_timings = [], []
+    for prefix in prefixes:
+        t0 = time.perf_counter()
+        matches = conn.execute('SELECT username FROM chess_usernames WHERE username LIKE ? LIMIT ?',
+                               (f'{prefix}%', limit)).fetchall()
+        t1 = time.perf_counter()
+        conn.execute('SELECT site FROM chess_usernames WHERE username = ?',
+                     (matches[0][0] if matches else prefix,)).fetchall()
+        t2 = time.perf_counter()
+        complete_timings.append(t1 - t0)
+        sites_timings.append(t2 - t1)
+    report('sqlite (in-memory): LIKE', complete_timings)
+    report('sqlite (in-memory): sites', sites_timings)
+
+
+async def bench_postgres(entries, prefixes, limit: int, db_url: str):
+    import uvmcc.database_utils as D
+
+    async def timed(query: str, params) -> Tuple[float, list]:
+        t0 = time.perf_counter()
+        _, results = await D.db_query(query, params=params, db_url=db_url)
+        return time.perf_counter() - t0, results
+
+    await D.db_query('CREATE TABLE bench_chess_usernames (username CITEXT PRIMARY KEY, site CITEXT)',
+                     db_url=db_url)
+    try:
+        pool = await D.get_db_pool(db_url)
+        async with pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany('INSERT INTO bench_chess_usernames VALUES (%s, %s)', entries)
+
+        complete_timings, sites_timings = [], []
+        for prefix in prefixes:
+            t, matches = await timed('SELECT username FROM bench_chess_usernames WHERE username LIKE %s LIMIT %s',
+                                     (f'{prefix}%', limit))
+            complete_timings.append(t)
+            t, _ = await timed('SELECT site FROM bench_chess_usernames WHERE username = %s',
+                               (matches[0][0] if matches else prefix,))
+            sites_timings.append(t)
+        report('postgres db_query(): LIKE', complete_timings)
+        report('postgres db_query(): sites', sites_timings)
+    finally:
+        await D.db_query('DROP TABLE bench_chess_usernames', db_url=db_url)
+        await D.close_db_pools()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-usernames', type=int, default=10_000)
+    parser.add_argument('--n-lookups', type=int, default=2_000)
+    parser.add_argument('--limit', type=int, default=25)
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    args = parser.parse_args()
+
+    entries = make_usernames(args.n_usernames)
+    prefixes = make_prefixes(entries, args.n_lookups)
+    print(f'{args.n_usernames} usernames, {args.n_lookups} lookups, limit {args.limit}\n')
+
+    bench_prefix_index(entries, prefixes, args.limit)
+    if args.database_url:
+        asyncio.run(bench_postgres(entries, prefixes, args.limit, args.database_url))
+    else:
+        bench_sqlite(entries, prefixes, args.limit)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,495 @@
+"""
+Local stand-in for the parts of the Lichess API the bot uses, so commands can be
+load-tested offline and reproducibly:
+
+- ``GET  /api/users/status``          realtime statuses (``ids``, ``withGameIds``)
+- ``POST /api/games/export/_ids``     multi-game export (NDJSON)
+- ``GET  /api/stream/game/{id}``      game move stream (NDJSON)
+- ``POST /api/stream/games-by-users`` games starting/finishing (NDJSON)
+- ``GET  /api/tv/channels``           current TV games
+- ``GET  /api/player/autocomplete``   username autocomplete
+- ``GET  /api/user/{username}``       public profile
+- ``POST /api/users``                 public profiles by id
+
+plus ``GET /_stand_in/stats`` with the number of requests served per endpoint.
+
+Users and games come from a fixture: a JSON file with ``users`` (profiles as
+``/api/user`` returns them, plus ``online`` and an optional ``playingId``) and ``games``
+(as the export returns them, with all of their SAN ``moves``). Use ``record`` to save one
+from real Lichess usernames, or let the server generate a random roster. Games are
+replayed as if they were live: every game moves forward one ply per ``--move-interval``
+seconds from where it was recorded, and starts over once it's finished.
+
+Every response can be delayed (``--latency-ms`` +/- ``--jitter-ms``) and a fraction of
+requests answered with 429 Too Many Requests (``--rate-limit-rate``). Game streams can
+also be cut off mid-game, after any move (``--stream-drop-rate``).
+
+    python -m benchmarks.lichess_stand_in serve --n-users 200 --port 8765
+    LICHESS_BASE_URL=http://127.0.0.1:8765 python -m uvmcc.bot
+
+    python -m benchmarks.lichess_stand_in record --usernames DrNykterstein Zhigalko_Sergei -o fixture.json
+"""
+
+import uvmcc.lichess_api as L
+
+from aiohttp import web
+from typing import Any, Dict, List, Tuple
+
+import argparse
+import asyncio
+import collections
+import datetime
+import hashlib
+import json
+import random
+import string
+import time
+
+import chess
+import orjson
+
+
+def _millis(dt: datetime.datetime | int) -> int:
+    return dt if isinstance(dt, int) else int(dt.timestamp() * 1000)
+
+
+def make_fixture(n_users: int, *, n_playing: int | None = None, seed: int = 0) -> Dict[str, Any]:
+    """
+    Generate a roster of ``n_users`` users, ``n_playing`` of them (half by default) in
+    random blitz/bullet games against outside opponents.
+    """
+    rng = random.Random(seed)
+    n_playing = n_users // 2 if n_playing is None else n_playing
+    now_ms = int(time.time() * 1000)
+
+    users, games = [], []
+    for i in range(n_users):
+        name = f'{rng.choice(string.ascii_uppercase)}{"".join(rng.choices(string.ascii_lowercase, k=6))}{i}'
+        user = {'id': name.lower(), 'username': name, 'online': rng.random() < 0.5,
+                'createdAt': now_ms - rng.randint(10 ** 9, 10 ** 11), 'seenAt': now_ms - rng.randint(0, 10 ** 7),
+                'profile': {'bio': f'UVM chess club member #{i}'},
+                'perfs': {'blitz': {'rating': rng.randint(800, 2800), 'games': rng.randint(0, 5000)}}}
+        users.append(user)
+
+        if i < n_playing:
+            board = chess.Board()
+            sans = []
+            n_plies = rng.randint(20, 160)
+            while len(sans) < n_plies and not board.is_game_over():
+                move = rng.choice(list(board.legal_moves))
+                sans.append(board.san(move))
+                board.push(move)
+
+            opponent = {'name': f'Opponent{i}', 'id': f'opponent{i}'}
+            me = {'name': name, 'id': name.lower()}
+            white, black = (me, opponent) if i % 2 == 0 else (opponent, me)
+            initial, increment = rng.choice([(60, 0), (180, 0), (180, 2), (300, 3)])
+            game = {'id': f'g{i:07d}', 'rated': True, 'variant': 'standard',
+                    'speed': 'bullet' if initial < 180 else 'blitz', 'perf': 'bullet' if initial < 180 else 'blitz',
+                    'createdAt': now_ms - 60_000, 'lastMoveAt': now_ms, 'status': 'started',
+                    'players': {'white': {'user': white, 'rating': rng.randint(800, 2800)},
+                                'black': {'user': black, 'rating': rng.randint(800, 2800)}},
+                    'moves': ' '.join(sans),
+                    'clock': {'initial': initial, 'increment': increment, 'totalTime': initial + 40 * increment},
+                    'startedAtTurn': rng.randint(0, len(sans) // 2)}
+            user['online'] = True
+            user['playingId'] = game['id']
+            games.append(game)
+
+    return {'users': users, 'games': games}
+
+
+async def record_fixture(usernames: List[str]) -> Dict[str, Any]:
+    """ Record a fixture from the real Lichess profiles of ``usernames`` and any games they're playing. """
+    client = L.LichessClient()
+    try:
+        statuses = {s['id']: s for s in await client.get_realtime_statuses(*usernames, with_game_ids=True)}
+        games = await client.export_multi(*(s['playingId'] for s in statuses.values() if s.get('playingId')))
+        users = []
+        for user_id, status in statuses.items():
+            user = await client.get_public_data(user_id)
+            user = {k: _millis(v) if isinstance(v, datetime.datetime) else v for k, v in user.items()}
+            users.append({**user, 'online': status.get('online', False), 'playingId': status.get('playingId')})
+    finally:
+        await client.close()
+
+    return {'users': users,
+            'games': [{**g, 'createdAt': _millis(g['createdAt']), 'lastMoveAt': _millis(g['lastMoveAt']),
+                       'startedAtTurn': len(g.get('moves', '').split())}
+                      for g in games]}
+
+
+class _ReplayedGame:
+    """ A fixture game, moving one ply every ``move_interval`` seconds and restarting when it's over. """
+
+    def __init__(self, game_json: Dict[str, Any], *, started_at: float, move_interval: float):
+        self.json = game_json
+        self.started_at = started_at
+        self.move_interval = move_interval
+
+        # (fen, uci) after each ply
+        board = chess.Board()
+        self.positions: List[Tuple[str, str]] = []
+        for san in game_json.get('moves', '').split():
+            move = board.push_san(san)
+            self.positions.append((board.fen(), move.uci()))
+        self.final_board = board
+        self.start_ply = min(game_json.get('startedAtTurn', 0), len(self.positions))
+
+    @property
+    def n_plies(self) -> int:
+        return len(self.positions)
+
+    @property
+    def cycle_plies(self) -> int:
+        """ Finished games stay over for one move interval, then start over. """
+        return self.n_plies + 2
+
+    def plies_since_start(self, now: float) -> int:
+        """ Plies played at ``now`` counting every restart, i.e. not wrapped to ``cycle_plies``. """
+        return self.start_ply + int((now - self.started_at) / self.move_interval)
+
+    def ply_at(self, now: float) -> int:
+        """ Plies played in the current run of the game at ``now``. """
+        return self.plies_since_start(now) % self.cycle_plies
+
+    def time_of(self, plies_since_start: int) -> float:
+        """ When the game reaches ``plies_since_start`` (see ``plies_since_start()``). """
+        return self.started_at + (plies_since_start - self.start_ply) * self.move_interval
+
+    def is_over(self, ply: int) -> bool:
+        return ply >= self.n_plies
+
+    def fen(self, ply: int) -> str:
+        return self.positions[min(ply, self.n_plies) - 1][0] if ply else chess.STARTING_FEN
+
+    def last_move(self, ply: int) -> str | None:
+        return self.positions[min(ply, self.n_plies) - 1][1] if ply else None
+
+    def result(self) -> Dict[str, Any]:
+        if self.final_board.is_checkmate():
+            return {'status': 'mate', 'status_id': 30, 'winner': chess.COLOR_NAMES[not self.final_board.turn]}
+        # The side to move flagged
+        return {'status': 'outoftime', 'status_id': 35, 'winner': chess.COLOR_NAMES[not self.final_board.turn]}
+
+    def export_json(self, ply: int, *, moves: bool) -> Dict[str, Any]:
+        game = {k: v for k, v in self.json.items() if k not in ('moves', 'startedAtTurn')}
+        if moves:
+            game['moves'] = ' '.join(self.json.get('moves', '').split()[:min(ply, self.n_plies)])
+        if self.is_over(ply):
+            result = self.result()
+            game['status'] = result['status']
+            game['winner'] = result['winner']
+        return game
+
+    def stream_info(self, ply: int) -> Dict[str, Any]:
+        """ The first and last lines of a game stream. """
+        info = {'id': self.json['id'],
+                'variant': {'key': 'standard', 'name': 'Standard', 'short': 'Std'},
+                'speed': self.json.get('speed'), 'perf': self.json.get('perf'), 'rated': self.json.get('rated'),
+                'initialFen': 'startpos', 'fen': self.fen(ply), 'player': chess.COLOR_NAMES[ply % 2 == 0],
+                'turns': min(ply, self.n_plies), 'startedAtTurn': 0, 'source': 'pool',
+                'status': {'id': 20, 'name': 'started'}, 'createdAt': self.json.get('createdAt'),
+                'players': self.json['players']}
+        if ply:
+            info['lastMove'] = self.last_move(ply)
+        if self.is_over(ply):
+            result = self.result()
+            info['status'] = {'id': result['status_id'], 'name': result['status']}
+            info['winner'] = result['winner']
+            info['players'] = {c: {**p, 'ratingDiff': 5 if c == result['winner'] else -5}
+                               for c, p in self.json['players'].items()}
+        return info
+
+    def started_or_finished_packet(self, ply: int) -> Dict[str, Any]:
+        """ A line of the games-by-users stream. """
+        packet = {k: self.json.get(k) for k in ('id', 'rated', 'variant', 'speed', 'perf', 'createdAt', 'clock')}
+        packet['players'] = {c: {'userId': p['user']['id'], 'rating': p['rating']}
+                             for c, p in self.json['players'].items()}
+        if self.is_over(ply):
+            result = self.result()
+            packet.update(status=result['status_id'], statusName=result['status'], winner=result['winner'])
+        else:
+            packet.update(status=20, statusName='started')
+        return packet
+
+    def move_packet(self, ply: int, *, already_played: bool) -> Dict[str, Any]:
+        fen, uci = self.positions[ply - 1]
+        if already_played:
+            # Same bug as Lichess: https://github.com/lichess-org/lila/issues/12907
+            fen = fen.rsplit(' ', 1)[0] + ' 1'
+        clock = self.json.get('clock', {}).get('initial', 180)
+        return {'fen': fen, 'lm': uci, 'wc': clock, 'bc': clock}
+
+
+class LichessStandIn:
+    """ An ``aiohttp`` app serving a fixture like Lichess would. See the module docstring. """
+
+    def __init__(self,
+                 fixture: Dict[str, Any],
+                 *,
+                 latency_ms: float = 0,
+                 jitter_ms: float = 0,
+                 rate_limit_rate: float = 0,
+                 stream_drop_rate: float = 0,
+                 move_interval: float = 1.0,
+                 seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_rate = rate_limit_rate
+        self.stream_drop_rate = stream_drop_rate
+        self.stats: collections.Counter = collections.Counter()
+        self._rng = random.Random(seed)
+
+        now = time.monotonic()
+        self.users = {u['id'].lower(): u for u in fixture['users']}
+        self.games = {g['id']: _ReplayedGame(g, started_at=now, move_interval=move_interval)
+                      for g in fixture['games']}
+        self._runner: web.AppRunner | None = None
+        # Handlers of streams that are still open
+        self._streaming: set = set()
+        # Game id -> ``plies_since_start`` its replay run began at, for game streams that were
+        # dropped, so reconnecting picks up the same run instead of whichever one is playing now
+        self._dropped_runs: Dict[str, int] = {}
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._latency_and_rate_limits])
+        app.router.add_get('/api/users/status', self._users_status)
+        app.router.add_post('/api/games/export/_ids', self._export_ids)
+        app.router.add_get('/api/stream/game/{game_id}', self._stream_game)
+        app.router.add_post('/api/stream/games-by-users', self._stream_games_by_users)
+        app.router.add_get('/api/tv/channels', self._tv_channels)
+        app.router.add_get('/api/player/autocomplete', self._autocomplete)
+        app.router.add_get('/api/user/{username}', self._user)
+        app.router.add_post('/api/users', self._users)
+        app.router.add_get('/_stand_in/stats', self._stats)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """ Serve in the background and return the base URL (``port=0`` picks a free port). """
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        return f'http://{host}:{port}'
+
+    async def stop(self):
+        for task in self._streaming:
+            task.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def _game_for(self, user: Dict[str, Any]) -> Tuple[_ReplayedGame | None, int]:
+        game = self.games.get(user.get('playingId'))
+        if game is None:
+            return None, 0
+        return game, game.ply_at(time.monotonic())
+
+    @web.middleware
+    async def _latency_and_rate_limits(self, request: web.Request, handler):
+        if request.path.startswith('/_stand_in/'):
+            return await handler(request)
+
+        self.stats[request.match_info.route.resource.canonical if request.match_info.route.resource else 'unknown'] += 1
+        delay_ms = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+
+        if self._rng.random() < self.rate_limit_rate:
+            self.stats['429'] += 1
+            raise web.HTTPTooManyRequests(text='Too many requests. Try again later.')
+        return await handler(request)
+
+    async def _users_status(self, request: web.Request) -> web.Response:
+        with_game_ids = request.query.get('withGameIds') == 'true'
+        statuses = []
+        for user_id in request.query.get('ids', '').split(','):
+            user = self.users.get(user_id.lower())
+            if user is None:
+                continue
+            status = {'id': user['id'], 'name': user['username']}
+            if user.get('title'):
+                status['title'] = user['title']
+            if user.get('online'):
+                status['online'] = True
+            game, ply = self._game_for(user)
+            if game is not None and not game.is_over(ply):
+                status['playing'] = True
+                if with_game_ids:
+                    status['playingId'] = game.json['id']
+            statuses.append(status)
+        return web.json_response(statuses)
+
+    async def _export_ids(self, request: web.Request) -> web.Response:
+        moves = request.query.get('moves', 'true') == 'true'
+        now = time.monotonic()
+        lines = []
+        for game_id in (await request.text()).split(','):
+            game = self.games.get(game_id.strip())
+            if game is not None:
+                lines.append(orjson.dumps(game.export_json(game.ply_at(now), moves=moves)))
+        return web.Response(body=b'\n'.join(lines) + b'\n', content_type='application/x-ndjson')
+
+    async def _stream_game(self, request: web.Request) -> web.StreamResponse:
+        game = self.games.get(request.match_info['game_id'])
+        if game is None:
+            raise web.HTTPNotFound()
+
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+
+        plies_since_start = game.plies_since_start(time.monotonic())
+        run_started_at_ply = self._dropped_runs.pop(game.json['id'], None)
+        if run_started_at_ply is None:
+            run_started_at_ply = plies_since_start - plies_since_start % game.cycle_plies
+        # A real game doesn't start over, so one that ended while the client was away stays over
+        ply = min(plies_since_start - run_started_at_ply, game.n_plies)
+        await response.write(orjson.dumps(game.stream_info(ply)) + b'\n')
+        if game.is_over(ply):
+            return response
+
+        await response.write(b''.join(orjson.dumps(game.move_packet(p, already_played=True)) + b'\n'
+                                      for p in range(1, ply + 1)))
+        while ply < game.n_plies:
+            ply += 1
+            await asyncio.sleep(max(0.0, game.time_of(run_started_at_ply + ply) - time.monotonic()))
+            await response.write(orjson.dumps(game.move_packet(ply, already_played=False)) + b'\n')
+            if self._rng.random() < self.stream_drop_rate:
+                self.stats['dropped_streams'] += 1
+                self._dropped_runs[game.json['id']] = run_started_at_ply
+                request.transport.close()
+                return response
+
+        await response.write(orjson.dumps(game.stream_info(ply)) + b'\n')
+        return response
+
+    async def _stream_games_by_users(self, request: web.Request) -> web.StreamResponse:
+        user_ids = {u.strip().lower() for u in (await request.text()).split(',')}
+        games = {u['playingId']: self.games[u['playingId']] for k, u in self.users.items()
+                 if k in user_ids and u.get('playingId') in self.games}
+
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        self._streaming.add(asyncio.current_task())
+
+        # Game id -> whether it's being played, as of the last packet sent for it
+        now = time.monotonic()
+        is_live = {game_id: not game.is_over(game.ply_at(now)) for game_id, game in games.items()}
+        if request.query.get('withCurrentGames') == 'true':
+            await response.write(b''.join(orjson.dumps(game.started_or_finished_packet(game.ply_at(now))) + b'\n'
+                                          for game_id, game in games.items() if is_live[game_id]))
+
+        # Replayed games finish and start over, so tell the client whenever that happens
+        try:
+            while request.transport is not None and not request.transport.is_closing():
+                await asyncio.sleep(min((g.move_interval for g in games.values()), default=1.0) / 2)
+                now = time.monotonic()
+                for game_id, game in games.items():
+                    ply = game.ply_at(now)
+                    if is_live[game_id] == game.is_over(ply):
+                        is_live[game_id] = not is_live[game_id]
+                        await response.write(orjson.dumps(game.started_or_finished_packet(ply)) + b'\n')
+        finally:
+            self._streaming.discard(asyncio.current_task())
+        return response
+
+    async def _tv_channels(self, request: web.Request) -> web.Response:
+        channels = {}
+        games = sorted(self.games.values(), key=lambda g: -max(p['rating'] for p in g.json['players'].values()))
+        for channel, game in zip(['Top Rated', 'Bullet', 'Blitz', 'Rapid', 'Classical'], games):
+            color, player = max(game.json['players'].items(), key=lambda cp: cp[1]['rating'])
+            channels[channel] = {'user': player['user'], 'rating': player['rating'],
+                                 'gameId': game.json['id'], 'color': color}
+        return web.json_response(channels)
+
+    async def _autocomplete(self, request: web.Request) -> web.Response:
+        term = request.query.get('term', '').lower()
+        if len(term) < L.LichessClient.AUTOCOMPLETE_MIN_TERM_LENGTH:
+            return web.json_response([])
+        matches = sorted(u['username'] for k, u in self.users.items() if k.startswith(term))
+        return web.json_response(matches[:L.LichessClient.AUTOCOMPLETE_MAX_RESULTS])
+
+    @staticmethod
+    def _public_data(user: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in user.items() if k not in ('online', 'playingId')}
+
+    async def _user(self, request: web.Request) -> web.Response:
+        user = self.users.get(request.match_info['username'].lower())
+        if user is None:
+            raise web.HTTPNotFound()
+        body = orjson.dumps(self._public_data(user))
+        # So the bot's disk cache can revalidate profiles
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if request.headers.get('If-None-Match') == etag:
+            self.stats['304'] += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(body=body, content_type='application/json', headers={'ETag': etag})
+
+    async def _users(self, request: web.Request) -> web.Response:
+        users = (self.users.get(user_id.strip().lower()) for user_id in (await request.text()).split(','))
+        return web.json_response([self._public_data(u) for u in users if u is not None])
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.stats))
+
+
+async def serve(args):
+    if args.fixture:
+        with open(args.fixture) as f:
+            fixture = json.load(f)
+    else:
+        fixture = make_fixture(args.n_users, seed=args.seed)
+
+    stand_in = LichessStandIn(fixture,
+                              latency_ms=args.latency_ms,
+                              jitter_ms=args.jitter_ms,
+                              rate_limit_rate=args.rate_limit_rate,
+                              stream_drop_rate=args.stream_drop_rate,
+                              move_interval=args.move_interval,
+                              seed=args.seed)
+    base_url = await stand_in.start(args.host, args.port)
+    print(f'Serving {len(stand_in.users)} users and {len(stand_in.games)} games at {base_url}\n'
+          f'Run the bot with LICHESS_BASE_URL={base_url}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stand_in.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--fixture', help='JSON fixture (default: generate one)')
+    serve_parser.add_argument('--n-users', type=int, default=100, help='Users to generate without --fixture')
+    serve_parser.add_argument('--latency-ms', type=float, default=50)
+    serve_parser.add_argument('--jitter-ms', type=float, default=20)
+    serve_parser.add_argument('--rate-limit-rate', type=float, default=0, help='Fraction of requests to 429')
+    serve_parser.add_argument('--stream-drop-rate', type=float, default=0,
+                              help='Chance of cutting off a game stream after each move')
+    serve_parser.add_argument('--move-interval', type=float, default=1.0, help='Seconds between moves')
+    serve_parser.add_argument('--seed', type=int, default=0)
+
+    record_parser = subparsers.add_parser('record')
+    record_parser.add_argument('--usernames', nargs='+', required=True)
+    record_parser.add_argument('-o', '--output', required=True)
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+    else:
+        fixture = asyncio.run(record_fixture(args.usernames))
+        with open(args.output, 'w') as f:
+            json.dump(fixture, f, indent=2)
+        print(f'Recorded {len(fixture["users"])} users and {len(fixture["games"])} games to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,468 @@
+"""
+Load-test the real ``Show`` and ``UserManagement`` command callbacks, ramping up how many
+run at once, to find where one worker's event loop starts to fall behind.
+
+Everything external is replaced by a local stand-in:
+
+- Discord: fake ``ApplicationContext`` objects that record when each reply/edit lands
+  (with ``--discord-latency-ms`` per call)
+- Postgres: an in-memory SQLite database behind ``D.db_query()``, or a real database
+  with ``--database-url`` (use a scratch one; the roster is inserted into it)
+- Lichess: ``benchmarks/lichess_stand_in.py``, on its own thread so it doesn't skew the
+  bot's loop lag (or pass ``--lichess-url`` to use one running elsewhere)
+
+For each concurrency level and command, it reports p50/p95/p99 of the time to the first
+response and to the final edit, event loop lag while the commands ran, and upstream
+Lichess/database calls per command.
+
+    python -m benchmarks.load_test --levels 1 10 50 100 --commands show watch add autocomplete
+"""
+
+from benchmarks.lichess_stand_in import LichessStandIn, make_fixture
+import uvmcc.database_utils as D
+import uvmcc.error_msgs as E
+import uvmcc.export_batcher as EB
+import uvmcc.lichess_api as L
+import uvmcc.status_cache as SC
+import uvmcc.presence_poller as PP
+import uvmcc.roster_stream as RS
+import uvmcc.stream_hub as SH
+import uvmcc.username_autocomplete as UA
+import uvmcc.utils as U
+from uvmcc.cogs.Show import Show
+from uvmcc.cogs.UserManagement import UserManagement
+from uvmcc.uvmcc_logging import logger
+
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+import aiohttp
+import aiosqlite
+import argparse
+import asyncio
+import contextlib
+import itertools
+import logging
+import random
+import re
+import sqlite3
+import threading
+import time
+import unittest.mock
+
+
+''' Stand-ins '''
+
+
+class SqliteDatabase:
+    """
+    ``D.db_query()`` backed by an in-memory SQLite database holding the tables the cogs use.
+    Queries are translated from psycopg's dialect (``%s`` placeholders, ``x = ANY(%s)``).
+    """
+
+    SCHEMA = 'CREATE TABLE chess_usernames (' \
+             '    username TEXT COLLATE NOCASE, ' \
+             '    site TEXT COLLATE NOCASE NOT NULL, ' \
+             '    guild_id TEXT, ' \
+             '    discord_id TEXT, ' \
+             '    PRIMARY KEY (username, site)' \
+             ')'
+
+    def __init__(self):
+        self._conn: aiosqlite.Connection | None = None
+        self.queries = 0
+
+    async def open(self):
+        self._conn = await aiosqlite.connect(':memory:')
+        await self._conn.execute(SqliteDatabase.SCHEMA)
+
+    async def close(self):
+        await self._conn.close()
+
+    @staticmethod
+    def _translate(query: str, params: Sequence[Any]) -> Tuple[str, List[Any]]:
+        parts = query.split('%s')
+        translated, flat_params = [parts[0]], []
+        for part, param in zip(parts[1:], params):
+            if isinstance(param, (list, tuple)):
+                # ``x = ANY(%s)`` -> ``x IN (?, ?, ...)``
+                translated[-1] = re.sub(r'=\s*ANY\($', 'IN (', translated[-1])
+                translated.append(', '.join('?' * len(param)) + part)
+                flat_params.extend(param)
+            else:
+                translated.append('?' + part)
+                flat_params.append(param)
+        return ''.join(translated), flat_params
+
+    async def db_query(self,
+                       query: str,
+                       *,
+                       params: Tuple[Any, ...] = None,
+                       db_url: str = None,
+                       auto_respond_on_fail=None) -> Tuple[D.QueryExitCode, List[Any] | None]:
+        self.queries += 1
+        query, params = SqliteDatabase._translate(query, params or ())
+        try:
+            async with self._conn.execute(query, params) as cursor:
+                results = await cursor.fetchall() if cursor.description is not None else None
+            await self._conn.commit()
+            return D.QueryExitCode.SUCCESS, results
+        except sqlite3.IntegrityError:
+            if auto_respond_on_fail:
+                await auto_respond_on_fail.respond(E.DB_INTEGRITY_ERROR_MSG)
+            return D.QueryExitCode.INTEGRITY_ERROR, None
+
+
+class PostgresDatabase:
+    """ The real ``D.db_query()`` against ``db_url``, counting queries. """
+
+    def __init__(self, db_url: str):
+        self.db_url = db_url
+        self.queries = 0
+
+    async def open(self):
+        await D.init_dbs(self.db_url)
+
+    async def close(self):
+        await D.close_db_pools()
+
+    async def db_query(self, query: str, **kwargs) -> Tuple[D.QueryExitCode, List[Any] | None]:
+        self.queries += 1
+        return await _real_db_query(query, **{**kwargs, 'db_url': self.db_url})
+
+
+_real_db_query = D.db_query
+
+
+class LichessStandInThread(threading.Thread):
+    """ Run a ``LichessStandIn`` on its own event loop, in a daemon thread. """
+
+    def __init__(self, stand_in: LichessStandIn):
+        super().__init__(daemon=True)
+        self.stand_in = stand_in
+        self.base_url: str | None = None
+        self._loop = asyncio.new_event_loop()
+        self._serving = threading.Event()
+
+    def run(self):
+        asyncio.set_event_loop(self._loop)
+        self.base_url = self._loop.run_until_complete(self.stand_in.start())
+        self._serving.set()
+        self._loop.run_forever()
+
+    def start_and_wait(self) -> str:
+        self.start()
+        self._serving.wait()
+        return self.base_url
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.stand_in.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class FakeApplicationContext:
+    """ Just enough of ``discord.ApplicationContext`` for the cogs, timing every reply. """
+
+    def __init__(self, *, author: str, discord_latency: float):
+        self.author = author
+        self.discord_latency = discord_latency
+        self.started_at = time.perf_counter()
+        self.first_response_at: float | None = None
+        self.final_edit_at: float | None = None
+        self.response = _FakeInteractionResponse(self)
+        self.interaction = _FakeInteraction(self)
+
+    async def _call_discord(self):
+        await asyncio.sleep(self.discord_latency)
+        return time.perf_counter()
+
+    async def respond(self, *args, **kwargs):
+        done_at = await self._call_discord()
+        if self.first_response_at is None:
+            self.first_response_at = done_at
+        self.final_edit_at = done_at
+
+    async def edit(self, **kwargs):
+        self.final_edit_at = await self._call_discord()
+
+
+class _FakeInteractionResponse:
+    def __init__(self, ctx: FakeApplicationContext):
+        self._ctx = ctx
+
+    async def defer(self, **kwargs):
+        await self._ctx._call_discord()
+
+
+class _FakeInteraction:
+    def __init__(self, ctx: FakeApplicationContext):
+        self._ctx = ctx
+
+    async def edit_original_response(self, **kwargs):
+        await self._ctx.edit(**kwargs)
+
+
+class FakeAutocompleteContext:
+    def __init__(self, *, user_id: int, **options: str):
+        self.options = options
+        self.interaction = type('FakeInteraction', (), {'user': type('FakeUser', (), {'id': user_id})()})()
+
+
+class FakeBot:
+    def __init__(self):
+        self.user = type('FakeUser', (), {'name': 'UVMCC Bot (load test)'})()
+
+    async def wait_until_ready(self):
+        # Keep the cogs' background tasks from ever starting
+        await asyncio.Event().wait()
+
+
+''' Measurements '''
+
+
+class LoopLagMonitor:
+    """ Sample how late the event loop wakes up from short sleeps. """
+
+    INTERVAL_SECONDS = 0.01
+
+    def __init__(self):
+        self.samples: List[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+    async def _run(self):
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(LoopLagMonitor.INTERVAL_SECONDS)
+            self.samples.append(time.perf_counter() - t0 - LoopLagMonitor.INTERVAL_SECONDS)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def format_ms(values: Sequence[float]) -> str:
+    return ' '.join(f'{percentile(values, q) * 1000:>8.1f}' for q in (50, 95, 99))
+
+
+''' Commands '''
+
+
+class LoadTest:
+    # Between keystrokes of someone typing into an autocompleted option
+    KEYSTROKE_INTERVAL = 0.08
+
+    def __init__(self, *, fixture: Dict[str, Any], db, upstream_stats: Callable[[], Awaitable[Dict[str, int]]],
+                 discord_latency: float, seed: int = 0):
+        self.db = db
+        self.upstream_stats = upstream_stats
+        self.discord_latency = discord_latency
+        self._rng = random.Random(seed)
+
+        self.bot = FakeBot()
+        self.show_cog = Show(self.bot)
+        self.user_management_cog = UserManagement(self.bot)
+
+        # Half the users are in the database already, the rest get /add-ed
+        users = [u['username'] for u in fixture['users']]
+        self.roster = users[::2]
+        self._users_to_add = itertools.cycle(users[1::2])
+        self._author_ids = itertools.count()
+
+    async def seed_database(self):
+        for username in self.roster:
+            await self.db.db_query('INSERT INTO chess_usernames(username, site) VALUES (%s, %s) '
+                                   'ON CONFLICT DO NOTHING',
+                                   params=(username, U.SupportedSites.LICHESS))
+
+    def close(self):
+        self.user_management_cog.cog_unload()
+
+    def _ctx(self) -> FakeApplicationContext:
+        return FakeApplicationContext(author=f'loadtest#{next(self._author_ids):04d}',
+                                      discord_latency=self.discord_latency)
+
+    async def show(self) -> FakeApplicationContext:
+        ctx = self._ctx()
+        await Show.show.callback(self.show_cog, ctx, player=None, site=None)
+        return ctx
+
+    async def watch(self) -> FakeApplicationContext:
+        ctx = self._ctx()
+        await Show.watch.callback(self.show_cog, ctx, player=None, site=None)
+        return ctx
+
+    async def add(self) -> FakeApplicationContext:
+        ctx = self._ctx()
+        await UserManagement.add.callback(self.user_management_cog, ctx,
+                                          username=next(self._users_to_add), site=U.SupportedSites.LICHESS)
+        return ctx
+
+    async def autocomplete(self) -> FakeApplicationContext:
+        """ Someone typing a username into ``/add``, one character at a time. """
+        ctx = self._ctx()
+        user_id = id(ctx)
+        username = next(self._users_to_add)
+
+        async def keystroke(prefix: str):
+            await UserManagement._autocomplete_adding_username(FakeAutocompleteContext(user_id=user_id,
+                                                                                       username=prefix))
+            if ctx.first_response_at is None:
+                ctx.first_response_at = time.perf_counter()
+
+        # Discord sends every keystroke as its own interaction, without waiting for the last one
+        keystrokes = []
+        for i in range(1, min(len(username), 6) + 1):
+            keystrokes.append(asyncio.create_task(keystroke(username[:i])))
+            await asyncio.sleep(self.KEYSTROKE_INTERVAL)
+        await asyncio.gather(*keystrokes)
+        ctx.final_edit_at = time.perf_counter()
+        return ctx
+
+    async def run_level(self, command: str, concurrency: int) -> Dict[str, Any]:
+        # Start each level cold, so upstream calls aren't hidden by the previous level's cache
+        SC.CACHE.invalidate()
+        UA.AUTOCOMPLETER = UA.UsernameAutocompleter()
+        EB.BATCHER = EB.ExportBatcher()
+        while SH.HUB.num_upstreams:
+            await asyncio.sleep(0.05)
+
+        stats_before = await self.upstream_stats()
+        db_queries_before = self.db.queries
+        run = getattr(self, command)
+
+        async with LoopLagMonitor() as lag:
+            t0 = time.perf_counter()
+            results = await asyncio.gather(*(run() for _ in range(concurrency)), return_exceptions=True)
+            elapsed = time.perf_counter() - t0
+
+        stats_after = await self.upstream_stats()
+        upstream = {k: v - stats_before.get(k, 0) for k, v in stats_after.items() if v != stats_before.get(k, 0)}
+
+        ctxs = [r for r in results if isinstance(r, FakeApplicationContext)]
+        errors = [r for r in results if isinstance(r, BaseException)]
+        for error in errors[:3]:
+            print(f'    {command} failed: {type(error).__name__}: {error}')
+        return {'command': command,
+                'concurrency': concurrency,
+                'errors': len(errors),
+                'elapsed': elapsed,
+                'first_response': [c.first_response_at - c.started_at for c in ctxs if c.first_response_at],
+                'final_edit': [c.final_edit_at - c.started_at for c in ctxs if c.final_edit_at],
+                'loop_lag': lag.samples,
+                'upstream_calls': upstream,
+                'db_queries': self.db.queries - db_queries_before}
+
+
+def print_report(result: Dict[str, Any]):
+    n = result['concurrency']
+    upstream = ', '.join(f'{path.rsplit("/", 1)[-1] if "{" not in path else path.split("/")[-2]}={count / n:.2f}'
+                         for path, count in sorted(result['upstream_calls'].items()))
+    print(f'{result["command"]:<13}{n:>5}{result["errors"]:>5}  '
+          f'{format_ms(result["first_response"])}  {format_ms(result["final_edit"])}  '
+          f'{format_ms(result["loop_lag"])} {max(result["loop_lag"], default=0) * 1000:>8.1f}  '
+          f'db={result["db_queries"] / n:.2f} {upstream}')
+
+
+async def main_async(args):
+    fixture = make_fixture(args.n_users, seed=args.seed)
+
+    stand_in_thread = None
+    if args.lichess_url:
+        lichess_url = args.lichess_url
+
+        async def upstream_stats() -> Dict[str, int]:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f'{lichess_url}/_stand_in/stats') as response:
+                    return await response.json()
+    else:
+        stand_in = LichessStandIn(fixture,
+                                  latency_ms=args.lichess_latency_ms,
+                                  jitter_ms=args.lichess_jitter_ms,
+                                  rate_limit_rate=args.rate_limit_rate,
+                                  stream_drop_rate=args.stream_drop_rate,
+                                  move_interval=args.move_interval,
+                                  seed=args.seed)
+        stand_in_thread = LichessStandInThread(stand_in)
+        lichess_url = stand_in_thread.start_and_wait()
+
+        async def upstream_stats() -> Dict[str, int]:
+            return dict(stand_in.stats)
+
+    db = PostgresDatabase(args.database_url) if args.database_url else SqliteDatabase()
+    await db.open()
+
+    client = L.LichessClient(lichess_url)
+    with unittest.mock.patch.object(L, 'CLIENT', client), \
+            unittest.mock.patch.object(D, 'db_query', db.db_query):
+        load_test = LoadTest(fixture=fixture, db=db, upstream_stats=upstream_stats,
+                             discord_latency=args.discord_latency_ms / 1000, seed=args.seed)
+        await load_test.seed_database()
+        if args.roster_stream:
+            # What the Show cog does once the bot is ready
+            RS.ROSTER.start()
+            PP.POLLER.start()
+            while not RS.ROSTER.is_live or PP.POLLER.snapshot is None:
+                await asyncio.sleep(0.05)
+        print(f'Roster of {len(load_test.roster)} users, Lichess at {lichess_url}, '
+              f'{"Postgres" if args.database_url else "SQLite"} database\n')
+        print(f'{"":<13}{"":>5}{"":>5}  {"first response (ms)":^26}  {"final edit (ms)":^26}  '
+              f'{"loop lag (ms)":^35}  calls per command')
+        print(f'{"command":<13}{"n":>5}{"err":>5}  {"p50":>8} {"p95":>8} {"p99":>8}  '
+              f'{"p50":>8} {"p95":>8} {"p99":>8}  {"p50":>8} {"p95":>8} {"p99":>8} {"max":>8}')
+
+        try:
+            for concurrency in args.levels:
+                for command in args.commands:
+                    print_report(await load_test.run_level(command, concurrency))
+        finally:
+            await RS.ROSTER.stop()
+            await PP.POLLER.stop()
+            load_test.close()
+            await client.close()
+            await db.close()
+            if stand_in_thread is not None:
+                stand_in_thread.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 5, 10, 25, 50, 100])
+    parser.add_argument('--commands', nargs='+', default=['show', 'watch', 'add', 'autocomplete'],
+                        choices=['show', 'watch', 'add', 'autocomplete'])
+    parser.add_argument('--n-users', type=int, default=60, help='Users in the Lichess fixture (half on the roster)')
+    parser.add_argument('--discord-latency-ms', type=float, default=50)
+    parser.add_argument('--lichess-url', help='Use an already running Lichess stand-in')
+    parser.add_argument('--lichess-latency-ms', type=float, default=50)
+    parser.add_argument('--lichess-jitter-ms', type=float, default=20)
+    parser.add_argument('--rate-limit-rate', type=float, default=0)
+    parser.add_argument('--stream-drop-rate', type=float, default=0,
+                        help='Chance of the stand-in cutting off a game stream after each move')
+    parser.add_argument('--move-interval', type=float, default=0.05,
+                        help='Seconds between moves in the stand-in\'s games (keeps /watch short)')
+    parser.add_argument('--no-roster-stream', dest='roster_stream', action='store_false',
+                        help='Don\'t follow the roster with a games stream and a presence poller '
+                             '(/show asks Lichess every time)')
+    parser.add_argument('--database-url', help='Scratch PostgreSQL database (default: in-memory SQLite)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='Keep the bot\'s logging')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Regenerate the piece sprites in ``uvmcc/assets/pieces/`` from python-chess's built-in
+SVG pieces (Colin M.L. Burnett's "cburnett" set, the same one Lichess uses by default).
+
+Only needed when changing the sprite set or resolution - the generated PNGs are
+checked in, so the bot itself never rasterizes SVGs. Requires ``resvg-py``:
+
+    pip install resvg-py
+    python scripts/rasterize_piece_sprites.py
+"""
+
+import chess
+import chess.svg
+import resvg_py
+
+import os
+
+
+SPRITE_SIZE_PX = 128
+OUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'uvmcc', 'assets', 'pieces')
+
+
+def main():
+    os.makedirs(OUT_DIR, exist_ok=True)
+    for symbol in chess.PIECE_SYMBOLS[1:]:
+        for color in chess.COLORS:
+            piece = chess.Piece.from_symbol(symbol.upper() if color else symbol)
+            svg = (f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+                   f'viewBox="0 0 45 45" width="45" height="45">{chess.svg.PIECES[piece.symbol()]}</svg>')
+            png = bytes(resvg_py.svg_to_bytes(svg_string=svg, width=SPRITE_SIZE_PX, height=SPRITE_SIZE_PX))
+
+            filename = f'{"w" if color else "b"}{piece.symbol().upper()}.png'
+            with open(os.path.join(OUT_DIR, filename), 'wb') as f:
+                f.write(png)
+            print(f'Wrote {filename}')
+
+
+if __name__ == '__main__':
+    main()
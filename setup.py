@@ -7,4 +7,5 @@ setup(
     author_email='jacksonthall22@gmail.com',
     description='Code for the University of Vermont Chess Club discord bot.',
     packages=find_packages(),
+    package_data={'uvmcc': ['assets/pieces/*.png']},
 )
@@ -0,0 +1,72 @@
+import unittest
+import asyncio
+import aiohttp
+from uvmcc.bio_verification import BioVerificationScheduler
+
+
+class TestBioVerificationScheduler(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.bios = {}
+        self.calls = []
+        self.fail = False
+        self.malformed = False
+
+        async def fetch(*usernames):
+            self.calls.append(usernames)
+            if self.fail:
+                raise aiohttp.ClientConnectionError('offline')
+            if self.malformed:
+                raise KeyError('profile')
+            return [{'id': u, 'username': u, 'profile': {'bio': self.bios[u]}} for u in usernames if u in self.bios]
+
+        self.verifier = BioVerificationScheduler(fetch, tick_seconds=0.01)
+
+    async def test_one_request_per_tick(self):
+        self.bios = {f'user{i}': '' for i in range(30)}
+        waiters = [asyncio.create_task(self.verifier.verify(f'User{i}', f'code{i}', expires_in=10))
+                   for i in range(30)]
+        await asyncio.sleep(0.035)
+        for i in range(0, 30, 2):
+            self.bios[f'user{i}'] = f'hello code{i}'
+
+        results = await asyncio.wait_for(asyncio.gather(*waiters[::2]), 1)
+        self.assertTrue(all(results))
+        self.assertEqual(self.verifier.upstream_calls, self.verifier.ticks)
+        self.assertEqual(len(self.calls[0]), 30)
+        self.assertTrue(all(not w.done() for w in waiters[1::2]))
+
+        for w in waiters[1::2]:
+            w.cancel()
+        await asyncio.sleep(0.03)
+        self.assertEqual(self.verifier.stats()['pending'], 0)
+
+    async def test_expires(self):
+        self.bios = {'alice': 'no code here'}
+        self.assertFalse(await asyncio.wait_for(self.verifier.verify('alice', 'abc123', expires_in=0.03), 1))
+        self.assertFalse(await asyncio.wait_for(self.verifier.verify('ghost', 'abc123', expires_in=0), 1))
+        self.assertEqual(self.verifier.expired, 2)
+
+    async def test_upstream_errors_retry_then_expire(self):
+        self.bios = {'alice': 'abc123'}
+        self.fail = True
+        waiter = asyncio.create_task(self.verifier.verify('alice', 'abc123', expires_in=10))
+        await asyncio.sleep(0.035)
+        self.assertFalse(waiter.done())
+
+        self.fail = False
+        self.assertTrue(await asyncio.wait_for(waiter, 1))
+        self.assertFalse(await asyncio.wait_for(self.verifier.verify('bob', 'x', expires_in=0), 1))
+
+    async def test_unexpected_errors_dont_stop_the_ticker(self):
+        self.bios = {'alice': 'abc123'}
+        self.malformed = True
+        self.assertFalse(await asyncio.wait_for(self.verifier.verify('bob', 'x', expires_in=0.02), 1))
+
+        waiter = asyncio.create_task(self.verifier.verify('alice', 'abc123', expires_in=10))
+        await asyncio.sleep(0.035)
+        self.malformed = False
+        self.assertTrue(await asyncio.wait_for(waiter, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
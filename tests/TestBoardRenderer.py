@@ -0,0 +1,58 @@
+import unittest
+import io
+import chess
+from PIL import Image
+import uvmcc.board_renderer as BR
+
+
+class TestBoardRenderer(unittest.TestCase):
+    START_BOARD_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR'
+
+    def _render(self, **kwargs) -> Image.Image:
+        return Image.open(io.BytesIO(BR.render_board_png(self.START_BOARD_FEN, **kwargs))).convert('RGB')
+
+    def test_size_is_whole_squares(self):
+        self.assertEqual(self._render(size=500).size, (496, 496))
+        self.assertEqual(self._render(size=360).size, (360, 360))
+
+    def test_square_colors_and_orientation(self):
+        img = self._render(size=360)
+        # a1 (bottom left from White's side) is dark; sample a corner pixel, away from the piece
+        self.assertEqual(img.getpixel((1, 358)), BR.DARK_SQUARE_COLOR)
+        # ...and it's in the top right from Black's side
+        img = self._render(orientation='black', size=360)
+        self.assertEqual(img.getpixel((358, 1)), BR.DARK_SQUARE_COLOR)
+
+    def test_last_move_highlight(self):
+        img = self._render(last_move_uci='e2e4', size=360)
+        # e4 is light, e2 is light
+        self.assertEqual(img.getpixel((4 * 45 + 1, 4 * 45 + 1)), BR.LIGHT_LAST_MOVE_COLOR)
+        self.assertEqual(img.getpixel((4 * 45 + 1, 6 * 45 + 1)), BR.LIGHT_LAST_MOVE_COLOR)
+
+    def test_cached(self):
+        BR.render_board_png.cache_clear()
+        self._render(size=200)
+        self._render(size=200)
+        self.assertEqual(BR.render_board_png.cache_info().hits, 1)
+
+    def test_batch_matches_single(self):
+        board = chess.Board()
+        positions = []
+        for uci in ['e2e4', 'c7c5', 'g1f3']:
+            board.push_uci(uci)
+            positions.append((board.copy(), uci))
+
+        batch = BR.render_boards(positions, orientation='black', size=200)
+        self.assertEqual(len(batch), 3)
+        for png, (b, uci) in zip(batch, positions):
+            self.assertEqual(png, BR.render_board_png(b.board_fen(), orientation='black', last_move_uci=uci, size=200))
+
+    def test_board_layout(self):
+        layout = BR.board_layout(chess.BaseBoard(self.START_BOARD_FEN))
+        self.assertEqual([BR.ATLAS_PIECE_SYMBOLS[i] for i in layout[:8]], list('RNBQKBNR'))
+        self.assertEqual([BR.ATLAS_PIECE_SYMBOLS[i] for i in layout[56:]], list('rnbqkbnr'))
+        self.assertTrue((layout[16:48] == 0).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
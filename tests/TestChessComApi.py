@@ -0,0 +1,105 @@
+import unittest
+import asyncio
+import collections
+import os
+import tempfile
+import time
+import unittest.mock
+import orjson
+from aiohttp import web
+import uvmcc.chess_com_api as CC
+import uvmcc.rate_limit as R
+from uvmcc.chess_com_api import ChessComClient
+from uvmcc.disk_cache import DiskCache
+
+PLAYERS = {
+    'hikaru': {'username': 'hikaru', 'url': 'https://www.chess.com/member/Hikaru', 'status': 'premium',
+               'last_online': int(time.time()), 'joined': 1389043258},
+    'magnuscarlsen': {'username': 'magnuscarlsen', 'url': 'https://www.chess.com/member/MagnusCarlsen',
+                      'status': 'premium', 'last_online': int(time.time()) - 86400, 'joined': 1275221256},
+}
+MONTHS = [(2024, 1), (2024, 2), (2024, 3), (2024, 4), (2024, 5), (2024, 6)]
+
+
+class TestChessComApi(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests = collections.Counter()
+        self.not_modified = 0
+        self.running = 0
+        self.max_running = 0
+
+        app = web.Application()
+        app.router.add_get('/pub/player/{username}', self._player)
+        app.router.add_get('/pub/player/{username}/games/archives', self._archives)
+        app.router.add_get('/pub/player/{username}/games/{year}/{month}', self._archive)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', 0).start()
+        host, port = self.runner.addresses[0][:2]
+
+        self.dir = tempfile.TemporaryDirectory()
+        self.client = ChessComClient(f'http://{host}:{port}',
+                                     governor=R.RateGovernor({k: (1e6, 1e6) for k in ChessComClient.RATE_LIMITS}),
+                                     cache=DiskCache(os.path.join(self.dir.name, 'cache.sqlite3'), max_entries=100))
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.runner.cleanup()
+        self.dir.cleanup()
+
+    def _respond(self, request: web.Request, data) -> web.Response:
+        self.requests[request.match_info.route.resource.canonical] += 1
+        body = orjson.dumps(data)
+        etag = f'"{hash(body)}"'
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(body=body, content_type='application/json', headers={'ETag': etag})
+
+    async def _player(self, request: web.Request) -> web.Response:
+        player = PLAYERS.get(request.match_info['username'])
+        if player is None:
+            raise web.HTTPNotFound()
+        return self._respond(request, player)
+
+    async def _archives(self, request: web.Request) -> web.Response:
+        base = f'https://api.chess.com/pub/player/{request.match_info["username"]}/games'
+        return self._respond(request, {'archives': [f'{base}/{y}/{m:02}' for y, m in MONTHS]})
+
+    async def _archive(self, request: web.Request) -> web.Response:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        month = f'{request.match_info["year"]}/{request.match_info["month"]}'
+        return self._respond(request, {'games': [{'url': f'game-{month}', 'end_time': 1704067200}]})
+
+    async def test_players(self):
+        players = await self.client.get_players('MagnusCarlsen', 'nobody', 'Hikaru')
+        self.assertEqual([CC.proper_username(p) for p in players], ['MagnusCarlsen', 'Hikaru'])
+        self.assertEqual([CC.is_online(p) for p in players], [False, True])
+
+    async def test_games_are_fetched_concurrently_in_order(self):
+        games = await self.client.get_games('hikaru')
+        self.assertEqual([g['url'] for g in games], [f'game-{y}/{m:02}' for y, m in MONTHS])
+        self.assertEqual(self.max_running, ChessComClient.MAX_CONCURRENT_REQUESTS)
+
+        games = await self.client.get_games('hikaru', months=2)
+        self.assertEqual([g['url'] for g in games], ['game-2024/05', 'game-2024/06'])
+        # Answered from the cache
+        self.assertEqual(self.requests['/pub/player/{username}/games/{year}/{month}'], len(MONTHS))
+
+    async def test_unchanged_archives_are_revalidated(self):
+        ttls = {k: 0 for k in ChessComClient.CACHE_TTL_SECONDS}
+        with unittest.mock.patch.dict(ChessComClient.CACHE_TTL_SECONDS, ttls):
+            await self.client.get_games('hikaru')
+            games = await self.client.get_games('hikaru')
+
+        self.assertEqual(len(games), len(MONTHS))
+        # The archive list and every month
+        self.assertEqual(self.not_modified, 1 + len(MONTHS))
+        self.assertEqual(self.client.cache.stats()['revalidated'], self.not_modified)
+
+
+if __name__ == '__main__':
+    unittest.main()
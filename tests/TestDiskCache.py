@@ -0,0 +1,72 @@
+import unittest
+import contextlib
+import os
+import tempfile
+import types
+from uvmcc.disk_cache import DiskCache
+
+
+class TestDiskCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'cache.sqlite3')
+        self.cache = DiskCache(self.path, max_entries=3)
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+        self.dir.cleanup()
+
+    async def test_survives_reopening(self):
+        await self.cache.put('a', b'{"x": 1}', ttl_seconds=60, etag='"abc"')
+        await self.cache.put('b', b'[]', ttl_seconds=0)
+        await self.cache.close()
+
+        self.cache = DiskCache(self.path, max_entries=3)
+        a, b = await self.cache.get('a'), await self.cache.get('b')
+        self.assertEqual((a.body, a.etag, a.is_fresh), (b'{"x": 1}', '"abc"', True))
+        self.assertFalse(b.is_fresh)
+        self.assertIsNone(await self.cache.get('c'))
+        self.assertEqual({k: self.cache.stats()[k] for k in ('hits', 'stale', 'misses')},
+                         {'hits': 1, 'stale': 1, 'misses': 1})
+
+        await self.cache.refresh('b', ttl_seconds=60)
+        self.assertTrue((await self.cache.get('b')).is_fresh)
+
+    async def test_evicts_least_recently_used(self):
+        for key in 'abc':
+            await self.cache.put(key, key.encode(), ttl_seconds=60)
+        await self.cache.get('a')
+        await self.cache.put('d', b'd', ttl_seconds=60)
+
+        self.assertEqual(set(await self.cache.get_many('abcd')), {'a', 'c', 'd'})
+
+    async def test_errors_are_misses(self):
+        cache = DiskCache(os.path.join(self.dir.name, 'missing', 'cache.sqlite3'), max_entries=3)
+        await cache.put('a', b'a', ttl_seconds=60)
+        self.assertIsNone(await cache.get('a'))
+        self.assertEqual(cache.stats()['errors'], 2)
+        await cache.close()
+
+    async def test_fetch_revalidates_stale_entries(self):
+        sent_headers = []
+
+        @contextlib.asynccontextmanager
+        async def request(headers):
+            sent_headers.append(headers)
+            if headers.get('If-None-Match') == '"v1"':
+                yield types.SimpleNamespace(status=304, headers={})
+            else:
+                async def read():
+                    return b'v1'
+                yield types.SimpleNamespace(status=200, headers={'ETag': '"v1"'}, read=read)
+
+        self.assertEqual(await self.cache.fetch('a', request, ttl_seconds=0), b'v1')
+        self.assertEqual(await self.cache.fetch('a', request, ttl_seconds=60), b'v1')
+        # Fresh again after the 304
+        self.assertEqual(await self.cache.fetch('a', request, ttl_seconds=60), b'v1')
+        self.assertEqual(sent_headers, [{}, {'If-None-Match': '"v1"'}])
+        self.assertEqual(self.cache.stats()['revalidated'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import asyncio
+from uvmcc.embed_updater import EmbedUpdater
+
+
+class TestEmbedUpdater(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.edits = []
+
+        async def edit(**kwargs):
+            self.edits.append(kwargs['frame'])
+            await asyncio.sleep(0)
+
+        self.updater = EmbedUpdater(edit, edits_per_second=20, burst=1)
+
+    async def test_latest_wins_and_final_edit_always_sent(self):
+        for i in range(10):
+            self.updater.submit(frame=i)
+        await asyncio.sleep(0.01)
+        self.updater.submit(frame=10)
+        await self.updater.finish(frame='final')
+
+        self.assertEqual(self.edits, [9, 'final'])
+        stats = self.updater.stats()
+        self.assertEqual(stats['frames_submitted'], 12)
+        self.assertEqual(stats['frames_sent'], 2)
+        self.assertEqual(stats['frames_dropped'], 10)
+
+    async def test_rate_limited(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for i in range(3):
+            self.updater.submit(frame=i)
+            await asyncio.sleep(0.06)
+        await self.updater.finish(frame='final')
+
+        self.assertEqual(self.edits, [0, 1, 2, 'final'])
+        # One token up front, then 20/s
+        self.assertGreaterEqual(loop.time() - start, 0.15 - 0.01)
+
+    async def test_final_edit_keeps_the_latest_attachment(self):
+        sent = []
+
+        async def edit(**kwargs):
+            sent.append(kwargs)
+            await asyncio.sleep(0)
+
+        updater = EmbedUpdater(edit, edits_per_second=20, burst=1)
+        updater.submit(embed=0, file='board-0.png', attachments=[])
+        await asyncio.sleep(0.01)
+        for i in range(1, 5):
+            updater.submit(embed=i, file=f'board-{i}.png', attachments=[])
+        await updater.finish(embed='final')
+
+        self.assertEqual(sent, [{'embed': 0, 'file': 'board-0.png', 'attachments': []},
+                                {'embed': 'final', 'file': 'board-4.png', 'attachments': []}])
+
+        # Nothing pending, so nothing to carry over
+        updater = EmbedUpdater(edit, edits_per_second=20, burst=1)
+        updater.submit(embed=0, file='board-0.png', attachments=[])
+        await asyncio.sleep(0.01)
+        await updater.finish(embed='final')
+        self.assertEqual(sent[-1], {'embed': 'final'})
+
+    async def test_only_sent_frames_are_rendered(self):
+        rendered = []
+
+        def render(i):
+            async def _render():
+                rendered.append(i)
+                return {'frame': f'board-{i}'}
+            return _render
+
+        self.updater.submit(frame=0, render=render(0))
+        await asyncio.sleep(0.01)
+        for i in range(1, 5):
+            self.updater.submit(frame=i, render=render(i))
+        await self.updater.finish(frame='final')
+
+        # The final edit renders the newest dropped frame's board
+        self.assertEqual(rendered, [0, 4])
+        self.assertEqual(self.edits, ['board-0', 'board-4'])
+
+    async def test_submit_after_finish_raises(self):
+        await self.updater.finish(frame='final')
+        with self.assertRaises(RuntimeError):
+            self.updater.submit(frame=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
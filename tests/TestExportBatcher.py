@@ -0,0 +1,67 @@
+import unittest
+import asyncio
+import uvmcc.rate_limit as R
+from uvmcc.export_batcher import ExportBatcher
+
+
+class TestExportBatcher(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.calls = []
+        self.statuses = {'g1': 'started', 'g2': 'started', 'g3': 'mate'}
+
+        async def export(*game_ids, moves, priority):
+            self.calls.append((game_ids, moves, priority))
+            await asyncio.sleep(0.01)
+            return [{'id': g, 'status': self.statuses[g], **({'moves': 'e4'} if moves else {})}
+                    for g in game_ids if g in self.statuses]
+
+        self.batcher = ExportBatcher(export, window_seconds=0.005)
+
+    async def test_concurrent_callers_share_one_request(self):
+        results = await asyncio.gather(self.batcher.export('g1', 'g2'),
+                                       self.batcher.export('g2', 'nope', 'g3'),
+                                       self.batcher.export('g1', 'g1'))
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.calls[0][0], ('g1', 'g2', 'nope', 'g3'))
+        self.assertEqual([[g['id'] for g in r] for r in results], [['g1', 'g2'], ['g2', 'g3'], ['g1']])
+
+    async def test_joins_exports_in_flight(self):
+        first = asyncio.create_task(self.batcher.export('g1', priority=R.Priority.BACKGROUND))
+        await asyncio.sleep(0.008)  # sent, but not answered yet
+        # Games with moves can answer callers that don't need them
+        second = await self.batcher.export('g1', moves=False)
+        await first
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(second[0]['id'], 'g1')
+        self.assertEqual(self.batcher.stats()['coalesced'], 1)
+
+    async def test_finished_games_are_cached(self):
+        await self.batcher.export('g1', 'g3')
+        results = await self.batcher.export('g1', 'g3')
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.calls[1][0], ('g1',))
+        self.assertEqual([g['id'] for g in results], ['g1', 'g3'])
+        self.assertEqual(self.batcher.stats()['finished_hits'], 1)
+
+    async def test_most_urgent_priority_and_failures(self):
+        async def failing_export(*game_ids, moves, priority):
+            self.calls.append((game_ids, moves, priority))
+            raise asyncio.TimeoutError()
+
+        self.batcher._export = failing_export
+        results = await asyncio.gather(self.batcher.export('g1', priority=R.Priority.BACKGROUND),
+                                       self.batcher.export('g2'),
+                                       return_exceptions=True)
+
+        self.assertEqual(self.calls, [(('g1', 'g2'), True, R.Priority.INTERACTIVE)])
+        self.assertTrue(all(isinstance(r, asyncio.TimeoutError) for r in results))
+        # Nothing is left pending
+        self.batcher._export = lambda *game_ids, moves, priority: asyncio.sleep(0, [])
+        self.assertEqual(await self.batcher.export('g1'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import asyncio
+from uvmcc.lichess_api import LichessClient
+
+
+class TestFetchChunked(unittest.IsolatedAsyncioTestCase):
+    async def test_chunks_merge_in_input_order(self):
+        chunks = []
+
+        async def fetch_chunk(*ids):
+            chunks.append(ids)
+            # Finish later chunks first, to make sure order comes from the input
+            await asyncio.sleep(0.01 / len(chunks))
+            return [i.upper() for i in ids]
+
+        ids = [f'user{i}' for i in range(250)]
+        result = await LichessClient._fetch_chunked(fetch_chunk, ids, 100)
+
+        self.assertEqual(result, [i.upper() for i in ids])
+        self.assertEqual([len(c) for c in chunks], [100, 100, 50])
+
+    async def test_concurrency_is_bounded(self):
+        running = 0
+        max_running = 0
+
+        async def fetch_chunk(*ids):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return list(ids)
+
+        await LichessClient._fetch_chunked(fetch_chunk, [str(i) for i in range(100)], 5)
+        self.assertEqual(max_running, LichessClient.MAX_CONCURRENT_CHUNKS)
+
+    async def test_empty(self):
+        async def fetch_chunk(*ids):
+            raise AssertionError('Should not be called')
+
+        self.assertEqual(await LichessClient._fetch_chunked(fetch_chunk, [], 100), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import datetime
+import chess
+import uvmcc.lichess_models as LM
+import uvmcc.utils as U
+
+
+EXPORT = {'id': 'Qhvz5ujU', 'rated': True, 'variant': 'standard', 'speed': 'blitz', 'perf': 'blitz',
+          'createdAt': datetime.datetime(2023, 6, 2, 19, 24, 32, tzinfo=datetime.timezone.utc),
+          'status': 'started',
+          'players': {'white': {'user': {'name': 'Ellaijio', 'title': 'IM', 'id': 'ellaijio'}, 'rating': 2603},
+                      'black': {'user': {'name': 'pulvettd', 'id': 'pulvettd'}, 'rating': 2526}},
+          'moves': 'e4 c5 Nf3 d6',
+          'clock': {'initial': 180, 'increment': 0, 'totalTime': 180}}
+
+
+class TestLichessModels(unittest.TestCase):
+    def test_live_game_from_export(self):
+        game = LM.LiveGame.from_json(EXPORT)
+        self.assertEqual(game.white, LM.Player(name='Ellaijio', rating=2603, title='IM'))
+        self.assertEqual(game.black.id, 'pulvettd')
+        self.assertEqual(game.clock, LM.Clock(initial=180, increment=0))
+        self.assertEqual((game.variant, game.speed, game.rated, game.initial_fen), ('standard', 'blitz', True, None))
+        self.assertFalse(hasattr(game, '__dict__'))
+        with self.assertRaises(AttributeError):
+            game.id = 'other'
+
+    def test_ranking_helpers(self):
+        game = LM.LiveGame.from_json(EXPORT)
+        self.assertEqual(game.max_rating, 2603)
+        self.assertEqual(game.color_of('PULVETTD'), chess.BLACK)
+        self.assertEqual(game.player(game.color_of('Ellaijio')).rating, 2603)
+
+    def test_correspondence_and_anonymous(self):
+        game = LM.LiveGame.from_json({'id': 'abc', 'variant': {'key': 'chess960'}, 'initialFen': 'startpos',
+                                      'players': {'white': {'aiLevel': 3}, 'black': {}}})
+        self.assertIsNone(game.clock)
+        self.assertEqual((game.white.name, game.black.name), ('Stockfish level 3', 'Anonymous'))
+        self.assertEqual((game.variant, game.initial_fen), ('chess960', None))
+
+    def test_stream_packets(self):
+        info = LM.stream_packet_from_json({'id': 'abc', 'fen': 'x', 'status': {'id': 31, 'name': 'resign'},
+                                           'winner': 'black', 'rated': True,
+                                           'players': {'white': {'user': {'name': 'A'}, 'ratingDiff': -5},
+                                                       'black': {'user': {'name': 'B'}, 'ratingDiff': 5}}})
+        self.assertTrue(info.is_over)
+        self.assertEqual((info.winner, info.white.rating_diff, info.player(chess.BLACK).rating_diff), ('black', -5, 5))
+        move = LM.stream_packet_from_json({'fen': 'y', 'lm': 'e2e4', 'wc': 60, 'bc': 59})
+        self.assertEqual(move, LM.GameMove(fen='y', last_move='e2e4', white_clock=60, black_clock=59))
+
+    def test_format_time_control(self):
+        self.assertEqual(U.format_lichess_time_control(LM.Clock(initial=300, increment=3)), '5+3')
+        self.assertEqual(U.format_lichess_time_control(LM.Clock(initial=45, increment=0)), '¾+0')
+        with self.assertRaises(ValueError):
+            U.format_lichess_time_control(LM.Clock(initial=20, increment=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
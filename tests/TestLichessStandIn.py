@@ -0,0 +1,152 @@
+import unittest
+import asyncio
+import os
+import tempfile
+import time
+import unittest.mock
+import aiohttp
+import uvmcc.rate_limit as R
+from benchmarks.lichess_stand_in import LichessStandIn, make_fixture
+from uvmcc.disk_cache import DiskCache
+from uvmcc.lichess_api import LichessClient
+from uvmcc.resumable_stream import ResumableGameStream
+
+
+class TestLichessStandIn(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fixture = make_fixture(6, n_playing=3)
+        self.stand_in = LichessStandIn(self.fixture, move_interval=0.01)
+        self.client = LichessClient(await self.stand_in.start())
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.stand_in.stop()
+
+    async def test_statuses_and_export(self):
+        usernames = [u['username'] for u in self.fixture['users']]
+        statuses = await self.client.get_realtime_statuses(*usernames, 'nobody', with_game_ids=True)
+        self.assertEqual([s['name'] for s in statuses], usernames)
+
+        game_ids = [s['playingId'] for s in statuses if s.get('playing')]
+        games = await self.client.export_multi(*game_ids)
+        self.assertEqual([g['id'] for g in games], game_ids)
+        self.assertEqual(self.stand_in.stats['/api/users/status'], 1)
+
+    async def test_profile_and_autocomplete(self):
+        username = self.fixture['users'][0]['username']
+        self.assertEqual((await self.client.get_public_data(username.upper()))['username'], username)
+        self.assertIn(username, await self.client.autocomplete_usernames(username[:4]))
+        with self.assertRaises(aiohttp.ClientResponseError):
+            await self.client.get_public_data('nobody')
+
+        users = await self.client.get_users_by_id(username.lower(), 'nobody')
+        self.assertEqual([u['username'] for u in users], [username])
+
+    async def test_stream_plays_the_game_to_the_end(self):
+        game = self.fixture['games'][0]
+        items = [item async for item in ResumableGameStream(game['id'], packets_factory=self.client.stream_game)]
+
+        self.assertTrue(items[-1][0].is_over)
+        self.assertIn(items[-1][0].status_name, ('mate', 'outoftime'))
+        self.assertTrue(any(is_new for _, is_new in items))
+
+    async def test_resumable_stream_survives_drops(self):
+        game = self.fixture['games'][0]
+        self.stand_in.stream_drop_rate = 0.2
+        # Reconnecting can't wait on the rate limit: the stand-in's games move every 10ms
+        client = LichessClient(self.client.base_url,
+                               governor=R.RateGovernor({**LichessClient.RATE_LIMITS, 'stream_game': (1e6, 1e6)}))
+        self.addAsyncCleanup(client.close)
+        stream = ResumableGameStream(game['id'], packets_factory=client.stream_game)
+        with unittest.mock.patch.object(ResumableGameStream, 'MIN_BACKOFF_SECONDS', 0):
+            items = [item async for item in stream]
+
+        self.assertGreater(stream.reconnects, 0)
+        self.assertEqual(stream.reconnects, self.stand_in.stats['dropped_streams'])
+        self.assertIn(items[-1][0].status_name, ('mate', 'outoftime'))
+        moves = [p.last_move for p, is_new in items if is_new is not None]
+        self.assertEqual(len(moves), stream.last_ply)
+
+    async def test_resumes_in_the_same_run_after_a_drop_near_the_end(self):
+        game = self.stand_in.games[self.fixture['games'][0]['id']]
+        game.started_at, game.start_ply, game.move_interval = time.monotonic(), game.n_plies - 2, 0.05
+        client = LichessClient(self.client.base_url,
+                               governor=R.RateGovernor({**LichessClient.RATE_LIMITS, 'stream_game': (1e6, 1e6)}))
+        self.addAsyncCleanup(client.close)
+
+        connections = 0
+
+        def packets(game_id):
+            # Drop the first connection after its first new move, then stop dropping
+            nonlocal connections
+            connections += 1
+            self.stand_in.stream_drop_rate = 1.0 if connections == 1 else 0.0
+            return client.stream_game(game_id)
+
+        stream = ResumableGameStream(game.json['id'], packets_factory=packets)
+        # Reconnect after the replay has started over (it does 3 move intervals after the drop)
+        with unittest.mock.patch.object(ResumableGameStream, 'MIN_BACKOFF_SECONDS', 10 * game.move_interval):
+            items = await asyncio.wait_for(self._collect(stream), 5)
+
+        self.assertEqual(connections, 2)
+        self.assertEqual(self.stand_in.stats['dropped_streams'], 1)
+        # The second connection found the game over, instead of replaying the next run's moves
+        self.assertEqual(stream.resent_skipped, 0)
+        self.assertTrue(items[-1][0].is_over)
+        self.assertEqual(stream.last_ply, game.n_plies - 1)
+
+    @staticmethod
+    async def _collect(stream):
+        return [item async for item in stream]
+
+    async def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path = os.path.join(cache_dir, 'cache.sqlite3')
+            client = LichessClient(self.client.base_url, cache=DiskCache(path, max_entries=100))
+            username = self.fixture['users'][0]['username']
+            game = self.stand_in.games[self.fixture['games'][0]['id']]
+            game.start_ply, game.move_interval = game.n_plies, 1e9  # finished
+            await client.get_public_data(username)
+            await client.autocomplete_usernames(username[:4])
+            await client.export_multi(game.json['id'])
+            await client.close()
+
+            # Like after a restart
+            client = LichessClient(self.client.base_url, cache=DiskCache(path, max_entries=100))
+            self.assertEqual((await client.get_public_data(username))['username'], username)
+            self.assertIn(username, await client.autocomplete_usernames(username[:4]))
+            self.assertIn((await client.export_multi(game.json['id']))[0]['status'], ('mate', 'outoftime'))
+            self.assertEqual([self.stand_in.stats[k] for k in ('/api/user/{username}', '/api/player/autocomplete',
+                                                               '/api/games/export/_ids')], [1, 1, 1])
+
+            # Stale profiles are revalidated with their ETag
+            other = self.fixture['users'][1]['username']
+            with unittest.mock.patch.dict(LichessClient.CACHE_TTL_SECONDS, {'user': 0}):
+                for _ in range(3):
+                    self.assertEqual((await client.get_public_data(other))['username'], other)
+            self.assertEqual(self.stand_in.stats['304'], 2)
+            self.assertEqual(client.cache.stats()['revalidated'], 2)
+            await client.close()
+
+    async def test_games_by_users_stream(self):
+        stream = self.client.stream_games_by_users(*(u['id'] for u in self.fixture['users']))
+        packets = [await anext(stream) for _ in self.fixture['games']]
+        await stream.aclose()
+        self.assertEqual({p['id'] for p in packets}, {g['id'] for g in self.fixture['games']})
+        self.assertTrue(all(p['status'] == 20 for p in packets))
+
+    async def test_rate_limit_injection(self):
+        self.stand_in.rate_limit_rate = 1
+        with self.assertRaises(aiohttp.ClientResponseError) as cm:
+            await self.client.get_current_tv_games()
+        self.assertEqual(cm.exception.status, 429)
+
+        # Everything waits out the cool-down now, or fails fast if it can't
+        self.assertGreater(self.client.governor.cooldown_remaining, 50)
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.client.get_realtime_statuses('anyone')
+        self.assertEqual(self.stand_in.stats['429'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import chess
+from uvmcc.lichess_models import GameMove
+from uvmcc.live_game_state import LiveGameStates
+
+
+class TestLiveGameState(unittest.TestCase):
+    def setUp(self):
+        self.states = LiveGameStates()
+
+    @staticmethod
+    def _packet(board: chess.Board) -> GameMove:
+        return GameMove(fen=board.fen(), last_move=board.peek().uci())
+
+    def test_from_export_replays_only_new_moves(self):
+        state = self.states.from_export({'id': 'abc', 'moves': 'e4 e5 Nf3'})
+        self.assertEqual(state.ply, 3)
+        self.assertEqual(state.last_move_uci, 'g1f3')
+
+        state.board.push_san('Nc6')  # moves already on the board aren't replayed again
+        same_state = self.states.from_export({'id': 'abc', 'moves': 'e4 e5 Nf3 Nc6 Bb5'})
+        self.assertIs(same_state, state)
+        self.assertEqual(state.ply, 5)
+        self.assertEqual(state.last_move_uci, 'f1b5')
+
+    def test_apply_packet(self):
+        state = self.states.from_export({'id': 'abc', 'moves': 'e4'})
+        board = chess.Board()
+        board.push_san('e4')
+        board.push_san('c5')
+        packet = self._packet(board)
+
+        state.apply_packet(packet)
+        state.apply_packet(packet)  # applying the same packet twice is a no-op
+        self.assertEqual(state.board_fen, board.board_fen())
+        self.assertEqual(state.ply, 2)
+        self.assertEqual(len(state.board.move_stack), 2)
+
+    def test_stale_packets_are_ignored_and_gaps_resync(self):
+        state = self.states.from_export({'id': 'abc', 'moves': 'e4 c5'})
+        board = chess.Board()
+        board.push_san('e4')
+        state.apply_packet(self._packet(board))  # older position
+        self.assertEqual(state.ply, 2)
+
+        for san in ['c5', 'Nf3', 'd6']:
+            board.push_san(san)
+        state.apply_packet(self._packet(board))  # missed Nf3
+        self.assertEqual(state.board.fen(), board.fen())
+        self.assertEqual(state.last_move_uci, 'd7d6')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+import orjson
+import uvmcc.ndjson_stream as NJ
+
+
+class TestNdjsonStream(unittest.TestCase):
+    VALUES = [{'id': 'abc', 'fen': 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'},
+              {'fen': 'x', 'lm': 'e2e4', 'wc': 60, 'bc': 60},
+              [1, 2, 3]]
+
+    def _data(self) -> bytes:
+        lines = [orjson.dumps(v) for v in self.VALUES]
+        return lines[0] + b'\n\n' + lines[1] + b'\n' + lines[2]  # keep-alive, no trailing newline
+
+    def test_every_split_point(self):
+        data = self._data()
+        for i in range(len(data) + 1):
+            for j in range(i, len(data) + 1):
+                decoder = NJ.NdjsonDecoder()
+                values = decoder.feed(data[:i]) + decoder.feed(data[i:j]) + decoder.feed(data[j:])
+                self.assertEqual(values + decoder.finish(), self.VALUES, (i, j))
+
+    def test_loads(self):
+        self.assertEqual(NJ.loads(self._data() + b'\n'), self.VALUES)
+        self.assertEqual(NJ.loads(b''), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from uvmcc.prefix_index import UsernamePrefixIndex
+
+
+class TestUsernamePrefixIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = UsernamePrefixIndex([
+            ('Cubigami', 'lichess.org'),
+            ('cubs', 'chess.com'),
+            ('alice', 'lichess.org'),
+            ('Alicia', 'lichess.org'),
+            ('bob', 'lichess.org'),
+        ])
+
+    def test_complete(self):
+        self.assertEqual(self.index.complete('cub'), ['Cubigami', 'cubs'])
+        self.assertEqual(self.index.complete('ALI'), ['alice', 'Alicia'])
+        self.assertEqual(self.index.complete('z'), [])
+
+    def test_complete_empty_prefix_returns_all(self):
+        self.assertEqual(self.index.complete(''), ['alice', 'Alicia', 'bob', 'Cubigami', 'cubs'])
+
+    def test_complete_limit(self):
+        self.assertEqual(self.index.complete('', limit=2), ['alice', 'Alicia'])
+
+    def test_add_and_remove(self):
+        self.index.add('Cubone', 'lichess.org')
+        self.assertEqual(self.index.complete('cub'), ['Cubigami', 'Cubone', 'cubs'])
+
+        self.index.remove('CUBIGAMI')
+        self.assertEqual(self.index.complete('cub'), ['Cubone', 'cubs'])
+        self.assertNotIn('cubigami', self.index)
+
+    def test_sites(self):
+        self.index.add('bob', 'chess.com')
+        self.assertEqual(self.index.sites('Bob'), ['chess.com', 'lichess.org'])
+
+        self.index.remove('bob', 'lichess.org')
+        self.assertEqual(self.index.sites('bob'), ['chess.com'])
+        self.assertEqual(self.index.sites('nobody'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
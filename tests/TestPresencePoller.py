@@ -0,0 +1,81 @@
+import unittest
+import asyncio
+import uvmcc.presence_poller as PP
+from uvmcc.presence_poller import PresencePoller, PresenceTransition
+
+
+class TestPresencePoller(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.roster = ['Alice', 'Bob', 'Ghost']
+        self.statuses = {'alice': {'id': 'alice', 'name': 'Alice', 'online': True},
+                         'bob': {'id': 'bob', 'name': 'Bob'}}
+        self.calls = []
+
+        async def fetch(*user_ids):
+            self.calls.append(user_ids)
+            return [self.statuses[u] for u in user_ids if u in self.statuses]
+
+        async def roster():
+            return self.roster
+
+        self.poller = PresencePoller(fetch, roster, interval_seconds=60)
+
+    async def test_snapshots_and_transitions(self):
+        first = await self.poller.poll()
+        self.assertEqual([(t.username, t.before, t.after) for t in first],
+                         [('Alice', None, PP.ONLINE), ('Bob', None, PP.OFFLINE), ('ghost', None, PP.OFFLINE)])
+        self.assertEqual(self.calls, [('alice', 'bob', 'ghost')])
+
+        transitions = []
+
+        async def listener(t):
+            transitions.extend(t)
+
+        self.poller.add_listener(listener)
+        self.statuses['bob'] = {'id': 'bob', 'name': 'Bob', 'online': True, 'playing': True, 'playingId': 'g1'}
+        await self.poller.poll()
+        await asyncio.sleep(0)
+        self.assertEqual(transitions, [PresenceTransition('Bob', PP.OFFLINE, PP.PLAYING,
+                                                          self.statuses['bob'], 'g1')])
+        self.assertEqual(self.poller.snapshot.version, 2)
+
+        # Nothing changed
+        self.assertEqual(await self.poller.poll(), [])
+
+    async def test_snapshot_for(self):
+        self.assertIsNone(self.poller.snapshot_for(['alice']))
+        await self.poller.poll()
+
+        snapshot = self.poller.snapshot_for(['ALICE', 'ghost', 'bob'])
+        self.assertEqual([s['name'] for s in snapshot.statuses_for(['ALICE', 'ghost', 'bob', 'alice'])],
+                         ['Alice', 'Bob'])
+        self.assertIsNone(self.poller.snapshot_for(['alice', 'carol']))
+
+        self.poller.interval_seconds = 0
+        self.assertIsNone(self.poller.snapshot_for(['alice']))
+
+    async def test_unexpected_errors_dont_stop_polling(self):
+        roster_calls = 0
+
+        async def roster():
+            nonlocal roster_calls
+            roster_calls += 1
+            if roster_calls == 1:
+                raise RuntimeError('database went away')
+            return self.roster
+
+        self.poller = PresencePoller(self.poller._fetch, roster, interval_seconds=0.01)
+        self.poller.start()
+        for _ in range(100):
+            if self.poller.snapshot is not None:
+                break
+            await asyncio.sleep(0.01)
+        await self.poller.stop()
+
+        self.assertEqual(self.poller.failures, 1)
+        self.assertIsNotNone(self.poller.snapshot)
+        self.assertEqual(self.calls[0], ('alice', 'bob', 'ghost'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import asyncio
+import time
+from uvmcc.rate_limit import Priority, RateGovernor
+
+
+class TestRateGovernor(unittest.IsolatedAsyncioTestCase):
+    async def test_per_endpoint_buckets(self):
+        governor = RateGovernor({'slow': (20.0, 1), 'fast': (1000.0, 10)})
+        t0 = time.monotonic()
+        await asyncio.gather(*(governor.acquire('slow') for _ in range(3)),
+                             *(governor.acquire('fast') for _ in range(10)))
+        self.assertGreaterEqual(time.monotonic() - t0, 0.09)
+
+        stats = governor.stats()['endpoints']
+        self.assertEqual((stats['slow']['acquired'], stats['fast']['acquired']), (3, 10))
+        self.assertEqual(stats['slow']['max_queue_depth'], 2)  # The first one didn't wait
+        self.assertLess(stats['fast']['max_wait_seconds'], 0.05)
+
+    async def test_interactive_before_background(self):
+        governor = RateGovernor({'status': (50.0, 1)})
+        order = []
+
+        async def request(name, priority):
+            await governor.acquire('status', priority=priority)
+            order.append(name)
+
+        await governor.acquire('status')  # Empty the bucket
+        tasks = [asyncio.create_task(request(f'poll{i}', Priority.BACKGROUND)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request('show', Priority.INTERACTIVE)))
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ['show', 'poll0', 'poll1', 'poll2'])
+
+    async def test_cooldown_after_429(self):
+        governor = RateGovernor({'status': (1000.0, 10)}, cooldown_seconds=0.1)
+        governor.report_rate_limited()
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await governor.acquire('status', timeout=0.05)
+        self.assertEqual(governor.stats()['endpoints']['status']['queue_depth'], 0)
+
+        t0 = time.monotonic()
+        await governor.acquire('status', priority=Priority.BACKGROUND)
+        self.assertGreaterEqual(time.monotonic() - t0, 0.04)
+        self.assertEqual(governor.rate_limited, 1)
+
+    async def test_cancelled_waiter_lets_others_go(self):
+        governor = RateGovernor({'status': (20.0, 1)})
+        await governor.acquire('status')
+        first = asyncio.create_task(governor.acquire('status'))
+        second = asyncio.create_task(governor.acquire('status'))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.wait_for(second, 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
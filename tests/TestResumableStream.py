@@ -0,0 +1,88 @@
+import unittest
+import unittest.mock
+import aiohttp
+from uvmcc.lichess_models import GameInfo
+from uvmcc.resumable_stream import ResumableGameStream
+
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+PLAYERS = {'white': {'user': {'name': 'Alice'}, 'rating': 1500}, 'black': {'user': {'name': 'Bob'}, 'rating': 1600}}
+MOVES = ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1b5']
+
+
+def move_packet(ply: int, *, already_played: bool):
+    # Same bug as Lichess: https://github.com/lichess-org/lila/issues/12907
+    fullmove = 1 if already_played else ply // 2 + 1
+    return {'fen': f'8/8/8/8/8/8/8/8 {"bw"[ply % 2 == 0]} - - 0 {fullmove}', 'lm': MOVES[ply - 1]}
+
+
+class TestResumableGameStream(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher = unittest.mock.patch.object(ResumableGameStream, 'MIN_BACKOFF_SECONDS', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # (ply when connecting, ply the connection drops after, or None to play to the end)
+        self.connections = []
+
+    def _fake_stream(self, game_id):
+        connected_at, dropped_at = self.connections.pop(0)
+
+        async def packets():
+            yield {'id': game_id, 'fen': START_FEN, 'players': PLAYERS, 'turns': connected_at, 'startedAtTurn': 0,
+                   'status': {'id': 20, 'name': 'started'}}
+            for ply in range(1, (dropped_at or len(MOVES)) + 1):
+                yield move_packet(ply, already_played=ply <= connected_at)
+            if dropped_at is not None:
+                raise aiohttp.ClientPayloadError('Response payload is not completed')
+            yield {'id': game_id, 'fen': START_FEN, 'players': PLAYERS,
+                   'status': {'id': 31, 'name': 'resign'}, 'winner': 'white'}
+
+        return packets()
+
+    async def test_no_moves_repeated_or_lost_across_drops(self):
+        self.connections = [(1, 2), (4, 4), (4, None)]
+        stream = ResumableGameStream('abc', packets_factory=self._fake_stream)
+        items = [item async for item in stream]
+
+        self.assertEqual([p.last_move for p, _ in items[1:-1]], MOVES)
+        self.assertEqual([is_new for _, is_new in items], [None, False, True, True, True, True, None])
+        # Fullmove numbers of already-played moves are fixed
+        self.assertEqual([p.fen.rsplit(' ', 1)[1] for p, _ in items[1:-1]], ['1', '2', '2', '3', '3'])
+        self.assertEqual((items[-1][0].status_name, items[-1][0].winner), ('resign', 'white'))
+        self.assertEqual(stream.stats(), {'reconnects': 2, 'resent_skipped': 6, 'last_ply': 5})
+
+    async def test_game_finished_while_disconnected(self):
+        async def finished_stream(game_id):
+            yield {'id': game_id, 'fen': START_FEN, 'players': PLAYERS, 'turns': 5, 'status': {'id': 30, 'name': 'mate'}}
+
+        stream = ResumableGameStream('abc', packets_factory=self._fake_stream)
+        self.connections = [(0, 2)]
+        items = []
+        async for item in stream:
+            items.append(item)
+            if len(items) == 3:
+                stream._packets_factory = finished_stream
+
+        self.assertEqual(len(items), 4)
+        packet, is_new_move = items[-1]
+        self.assertIsInstance(packet, GameInfo)
+        self.assertEqual((packet.status_name, packet.turns, packet.is_over, is_new_move), ('mate', 5, True, None))
+
+    async def test_gives_up(self):
+        def not_found(game_id):
+            raise aiohttp.ClientResponseError(None, (), status=404)
+
+        with self.assertRaises(aiohttp.ClientResponseError):
+            [item async for item in ResumableGameStream('abc', packets_factory=not_found)]
+
+        def unreachable(game_id):
+            raise aiohttp.ClientConnectionError()
+
+        stream = ResumableGameStream('abc', packets_factory=unreachable)
+        with self.assertRaises(aiohttp.ClientConnectionError):
+            [item async for item in stream]
+        self.assertEqual(stream.reconnects, ResumableGameStream.MAX_CONSECUTIVE_FAILURES)
+
+
+if __name__ == '__main__':
+    unittest.main()
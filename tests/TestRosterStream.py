@@ -0,0 +1,102 @@
+import unittest
+import unittest.mock
+import asyncio
+from uvmcc.roster_stream import RosterGameStream
+
+
+def _packet(game_id, white, black, status=20):
+    return {'id': game_id, 'status': status,
+            'players': {'white': {'userId': white, 'rating': 1500}, 'black': {'userId': black, 'rating': 1600}}}
+
+
+def _export(game_id, white, black):
+    return {'id': game_id, 'clock': {'initial': 180, 'increment': 0},
+            'players': {'white': {'user': {'name': white, 'id': white.lower()}, 'rating': 1500},
+                        'black': {'user': {'name': black, 'id': black.lower()}, 'rating': 1600}}}
+
+
+class TestRosterGameStream(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.roster = ['Alice', 'Bob', 'Carol']
+        self.connections = []
+        self.export_calls = []
+        self.exports = {'g1': _export('g1', 'Alice', 'Outsider'),
+                        'g2': _export('g2', 'Bob', 'Carol'),
+                        'g3': _export('g3', 'Outsider', 'Carol')}
+
+        async def stream(*user_ids):
+            queue = asyncio.Queue()
+            self.connections.append((user_ids, queue))
+            while (packet := await queue.get()) is not None:
+                if isinstance(packet, Exception):
+                    raise packet
+                yield packet
+
+        async def export(*game_ids):
+            self.export_calls.append(game_ids)
+            return [self.exports[g] for g in game_ids if g in self.exports]
+
+        async def roster():
+            return self.roster
+
+        self.announced = []
+
+        async def listener(game):
+            self.announced.append(game.id)
+
+        patcher = unittest.mock.patch.object(RosterGameStream, 'MIN_BACKOFF_SECONDS', 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.stream = RosterGameStream(stream, export, roster, roster_check_seconds=0.02, settle_seconds=0.02)
+        self.stream.add_listener(listener)
+        self.stream.start()
+        await asyncio.sleep(0.01)
+
+    async def asyncTearDown(self):
+        await self.stream.stop()
+
+    def send(self, *packets):
+        for packet in packets:
+            self.connections[-1][1].put_nowait(packet)
+
+    async def test_live_games_table(self):
+        self.assertIsNone(self.stream.games_for(['alice']))
+        self.assertEqual(self.connections[0][0], ('alice', 'bob', 'carol'))
+
+        # Already going when we connected: exported together, not announced
+        self.send(_packet('g1', 'alice', 'outsider'), _packet('g2', 'bob', 'carol'))
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.export_calls, [('g1', 'g2')])
+        self.assertEqual({k: g.id for k, g in self.stream.games_for(['Alice', 'Bob', 'carol']).items()},
+                         {'alice': 'g1', 'bob': 'g2', 'carol': 'g2'})
+        self.assertIsNone(self.stream.games_for(['Alice', 'Outsider']))
+
+        self.send(_packet('g2', 'bob', 'carol', status=31), _packet('g3', 'outsider', 'carol'))
+        await asyncio.sleep(0.02)
+        self.assertEqual({k: g.id for k, g in self.stream.games_for(['bob', 'carol']).items()}, {'carol': 'g3'})
+        self.assertEqual(self.announced, ['g3'])
+
+    async def test_reconnects_on_roster_change_and_failure(self):
+        self.send(_packet('g1', 'alice', 'outsider'))
+        await asyncio.sleep(0.05)
+
+        self.roster = ['Alice', 'Bob', 'Carol', 'Dave']
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(self.connections[1][0], ('alice', 'bob', 'carol', 'dave'))
+        self.assertEqual(self.stream.roster_changes, 1)
+
+        # Lichess resends current games; they're not announced again
+        self.send(_packet('g1', 'alice', 'outsider'))
+        await asyncio.sleep(0.05)
+        self.assertIn('alice', self.stream.games_for(['alice', 'dave']))
+
+        self.send(ConnectionResetError())
+        await asyncio.sleep(0.05)
+        self.assertEqual((self.stream.failures, len(self.connections)), (1, 3))
+        self.assertEqual(self.announced, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
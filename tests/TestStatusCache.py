@@ -0,0 +1,41 @@
+import unittest
+import asyncio
+from uvmcc.status_cache import RealtimeStatusCache
+
+
+class TestRealtimeStatusCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.calls = []
+
+        async def fetch(*user_ids):
+            self.calls.append(user_ids)
+            await asyncio.sleep(0.01)
+            return [{'id': u, 'name': u.capitalize(), 'online': True} for u in user_ids if u != 'ghost']
+
+        self.cache = RealtimeStatusCache(fetch, ttl_seconds=60)
+
+    async def test_order_and_missing_users(self):
+        statuses = await self.cache.get_statuses('Bob', 'ghost', 'alice', 'bob')
+        self.assertEqual([s['name'] for s in statuses], ['Bob', 'Alice'])
+
+    async def test_hits_within_ttl(self):
+        await self.cache.get_statuses('alice', 'bob')
+        await self.cache.get_statuses('bob', 'carol')
+        self.assertEqual(self.calls, [('alice', 'bob'), ('carol',)])
+        self.assertEqual(self.cache.hits, 1)
+
+    async def test_concurrent_requests_are_coalesced(self):
+        results = await asyncio.gather(*(self.cache.get_statuses('alice', 'bob') for _ in range(10)))
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.cache.coalesced, 18)
+        self.assertTrue(all(r == results[0] for r in results))
+
+    async def test_expired_entries_are_refetched(self):
+        self.cache.ttl_seconds = 0
+        await self.cache.get_statuses('alice')
+        await self.cache.get_statuses('alice')
+        self.assertEqual(len(self.calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import asyncio
+from uvmcc.stream_hub import GameStreamHub, UpstreamFailed
+
+
+class TestGameStreamHub(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.opened = []
+        self.closed = []
+        self.moves = asyncio.Queue()
+
+        async def fake_stream(game_id):
+            self.opened.append(game_id)
+            try:
+                yield {'id': game_id}, None
+                while (packet := await self.moves.get()) is not None:
+                    if isinstance(packet, Exception):
+                        raise packet
+                    yield packet, True
+                yield {'id': game_id, 'status': {'id': 31}}, None
+            finally:
+                self.closed.append(game_id)
+
+        self.hub = GameStreamHub(fake_stream)
+
+    async def _collect(self, game_id, into):
+        async for packet, _ in self.hub.subscribe(game_id):
+            into.append(packet)
+
+    async def test_one_upstream_for_many_subscribers(self):
+        received = [[], [], []]
+        tasks = [asyncio.create_task(self._collect('abc', r)) for r in received]
+        await asyncio.sleep(0)
+        self.moves.put_nowait({'lm': 'e2e4'})
+        self.moves.put_nowait(None)
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(self.opened, ['abc'])
+        self.assertEqual(self.hub.num_upstreams, 0)
+        for r in received:
+            self.assertEqual(r, [{'id': 'abc'}, {'lm': 'e2e4'}, {'id': 'abc', 'status': {'id': 31}}])
+
+    async def test_late_joiner_gets_latest(self):
+        early = []
+        early_task = asyncio.create_task(self._collect('abc', early))
+        self.moves.put_nowait({'lm': 'e2e4'})
+        self.moves.put_nowait({'lm': 'e7e5'})
+        while len(early) < 3:
+            await asyncio.sleep(0)
+
+        late = []
+        late_task = asyncio.create_task(self._collect('abc', late))
+        await asyncio.sleep(0)
+        self.moves.put_nowait(None)
+        await asyncio.gather(early_task, late_task)
+
+        self.assertEqual(late, [{'lm': 'e7e5'}, {'id': 'abc', 'status': {'id': 31}}])
+        self.assertEqual(self.opened, ['abc'])
+
+    async def test_upstream_closed_when_last_subscriber_leaves(self):
+        subscriptions = [self.hub.subscribe('abc'), self.hub.subscribe('abc')]
+        for s in subscriptions:
+            await anext(s)
+        self.assertEqual(self.hub.num_subscribers('abc'), 2)
+
+        await subscriptions[0].aclose()
+        self.assertEqual(self.hub.num_upstreams, 1)
+        await subscriptions[1].aclose()
+        await asyncio.sleep(0)
+
+        self.assertEqual(self.hub.num_upstreams, 0)
+        self.assertEqual(self.closed, ['abc'])
+
+    async def test_upstream_failure_reaches_every_subscriber(self):
+        received = [[], []]
+        tasks = [asyncio.create_task(self._collect('abc', r)) for r in received]
+        await asyncio.sleep(0)
+        self.moves.put_nowait({'lm': 'e2e4'})
+        self.moves.put_nowait(ConnectionResetError('dropped'))
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        for r, result in zip(received, results):
+            self.assertEqual(r, [{'id': 'abc'}, {'lm': 'e2e4'}])
+            self.assertIsInstance(result, UpstreamFailed)
+            self.assertIsInstance(result.__cause__, ConnectionResetError)
+        self.assertEqual(self.hub.num_upstreams, 0)
+
+    async def test_slow_subscriber_drops_oldest(self):
+        subscription = self.hub.subscribe('abc')
+        await anext(subscription)
+        for i in range(GameStreamHub.SUBSCRIBER_QUEUE_SIZE + 10):
+            self.moves.put_nowait({'ply': i})
+        self.moves.put_nowait(None)
+        while self.hub.num_upstreams:
+            await asyncio.sleep(0)
+
+        rest = [packet async for packet, _ in subscription]
+        # The end-of-stream marker takes up one spot in the queue
+        self.assertEqual(len(rest), GameStreamHub.SUBSCRIBER_QUEUE_SIZE - 1)
+        self.assertEqual(rest[-1], {'id': 'abc', 'status': {'id': 31}})
+        self.assertEqual(self.hub.stats()['dropped'], 12)
+        self.assertEqual(self.hub.stats()['max_queue_depth'], GameStreamHub.SUBSCRIBER_QUEUE_SIZE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+import unittest.mock
+import uvmcc.database_utils as D
+import uvmcc.username_autocomplete as UA
+import uvmcc.username_cache as UC
+
+
+class FakeLichess:
+    def __init__(self, usernames, delay: float = 0):
+        self.usernames = sorted(usernames)
+        self.delay = delay
+        self.terms = []
+
+    async def __call__(self, term: str):
+        self.terms.append(term)
+        await asyncio.sleep(self.delay)
+        return [u for u in self.usernames if u.lower().startswith(term.lower())][:10]
+
+
+class TestUsernameAutocomplete(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        cache = UC.ChessUsernamesCache()
+        cache.ensure_loaded = unittest.mock.AsyncMock(return_value=D.QueryExitCode.UNKNOWN_FAILURE)
+        patcher = unittest.mock.patch.object(UC, 'CACHE', cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_longer_prefix_filters_complete_result(self):
+        lichess = FakeLichess(['Magnus', 'MagnusCarlsen', 'Magpie', 'Zhigalko'])
+        autocompleter = UA.UsernameAutocompleter(lichess, debounce_seconds=0)
+
+        self.assertEqual(await autocompleter.complete('mag'), ['Magnus', 'MagnusCarlsen', 'Magpie'])
+        self.assertEqual(await autocompleter.complete('magn'), ['Magnus', 'MagnusCarlsen'])
+        self.assertEqual(await autocompleter.complete('Mag'), ['Magnus', 'MagnusCarlsen', 'Magpie'])
+        self.assertEqual(lichess.terms, ['mag'])
+        self.assertEqual((autocompleter.filtered_hits, autocompleter.hits), (1, 1))
+
+        # A full page of results might be missing matches for the longer prefix
+        lichess = FakeLichess([f'Player{i:02d}' for i in range(20)])
+        autocompleter = UA.UsernameAutocompleter(lichess, debounce_seconds=0)
+        await autocompleter.complete('pla')
+        self.assertEqual(await autocompleter.complete('player1'), [f'Player{i}' for i in range(10, 20)])
+        self.assertEqual(lichess.terms, ['pla', 'player1'])
+
+    async def test_short_prefix_skips_lichess(self):
+        lichess = FakeLichess(['Magnus'])
+        autocompleter = UA.UsernameAutocompleter(lichess, debounce_seconds=0)
+        self.assertEqual(await autocompleter.complete('ma'), [])
+        self.assertEqual(lichess.terms, [])
+
+    async def test_new_keystroke_supersedes_lookup(self):
+        lichess = FakeLichess(['Magnus', 'Magpie'], delay=0.05)
+        autocompleter = UA.UsernameAutocompleter(lichess, debounce_seconds=0.05)
+
+        first = asyncio.create_task(autocompleter.complete('mag', user_key=1))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(autocompleter.complete('magp', user_key=1))
+        other = asyncio.create_task(autocompleter.complete('magn', user_key=2))
+
+        self.assertEqual(await first, [])
+        self.assertEqual(await second, ['Magpie'])
+        self.assertEqual(await other, ['Magnus'])
+        self.assertEqual(sorted(lichess.terms), ['magn', 'magp'])
+        self.assertEqual(autocompleter.superseded, 1)
+
+    async def test_ttl_and_lru(self):
+        lichess = FakeLichess(['Alice', 'Bob', 'Carol'])
+        autocompleter = UA.UsernameAutocompleter(lichess, debounce_seconds=0, max_cached_prefixes=2)
+
+        with unittest.mock.patch('time.monotonic', return_value=0.0):
+            await autocompleter.complete('ali')
+            await autocompleter.complete('bob')
+            await autocompleter.complete('ali')
+            await autocompleter.complete('car')  # evicts 'bob'
+            await autocompleter.complete('bob')
+        self.assertEqual(lichess.terms, ['ali', 'bob', 'car', 'bob'])
+
+        with unittest.mock.patch('time.monotonic', return_value=autocompleter.ttl_seconds):
+            await autocompleter.complete('bob')
+        self.assertEqual(lichess.terms, ['ali', 'bob', 'car', 'bob', 'bob'])
+
+    async def test_local_usernames_first(self):
+        UC.CACHE.ensure_loaded.return_value = D.QueryExitCode.SUCCESS
+        UC.CACHE._replace_all(UC.ChessUsernameRecord(u, 'lichess') for u in ['magpie', 'Maggie', 'someone'])
+        lichess = FakeLichess(['Magnus', 'Magpie'])
+        autocompleter = UA.UsernameAutocompleter(lichess, debounce_seconds=0)
+
+        self.assertEqual(await autocompleter.complete('mag'), ['Maggie', 'magpie', 'Magnus'])
+
+
+if __name__ == '__main__':
+    unittest.main()
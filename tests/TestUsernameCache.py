@@ -0,0 +1,99 @@
+import unittest
+import asyncio
+import unittest.mock
+import uvmcc.database_utils as D
+import uvmcc.username_cache as UC
+from uvmcc.username_cache import ChessUsernamesCache, ChessUsernameRecord
+
+
+class TestChessUsernamesCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ChessUsernamesCache()
+        self.cache.put(ChessUsernameRecord('Cubigami', 'lichess.org', None, 'Cubigami#3114'))
+        self.cache.put(ChessUsernameRecord('alice', 'lichess.org'))
+        self.cache.put(ChessUsernameRecord('Bob', 'chess.com', None, 'Cubigami#3114'))
+
+    def test_get_is_case_insensitive(self):
+        self.assertEqual(self.cache.get('CUBIGAMI', 'Lichess.org').username, 'Cubigami')
+        self.assertIsNone(self.cache.get('carol', 'lichess.org'))
+        self.assertIsNone(self.cache.get('Cubigami', 'chess.com'))
+
+    def test_same_username_on_two_sites(self):
+        self.cache.put(ChessUsernameRecord('alice', 'chess.com', None, 'alice#0001'))
+        self.assertEqual(self.cache.get('alice', 'lichess.org').discord_id, None)
+        self.assertEqual(self.cache.get('alice', 'chess.com').discord_id, 'alice#0001')
+        self.assertEqual(self.cache.sites_for('alice'), ['chess.com', 'lichess.org'])
+
+        self.cache.discard('alice', 'lichess.org')
+        self.assertEqual(self.cache.usernames(site='chess.com'), ['alice', 'Bob'])
+        self.assertEqual(self.cache.sites_for('alice'), ['chess.com'])
+        self.cache.put(ChessUsernameRecord('alice', 'lichess.org'))
+        self.cache.discard('ALICE')
+        self.assertEqual(self.cache.complete_username('al'), [])
+
+    def test_usernames_by_site(self):
+        self.assertEqual(self.cache.usernames(site='lichess.org'), ['alice', 'Cubigami'])
+        self.assertEqual(self.cache.usernames(site='Chess.com'), ['Bob'])
+
+    def test_usernames_by_discord_id(self):
+        self.assertEqual(self.cache.usernames(discord_id='Cubigami#3114'), ['Bob', 'Cubigami'])
+        self.assertEqual(self.cache.usernames(discord_id='Cubigami#3114', site='chess.com'), ['Bob'])
+
+    def test_put_replaces_old_indexes(self):
+        self.cache.put(ChessUsernameRecord('ALICE', 'lichess.org', None, 'alice#0001'))
+        self.assertEqual(self.cache.usernames(discord_id='alice#0001'), ['ALICE'])
+        self.assertEqual(self.cache.usernames(site='lichess.org'), ['ALICE', 'Cubigami'])
+
+        self.cache.put(ChessUsernameRecord('alice', 'lichess.org'))
+        self.assertEqual(self.cache.usernames(discord_id='alice#0001'), [])
+
+    def test_discard(self):
+        self.cache.discard('bob')
+        self.cache.discard('not-there')
+        self.assertIsNone(self.cache.get('Bob', 'chess.com'))
+        self.assertEqual(self.cache.usernames(site='chess.com'), [])
+        self.assertEqual(self.cache.usernames(discord_id='Cubigami#3114'), ['Cubigami'])
+
+    def test_prefix_index_follows_writes(self):
+        self.assertEqual(self.cache.complete_username('cu'), ['Cubigami'])
+        self.cache.put(ChessUsernameRecord('Cubone', 'chess.com'))
+        self.cache.discard('cubigami')
+        self.assertEqual(self.cache.complete_username('cu'), ['Cubone'])
+        self.assertEqual(self.cache.sites_for('CUBONE'), ['chess.com'])
+
+
+class TestReconcile(unittest.IsolatedAsyncioTestCase):
+    async def test_writes_during_reconcile_are_kept(self):
+        cache = ChessUsernamesCache()
+        cache.put(ChessUsernameRecord('alice', 'lichess.org'))
+        cache.put(ChessUsernameRecord('Bob', 'chess.com'))
+        query_started = asyncio.Event()
+        finish_query = asyncio.Event()
+
+        async def db_query(*args, **kwargs):
+            # The table as of before the writes below
+            query_started.set()
+            await finish_query.wait()
+            return D.QueryExitCode.SUCCESS, [('alice', 'lichess.org', None, None), ('Bob', 'chess.com', None, None)]
+
+        with unittest.mock.patch.object(UC.D, 'db_query', db_query):
+            reconcile = asyncio.create_task(cache.reconcile())
+            await query_started.wait()
+            cache.put(ChessUsernameRecord('carol', 'lichess.org'))
+            cache.discard('bob')
+            finish_query.set()
+            self.assertEqual(await reconcile, D.QueryExitCode.SUCCESS)
+
+        self.assertEqual(cache.usernames(), ['alice', 'carol'])
+        self.assertEqual(cache.complete_username('b'), [])
+
+        # Later writes aren't replayed by the next load
+        cache.discard('carol')
+        with unittest.mock.patch.object(UC.D, 'db_query', db_query):
+            finish_query.set()
+            await cache.reconcile()
+        self.assertEqual(cache.usernames(), ['alice', 'Bob'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import uvmcc.chess_com_api as CC
+import uvmcc.lichess_api as L
+import uvmcc.rate_limit as R
+from uvmcc.uvmcc_logging import logger
+
+from typing import Any, Awaitable, Callable, Dict, List
+
+import aiohttp
+import asyncio
+import time
+
+
+UserJson = Dict[str, Any]
+
+
+async def _fetch_from_lichess(*usernames: str) -> List[UserJson]:
+    return await L.CLIENT.get_users_by_id(*usernames, priority=R.Priority.BACKGROUND)
+
+
+async def _fetch_from_chess_com(*usernames: str) -> List[UserJson]:
+    """ Chess.com profiles have no bio in the API, so the code goes in their ``location`` instead. """
+    return [{'id': p['username'], 'profile': {'bio': p.get('location', '')}}
+            for p in await CC.CLIENT.get_players(*usernames, priority=R.Priority.BACKGROUND)]
+
+
+class _PendingVerification:
+    __slots__ = ('username', 'code', 'deadline', 'waiter')
+
+    def __init__(self, username: str, code: str, deadline: float, waiter: asyncio.Future):
+        self.username = username
+        self.code = code
+        self.deadline = deadline
+        self.waiter = waiter
+
+
+class BioVerificationScheduler:
+    """
+    Checks the Lichess bios of everyone in the middle of ``/iam`` for their verification code.
+
+    Pending verifications are all checked together: every ``tick_seconds``, one bulk
+    ``POST /api/users`` request gets the bios of every pending username (up to
+    ``L.LichessClient.USERS_MAX_IDS`` of them), however many verifications are pending.
+    Waiters are resolved as soon as their code shows up, and expired after the first
+    check past their deadline.
+
+    ``CHESS_COM_VERIFIER`` does the same for Chess.com profiles, which are fetched concurrently
+    instead (see ``CC.ChessComClient.get_players()``) and checked as often as they're revalidated.
+    """
+
+    TICK_SECONDS = 10.0
+
+    def __init__(self,
+                 fetch: Callable[..., Awaitable[List[UserJson]]] = _fetch_from_lichess,
+                 *,
+                 tick_seconds: float = TICK_SECONDS):
+        self._fetch = fetch
+        self.tick_seconds = tick_seconds
+
+        self._pending: List[_PendingVerification] = []
+        self._ticker: asyncio.Task | None = None
+
+        self.ticks = 0
+        self.upstream_calls = 0
+        self.verified = 0
+        self.expired = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'ticks': self.ticks,
+                'upstream_calls': self.upstream_calls,
+                'verified': self.verified,
+                'expired': self.expired,
+                'pending': len(self._pending)}
+
+    async def verify(self, username: str, code: str, *, expires_in: float) -> bool:
+        """
+        Wait until ``code`` is in ``username``'s Lichess bio (``True``), or until it's been
+        ``expires_in`` seconds without it (``False``).
+        """
+        entry = _PendingVerification(username, code,
+                                     time.monotonic() + expires_in,
+                                     asyncio.get_running_loop().create_future())
+        self._pending.append(entry)
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.create_task(self._run())
+
+        try:
+            # The ticker enforces the deadline, but don't wait forever if it's gone
+            return await asyncio.wait_for(entry.waiter, expires_in + self.tick_seconds)
+        except asyncio.TimeoutError:
+            logger.error(f'BioVerificationScheduler: {username} was never checked before the deadline')
+            self.expired += 1
+            return False
+        finally:
+            # Also when whoever was waiting gave up
+            if entry in self._pending:
+                self._pending.remove(entry)
+
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(self.tick_seconds)
+            try:
+                await self._tick()
+            except Exception as e:
+                # Ex. a malformed profile. Keep ticking, so pending verifications still expire.
+                logger.error(f'BioVerificationScheduler: tick failed ({type(e).__name__}: {e})')
+
+    async def _tick(self):
+        self.ticks += 1
+        pending = [e for e in self._pending if not e.waiter.done()]
+        if not pending:
+            return
+
+        checked_at = time.monotonic()
+        usernames = list(dict.fromkeys(e.username.lower() for e in pending))
+        try:
+            self.upstream_calls += 1
+            users = await self._fetch(*usernames)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Try again next tick, unless it's too late
+            logger.error(f'BioVerificationScheduler: failed to get {len(usernames)} profiles '
+                         f'({type(e).__name__}: {e})')
+            users = []
+
+        bios = {u['id']: u.get('profile', {}).get('bio', '') for u in users}
+        for entry in pending:
+            if entry.waiter.done():
+                continue
+            if entry.code in bios.get(entry.username.lower(), ''):
+                self.verified += 1
+                entry.waiter.set_result(True)
+            elif checked_at >= entry.deadline:
+                self.expired += 1
+                entry.waiter.set_result(False)
+
+
+VERIFIER = BioVerificationScheduler()
+CHESS_COM_VERIFIER = BioVerificationScheduler(_fetch_from_chess_com,
+                                              tick_seconds=CC.ChessComClient.CACHE_TTL_SECONDS['player'])
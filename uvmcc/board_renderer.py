@@ -0,0 +1,179 @@
+from typing import Dict, List, Sequence, Tuple
+
+import chess
+import numpy as np
+from PIL import Image
+
+import functools
+import io
+import os
+
+
+SPRITES_DIR = os.path.join(os.path.dirname(__file__), 'assets', 'pieces')
+
+# Same colors as web-boardimage/Lichess
+LIGHT_SQUARE_COLOR = (0xf0, 0xd9, 0xb5)
+DARK_SQUARE_COLOR = (0xb5, 0x88, 0x63)
+LIGHT_LAST_MOVE_COLOR = (0xcd, 0xd1, 0x6a)
+DARK_LAST_MOVE_COLOR = (0xaa, 0xa2, 0x3b)
+
+# Number of encoded frames kept by ``render_board_png()``. Frames for a 500px board are
+# roughly 20-50 KB, so this caps the cache at a few tens of MB.
+BOARD_IMAGE_CACHE_SIZE = 1024
+
+PNG_COMPRESS_LEVEL = 3
+
+# Positions composited at once by ``render_boards()``. Bounds the size of the intermediate
+# arrays (about 0.75 MB per position at 500px).
+RENDER_CHUNK_SIZE = 32
+
+# Index of each piece in the square atlas and in board layouts. 0 is an empty square.
+ATLAS_PIECE_SYMBOLS = ['', *'PNBRQK', *'pnbrqk']
+
+# A position to render: (board, last move in UCI or ``None``)
+BoardPositionT = Tuple[chess.BaseBoard, str | None]
+
+
+@functools.cache
+def _load_sprites() -> Dict[str, Image.Image]:
+    """ Load the full-resolution piece sprites, keyed by piece symbol (ex. ``'N'``, ``'n'``). """
+    sprites = {}
+    for piece_type in chess.PIECE_TYPES:
+        for color in chess.COLORS:
+            piece = chess.Piece(piece_type, color)
+            filename = f'{"w" if color else "b"}{piece.symbol().upper()}.png'
+            with Image.open(os.path.join(SPRITES_DIR, filename)) as img:
+                sprites[piece.symbol()] = img.convert('RGBA')
+    return sprites
+
+
+# Backgrounds a square can have, in square atlas order
+SQUARE_ATLAS_COLORS = [DARK_SQUARE_COLOR, LIGHT_SQUARE_COLOR, DARK_LAST_MOVE_COLOR, LIGHT_LAST_MOVE_COLOR]
+
+
+@functools.lru_cache(maxsize=16)
+def _square_atlas(square_px: int) -> np.ndarray:
+    """
+    Get every square a board can be made of, already composited: each piece (or no piece),
+    in ``ATLAS_PIECE_SYMBOLS`` order, over each background in ``SQUARE_ATLAS_COLORS``. The
+    result has shape ``(4, 13, square_px, square_px, 3)``, so drawing a board only takes
+    a lookup per square instead of blending pixels.
+    """
+    backgrounds = np.array(SQUARE_ATLAS_COLORS, dtype=np.uint16)[:, None, None, None, :]
+
+    premultiplied = np.zeros((len(ATLAS_PIECE_SYMBOLS), square_px, square_px, 3), dtype=np.uint16)
+    inverse_alpha = np.full((len(ATLAS_PIECE_SYMBOLS), square_px, square_px, 1), 255, dtype=np.uint16)
+    sprites = _load_sprites()
+    for i, symbol in enumerate(ATLAS_PIECE_SYMBOLS[1:], start=1):
+        rgba = np.asarray(sprites[symbol].resize((square_px, square_px), Image.LANCZOS), dtype=np.uint16)
+        premultiplied[i] = rgba[..., :3] * rgba[..., 3:]
+        inverse_alpha[i] = 255 - rgba[..., 3:]
+
+    # background * (1 - alpha) + piece * alpha
+    return ((backgrounds * inverse_alpha + premultiplied) // 255).astype(np.uint8)
+
+
+@functools.lru_cache(maxsize=2)
+def _display_order(orientation: chess.COLOR_NAMES) -> np.ndarray:
+    """ Get the square shown at each position on the board image, left to right, top to bottom. """
+    if orientation == chess.COLOR_NAMES[chess.BLACK]:
+        return np.array([chess.square(7 - i % 8, i // 8) for i in range(64)])
+    return np.array([chess.square(i % 8, 7 - i // 8) for i in range(64)])
+
+
+# Index of each square's background in ``SQUARE_ATLAS_COLORS``, without highlights
+_IS_LIGHT_SQUARE = np.array([(chess.square_file(sq) + chess.square_rank(sq)) % 2 for sq in chess.SQUARES],
+                            dtype=np.intp)
+
+
+def board_layout(board: chess.BaseBoard) -> np.ndarray:
+    """
+    Get the board's 64 squares (``a1``, ``b1``, ..., ``h8``) as indices into ``ATLAS_PIECE_SYMBOLS``,
+    computed from its bitboards rather than square by square.
+    """
+    masks = np.array([board.pieces_mask(piece_type, color)
+                      for color in (chess.WHITE, chess.BLACK)
+                      for piece_type in chess.PIECE_TYPES], dtype='<u8')
+    bits = np.unpackbits(masks.view(np.uint8).reshape(12, 8), axis=1, bitorder='little')
+    return (bits * np.arange(1, 13, dtype=np.uint8)[:, None]).sum(axis=0, dtype=np.uint8)
+
+
+def board_image_size(size: int) -> int:
+    """ Boards are made of 8 whole squares, so the image is ``size`` rounded down to a multiple of 8. """
+    return size // 8 * 8
+
+
+def composite_boards(layouts: np.ndarray,
+                     highlights: np.ndarray,
+                     *,
+                     orientation: chess.COLOR_NAMES = chess.COLOR_NAMES[chess.WHITE],
+                     size: int = 360) -> np.ndarray:
+    """
+    Composite a batch of boards in one go. ``layouts`` is a ``(n, 64)`` array like
+    ``board_layout()`` returns and ``highlights`` is a ``(n, 64)`` bool array of squares to
+    highlight. Return the images as a ``(n, board_image_size(size), board_image_size(size), 3)``
+    ``uint8`` array.
+    """
+    square_px = size // 8
+    n = len(layouts)
+    order = _display_order(orientation)
+
+    backgrounds = _IS_LIGHT_SQUARE[order] + 2 * highlights[:, order]
+    squares = _square_atlas(square_px)[backgrounds, layouts[:, order]]
+
+    return (squares.reshape(n, 8, 8, square_px, square_px, 3)
+                   .transpose(0, 1, 3, 2, 4, 5)
+                   .reshape(n, 8 * square_px, 8 * square_px, 3))
+
+
+def _encode(image: np.ndarray, image_format: str) -> bytes:
+    buf = io.BytesIO()
+    if image_format.upper() == 'PNG':
+        Image.fromarray(image).save(buf, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
+    else:
+        Image.fromarray(image).save(buf, format=image_format)
+    return buf.getvalue()
+
+
+def render_boards(positions: Sequence[BoardPositionT],
+                  *,
+                  orientation: chess.COLOR_NAMES = chess.COLOR_NAMES[chess.WHITE],
+                  size: int = 360,
+                  image_format: str = 'PNG') -> List[bytes]:
+    """
+    Render a batch of ``(board, last_move_uci)`` positions (ex. every position of a game, for
+    a replay or GIF) and return the encoded images in the same order. Pieces and highlights
+    for the whole batch are composited with vectorized array operations.
+    """
+    images = []
+    for start in range(0, len(positions), RENDER_CHUNK_SIZE):
+        chunk = positions[start:start + RENDER_CHUNK_SIZE]
+
+        layouts = np.stack([board_layout(board) for board, _ in chunk])
+        highlights = np.zeros((len(chunk), 64), dtype=bool)
+        for i, (_, last_move_uci) in enumerate(chunk):
+            if last_move_uci is not None:
+                move = chess.Move.from_uci(last_move_uci)
+                highlights[i, [move.from_square, move.to_square]] = True
+
+        composited = composite_boards(layouts, highlights, orientation=orientation, size=size)
+        images.extend(_encode(image, image_format) for image in composited)
+
+    return images
+
+
+@functools.lru_cache(maxsize=BOARD_IMAGE_CACHE_SIZE)
+def render_board_png(board_fen: str,
+                     *,
+                     orientation: chess.COLOR_NAMES = chess.COLOR_NAMES[chess.WHITE],
+                     last_move_uci: str | None = None,
+                     size: int = 360) -> bytes:
+    """
+    Return a PNG image of the board described by ``board_fen`` (the first component of a FEN),
+    highlighting the last move (optional). Results are cached by all the arguments, so common
+    positions (ex. openings) are only ever drawn once. The image is ``board_image_size(size)``
+    pixels wide.
+    """
+    return render_boards([(chess.BaseBoard(board_fen), last_move_uci)],
+                         orientation=orientation,
+                         size=size)[0]
@@ -14,9 +14,9 @@ async def on_ready():
     logger.info(f'Logged in as {bot.user}')
     logger.info(f'=============' + '='*len(str(bot.user)))
 
-    await D.init_dbs()
+    init_dbs_seconds = await D.init_dbs()
 
-    print(f'{bot.user} is ready and online!')
+    print(f'{bot.user} is ready and online! (init_dbs() took {init_dbs_seconds * 1000:.0f} ms)')
 
 
 COGS = [
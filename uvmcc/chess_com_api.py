@@ -0,0 +1,250 @@
+import uvmcc.constants as C
+import uvmcc.disk_cache as DC
+import uvmcc.rate_limit as R
+from uvmcc import __version__
+
+from typing import Any, Dict, List, AsyncIterator, Tuple
+
+import aiohttp
+import asyncio
+import contextlib
+import datetime
+import time
+
+import orjson
+
+
+def _datetime_from_seconds(seconds: int) -> datetime.datetime:
+    """ Chess.com timestamps are Unix seconds; convert them like Lichess ones (UTC, timezone-aware). """
+    return datetime.datetime.fromtimestamp(seconds, tz=datetime.timezone.utc)
+
+
+def _convert_timestamps(data: Dict[str, Any], *keys: str) -> Dict[str, Any]:
+    for key in keys:
+        if key in data:
+            data[key] = _datetime_from_seconds(data[key])
+    return data
+
+
+def proper_username(player: Dict[str, Any]) -> str:
+    """
+    Correctly capitalized username of a Chess.com profile. ``player['username']`` is always
+    lowercase, but the profile URL (ex. ``https://www.chess.com/member/Hikaru``) isn't.
+    """
+    return player['url'].rstrip('/').rsplit('/', 1)[-1]
+
+
+def is_online(player: Dict[str, Any], *, window_seconds: float = C.CHESS_COM_ONLINE_WINDOW_SECONDS) -> bool:
+    """
+    Whether a Chess.com profile was seen in the last ``window_seconds``. Chess.com's public
+    API has no realtime presence endpoint, so ``last_online`` is the best there is.
+    """
+    last_online = player.get('last_online')
+    return last_online is not None and time.time() - last_online.timestamp() < window_seconds
+
+
+class ChessComClient:
+    """
+    Non-blocking client for Chess.com's published-data API (https://www.chess.com/news/view/published-data-api),
+    built on one shared ``aiohttp.ClientSession`` like ``L.LichessClient``.
+
+    Every request waits for its turn from ``governor`` (see ``R.RateGovernor``). Chess.com doesn't
+    limit serial requests, but answers parallel ones with 429s, so the limits below are modest.
+
+    With a ``cache``, responses are kept on disk (see ``DC.DiskCache.fetch()``), and once stale they're
+    revalidated with ``If-None-Match``/``If-Modified-Since``: an unchanged profile or archive
+    costs a 304 instead of a download. Past months' archives hardly ever change, so they're
+    kept much longer than the current month's.
+
+    Non-2xx responses raise ``aiohttp.ClientResponseError`` (404 for players that don't exist).
+    Requests that can't get a turn within their timeout raise ``asyncio.TimeoutError``.
+    """
+
+    BASE_URL = 'https://api.chess.com'
+    # Chess.com asks API users to say who they are
+    USER_AGENT = f'UVMCC-Discord-Bot/{__version__} (+{C.LINK_TO_CODE})'
+
+    # Connection pool settings
+    MAX_CONNECTIONS = 10
+    KEEPALIVE_SECONDS = 60
+
+    # Most profiles/archive months fetched at a time for one call
+    MAX_CONCURRENT_REQUESTS = 4
+
+    # (requests per second, burst) allowed for each endpoint
+    RATE_LIMITS = {
+        'player': (3.0, 6),
+        'archives': (2.0, 4),
+        'archive': (3.0, 6),
+    }
+    RATE_LIMITED_COOLDOWN_SECONDS = 60.0
+
+    # How long responses of each endpoint are fresh in ``cache`` before they're revalidated
+    CACHE_TTL_SECONDS = {
+        'player': 60.0,
+        'archives': 60 * 60.0,
+        'archive': 5 * 60.0,
+        'past_archive': 30 * 24 * 60 * 60.0,
+    }
+
+    TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+    def __init__(self,
+                 base_url: str = BASE_URL,
+                 *,
+                 governor: R.RateGovernor | None = None,
+                 cache: DC.DiskCache | None = None):
+        self.base_url = base_url.rstrip('/')
+        self.governor = governor or R.RateGovernor(ChessComClient.RATE_LIMITS,
+                                                   cooldown_seconds=ChessComClient.RATE_LIMITED_COOLDOWN_SECONDS)
+        self.cache = cache
+        self._session: aiohttp.ClientSession | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """ Get the shared session, creating it on first use (it must be created inside the event loop). """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=ChessComClient.MAX_CONNECTIONS,
+                                             keepalive_timeout=ChessComClient.KEEPALIVE_SECONDS)
+            self._session = aiohttp.ClientSession(base_url=self.base_url,
+                                                  connector=connector,
+                                                  headers={'User-Agent': ChessComClient.USER_AGENT},
+                                                  raise_for_status=True)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        if self.cache is not None:
+            await self.cache.close()
+
+    @contextlib.asynccontextmanager
+    async def _request(self,
+                       path: str,
+                       *,
+                       endpoint: str,
+                       priority: R.Priority,
+                       **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """ ``session.get()``, once ``governor`` gives ``endpoint`` a turn. """
+        await self.governor.acquire(endpoint, priority=priority, timeout=ChessComClient.TIMEOUT.total)
+        try:
+            async with self._get_session().get(path, timeout=ChessComClient.TIMEOUT, **kwargs) as response:
+                yield response
+        except aiohttp.ClientResponseError as e:
+            if e.status == 429:
+                self.governor.report_rate_limited()
+            raise
+
+    async def _get_json(self,
+                        path: str,
+                        *,
+                        endpoint: str,
+                        priority: R.Priority,
+                        ttl_seconds: float) -> Any:
+        """ GET ``path``, answered from ``cache`` while fresh and revalidated with a conditional GET after. """
+        if self.cache is None:
+            async with self._request(path, endpoint=endpoint, priority=priority) as response:
+                return await response.json()
+
+        body = await self.cache.fetch(f'GET {path}',
+                                      lambda headers: self._request(path, endpoint=endpoint, priority=priority,
+                                                                    headers=headers),
+                                      ttl_seconds=ttl_seconds)
+        return orjson.loads(body)
+
+    async def get_player(self,
+                         username: str,
+                         *,
+                         priority: R.Priority = R.Priority.INTERACTIVE) -> Dict[str, Any]:
+        """
+        Profile of ``username`` (``last_online`` and ``joined`` converted to ``datetime.datetime``).
+        https://www.chess.com/news/view/published-data-api#pubapi-endpoint-player
+        """
+        data = await self._get_json(f'/pub/player/{username.lower()}',
+                                    endpoint='player',
+                                    priority=priority,
+                                    ttl_seconds=ChessComClient.CACHE_TTL_SECONDS['player'])
+        return _convert_timestamps(data, 'last_online', 'joined')
+
+    async def get_players(self,
+                          *usernames: str,
+                          priority: R.Priority = R.Priority.INTERACTIVE) -> List[Dict[str, Any]]:
+        """
+        Profiles of ``usernames``, fetched concurrently (at most ``MAX_CONCURRENT_REQUESTS`` at a
+        time) since Chess.com has no bulk endpoint. Profiles are in the same order as ``usernames``,
+        leaving out ones that don't exist.
+        """
+        semaphore = asyncio.Semaphore(ChessComClient.MAX_CONCURRENT_REQUESTS)
+
+        async def _fetch(username: str) -> Dict[str, Any] | None:
+            async with semaphore:
+                try:
+                    return await self.get_player(username, priority=priority)
+                except aiohttp.ClientResponseError as e:
+                    if e.status == 404:
+                        return None
+                    raise
+
+        players = await asyncio.gather(*(_fetch(u) for u in usernames))
+        return [p for p in players if p is not None]
+
+    async def get_archive_months(self,
+                                 username: str,
+                                 *,
+                                 priority: R.Priority = R.Priority.INTERACTIVE) -> List[Tuple[int, int]]:
+        """
+        The ``(year, month)`` of every monthly archive ``username`` has games in, oldest first.
+        https://www.chess.com/news/view/published-data-api#pubapi-endpoint-games-archive-list
+        """
+        data = await self._get_json(f'/pub/player/{username.lower()}/games/archives',
+                                    endpoint='archives',
+                                    priority=priority,
+                                    ttl_seconds=ChessComClient.CACHE_TTL_SECONDS['archives'])
+        # Ex. https://api.chess.com/pub/player/hikaru/games/2024/03
+        return [(int(url.split('/')[-2]), int(url.split('/')[-1])) for url in data['archives']]
+
+    async def get_monthly_archive(self,
+                                  username: str,
+                                  year: int,
+                                  month: int,
+                                  *,
+                                  priority: R.Priority = R.Priority.INTERACTIVE) -> List[Dict[str, Any]]:
+        """
+        Finished games ``username`` played in the given month (``end_time`` converted to ``datetime.datetime``).
+        https://www.chess.com/news/view/published-data-api#pubapi-endpoint-games-archive
+        """
+        today = datetime.datetime.now(tz=datetime.timezone.utc)
+        is_past_month = (year, month) < (today.year, today.month)
+        data = await self._get_json(f'/pub/player/{username.lower()}/games/{year}/{month:02}',
+                                    endpoint='archive',
+                                    priority=priority,
+                                    ttl_seconds=ChessComClient.CACHE_TTL_SECONDS['past_archive' if is_past_month
+                                                                                 else 'archive'])
+        return [_convert_timestamps(g, 'end_time') for g in data['games']]
+
+    async def get_games(self,
+                        username: str,
+                        *,
+                        months: int | None = None,
+                        priority: R.Priority = R.Priority.INTERACTIVE) -> List[Dict[str, Any]]:
+        """
+        Finished games ``username`` played in their last ``months`` archive months (all of them
+        if ``None``), oldest first. Months are fetched concurrently, at most
+        ``MAX_CONCURRENT_REQUESTS`` at a time.
+        """
+        archive_months = await self.get_archive_months(username, priority=priority)
+        if months is not None:
+            archive_months = archive_months[-months:] if months > 0 else []
+
+        semaphore = asyncio.Semaphore(ChessComClient.MAX_CONCURRENT_REQUESTS)
+
+        async def _fetch(year: int, month: int) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await self.get_monthly_archive(username, year, month, priority=priority)
+
+        archives = await asyncio.gather(*(_fetch(year, month) for year, month in archive_months))
+        return [game for archive in archives for game in archive]
+
+
+CLIENT = ChessComClient(C.CHESS_COM_BASE_URL,
+                        cache=DC.DiskCache(C.CHESS_COM_CACHE_PATH, max_entries=C.CHESS_COM_CACHE_MAX_ENTRIES)
+                        if C.CHESS_COM_CACHE_PATH else None)
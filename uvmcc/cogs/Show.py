@@ -1,51 +1,187 @@
+import uvmcc.board_renderer as BR
 import uvmcc.constants as C
 import uvmcc.utils as U
 import uvmcc.error_msgs as E
 import uvmcc.database_utils as D
+import uvmcc.embed_updater as EU
+import uvmcc.export_batcher as EB
+import uvmcc.lichess_api as L
+import uvmcc.lichess_models as LM
+import uvmcc.live_game_state as LGS
+import uvmcc.presence_poller as PP
+import uvmcc.roster_stream as RS
+import uvmcc.status_cache as SC
+import uvmcc.stream_hub as SH
+import uvmcc.username_cache as UC
 from uvmcc.uvmcc_logging import logger
 
-from typing import Dict, List, Any, Tuple
+from typing import Any, Dict, List, Tuple
 
 import chess
-import chess.pgn
 import discord
 from discord.ext import commands
 
+import aiohttp
+import asyncio
 import io
 import re
+import time
 
 
 class Show(commands.Cog):
     STREAM_GAME_MOVES_AFTER_SHOW = True
     EMBED_BOARD_SIZE_PX = 500
+    EMBED_BOARD_FILENAME = 'board.png'
 
     def __init__(self, bot: discord.Bot):
         self.bot = bot
+        if C.GAME_STARTED_CHANNEL_ID is not None:
+            RS.ROSTER.add_listener(self._announce_game_started)
+
+    def cog_unload(self):
+        asyncio.create_task(RS.ROSTER.stop())
+        asyncio.create_task(PP.POLLER.stop())
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Who's playing is pushed by Lichess from now on, and everyone else's presence is polled
+        RS.ROSTER.start()
+        PP.POLLER.start()
+
+    async def _announce_game_started(self, game: LM.LiveGame):
+        """ Post that someone on the roster started a game (see ``RS.RosterGameStream.add_listener()``). """
+        channel = self.bot.get_channel(C.GAME_STARTED_CHANNEL_ID)
+        if channel is None:
+            logger.warning(f'Channel {C.GAME_STARTED_CHANNEL_ID} for game announcements not found')
+            return
+
+        roster_keys = {u.lower() for u in UC.CACHE.usernames(site=U.SupportedSites.LICHESS)}
+        time_ctrl = U.format_lichess_time_control(game.clock) if game.clock is not None else 'Correspondence'
+        for color in chess.COLORS:
+            player = game.player(color)
+            if player.id not in roster_keys:
+                continue
+            opponent = game.player(not color)
+            e = discord.Embed(title=f'{player.name} started a game!',
+                              description=f'{time_ctrl} against {opponent.name} '
+                                          f'({opponent.rating or "?"}) - '
+                                          f'[Spectate]({C.LICHESS_GAME_LINK(game.id, color)}) '
+                                          f'or `/watch player:{player.name}`',
+                              color=C.LICHESS_BROWN_COLOR)
+            e.set_footer(text=C.EMBED_FOOTER)
+            await channel.send(embed=e)
+            # Once per game, even if two members are playing each other
+            return
+
+    @staticmethod
+    async def _board_image_file(board_fen: str,
+                                *,
+                                orientation: chess.COLOR_NAMES,
+                                last_move_uci: str | None) -> discord.File:
+        """
+        Render the board locally (cached by position) and wrap it in a ``discord.File``
+        that an embed can show with ``e.set_image(url=f'attachment://{Show.EMBED_BOARD_FILENAME}')``.
+        """
+        # Rendering a new position takes a few ms of CPU, so keep it off the event loop
+        png = await asyncio.to_thread(BR.render_board_png,
+                                      board_fen,
+                                      orientation=orientation,
+                                      last_move_uci=last_move_uci,
+                                      size=Show.EMBED_BOARD_SIZE_PX)
+        return discord.File(io.BytesIO(png), filename=Show.EMBED_BOARD_FILENAME)
+
+    @staticmethod
+    async def _export_live_games(*game_ids: str) -> Tuple[Dict[str, LM.LiveGame], Dict[str, str]]:
+        """
+        Export live games (batched with other commands' exports, see ``EB.ExportBatcher``) as
+        ``LM.LiveGame``s by id, and their SAN moves by id. Nothing else of the export is kept,
+        since a ``/watch`` holds on to its games until the featured one ends.
+        """
+        live_games, live_game_moves = {}, {}
+        for game_json in await EB.BATCHER.export(*game_ids):
+            live_games[game_json['id']] = LM.LiveGame.from_json(game_json)
+            live_game_moves[game_json['id']] = game_json.get('moves', '')
+        return live_games, live_game_moves
+
+    @staticmethod
+    async def _get_lichess_statuses(usernames: List[str]) -> Tuple[List[Dict], PP.PresenceSnapshot | None]:
+        """
+        Statuses of Lichess ``usernames``, from the last ``PP.POLLER`` snapshot if it has all of
+        them (also returned, so its age can be shown), or else from ``SC.CACHE``.
+        """
+        if not usernames:
+            return [], None
+        presence_snapshot = PP.POLLER.snapshot_for(usernames)
+        if presence_snapshot is not None:
+            return presence_snapshot.statuses_for(usernames), presence_snapshot
+        return await SC.CACHE.get_statuses(*usernames), None
 
     @staticmethod
     async def _show_usernames(ctx: discord.ApplicationContext,
                               e: discord.Embed,
                               usernames: List[str],
                               *,
+                              chess_com_usernames: List[str] = (),
                               msg_on_empty: str = None,
                               stream_new_moves: bool = False,
                               only_live: bool = False):
-        if not usernames:
+        if not usernames and not chess_com_usernames:
             assert msg_on_empty is not None, \
                 E.INTERNAL_ERROR_MSG + ' msg_on_empty should not be None here. Error in _get_usernames()?'
             e.add_field(name='No players :(', value=msg_on_empty)
             return await ctx.respond(embed=e)
 
         logger.debug(f'_show_usernames(): usernames={usernames}, '
+                     f'chess_com_usernames={chess_com_usernames}, '
                      f'stream_new_moves={stream_new_moves}, '
                      f'only_live={only_live}')
-        user_statuses = C.BERSERK_CLIENT.users.get_realtime_statuses(*usernames, with_game_ids=True)
+        # Both sites are asked at the same time, so Chess.com members don't slow the response down
+        lichess_result, chess_com_result = await asyncio.gather(Show._get_lichess_statuses(usernames),
+                                                                SC.CHESS_COM_CACHE.get_statuses(*chess_com_usernames),
+                                                                return_exceptions=True)
+        for result in (lichess_result, chess_com_result):
+            if isinstance(result, BaseException) \
+                    and not isinstance(result, (aiohttp.ClientError, asyncio.TimeoutError)):
+                raise result
+        if isinstance(lichess_result, BaseException):
+            logger.error(f'_show_usernames(): failed to get statuses '
+                         f'({type(lichess_result).__name__}: {lichess_result})')
+            return await ctx.respond(E.LICHESS_UNAVAILABLE_MSG)
+        user_statuses, presence_snapshot = lichess_result
+        if isinstance(chess_com_result, BaseException):
+            # Still show the Lichess members
+            logger.error(f'_show_usernames(): failed to get Chess.com statuses '
+                         f'({type(chess_com_result).__name__}: {chess_com_result})')
+            chess_com_statuses = []
+            e.add_field(name='Chess.com unavailable', value=E.CHESS_COM_UNAVAILABLE_MSG, inline=False)
+        else:
+            chess_com_statuses = chess_com_result
+
+        # Live games of players on the roster come from ``RS.ROSTER`` (``None`` for anyone else)
+        roster_games = RS.ROSTER.games_for(usernames)
+        if roster_games is not None:
+            user_statuses = [{**d, 'playing': True, 'playingId': roster_games[d['id']].id}
+                             if d['id'] in roster_games else {**d, 'playing': False}
+                             for d in user_statuses]
         playing = [d for d in user_statuses if d.get('playing')]
         online = [d for d in user_statuses if not d.get('playing') and d.get('online')]
         offline = [d for d in user_statuses if not d.get('playing') and not d.get('online')]
 
         featured_game_description = ''
+        board_files = []
 
+        # SAN moves of exported games, by id (games in ``RS.ROSTER`` are exported without them)
+        live_game_moves: Dict[str, str] = {}
+        if playing and roster_games is not None:
+            live_games_by_id = {g.id: g for g in roster_games.values()}
+        elif playing:
+            try:
+                live_games_by_id, live_game_moves = await Show._export_live_games(*(d['playingId'] for d in playing))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                logger.error(f'_show_usernames(): failed to export live games ({type(ex).__name__}: {ex})')
+                return await ctx.respond(E.LICHESS_UNAVAILABLE_MSG)
+            # A game may have just been aborted/deleted, and then it's not exported
+            playing = [d for d in playing if d['playingId'] in live_games_by_id]
 
         if playing:
             '''
@@ -57,25 +193,12 @@ class Show(commands.Cog):
             of the player (to show the game from the higher-rated player's POV).
             '''
 
-            def _max_rating(live_game_data: dict) -> int:
-                """ Get the higher rating of the white/black side. """
-                return max(live_game_data['players']['white']['rating'],
-                           live_game_data['players']['black']['rating'])
+            live_games_data = {d['name']: live_games_by_id[d['playingId']] for d in playing}
 
-            def _username_rating(live_game_data: dict, username: str) -> int:
-                """ Get the rating of the side with the given username. """
-                user_color = chess.COLOR_NAMES[live_game_data['players']['white']['user']['name'] == username]
-                return live_game_data['players'][user_color]['rating']
-
-            # Note - relying here on the berserk api preserving order
-            # between input ids list and output data list
-            live_games_data = dict(zip([d['name'] for d in playing],
-                                       [*C.BERSERK_CLIENT.games.export_multi(*(d['playingId'] for d in playing))]))
-
-            # _up in lambda below is (username_proper_caps, pgn)
-            live_games_data: Dict[str, Dict[str, Any]] \
+            # _ug in lambda below is (username_proper_caps, live_game)
+            live_games_data: Dict[str, LM.LiveGame] \
                 = dict(sorted(live_games_data.items(),
-                              key=lambda _up: (_max_rating(_up[1]), _username_rating(_up[1], _up[0])),
+                              key=lambda _ug: (_ug[1].max_rating, _ug[1].player(_ug[1].color_of(_ug[0])).rating or 0),
                               reverse=True))
             playing.sort(key=lambda _u: [*live_games_data.keys()].index(_u['name']))
 
@@ -84,55 +207,29 @@ class Show(commands.Cog):
             for i, (username, live_game_data) in enumerate(live_games_data.items()):
                 '''
                 Example live_game_data:
-                
-                {
-                    'id': 'Qhvz5ujU',
-                    'rated': True,
-                    'variant': 'standard',
-                    'speed': 'blitz',
-                    'perf': 'blitz',
-                    'createdAt': datetime.datetime(2023, 6, 2, 19, 24, 32, 726000, tzinfo=datetime.timezone.utc),
-                    'lastMoveAt': datetime.datetime(2023, 6, 2, 19, 26, 0, 114000, tzinfo=datetime.timezone.utc),
-                    'status': 'started',
-                    'players': {
-                        'white': {
-                            'user': {
-                                'name': 'Ellaijio',
-                                'title': 'IM',
-                                'id': 'ellaijio'
-                            },
-                            'rating': 2603
-                        },
-                        'black': {
-                            'user': {
-                                'name': 'pulvettd',
-                                'title': 'IM',
-                                'id': 'pulvettd'
-                            },
-                            'rating': 2526
-                        }
-                    },
-                    'moves': 'e4 c5 Nf3 d6 d4 cxd4 Nxd4 Nf6 Nc3 a6 f4 e5 Nf3 Nbd7 g4 Nxg4 Bc4 h6 Rg1 Ngf6 Be3 b5 Bd5 b4 Bxa8 bxc3 bxc3 Qa5 Qd2 Be7',
-                    'clock': {
-                        'initial': 180,
-                        'increment': 0,
-                        'totalTime': 180
-                    }
-                }
+
+                LiveGame(id='Qhvz5ujU',
+                         white=Player(name='Ellaijio', rating=2603, title='IM', rating_diff=None),
+                         black=Player(name='pulvettd', rating=2526, title='IM', rating_diff=None),
+                         variant='standard', speed='blitz', rated=True,
+                         clock=Clock(initial=180, increment=0), initial_fen=None)
                 '''
 
                 # Top-rated game gets the featured img
                 shown_below = 'Shown below - ' if i == 0 else ''
 
-                player_color: chess.Color = username == live_game_data['players']['white']['name']
-                url = C.LICHESS_GAME_LINK(live_game_data['id'], player_color)
+                player_color = live_game_data.color_of(username)
+                url = C.LICHESS_GAME_LINK(live_game_data.id, player_color)
 
-                time_ctrl = U.format_lichess_time_control(live_game_data['clock'])
+                if live_game_data.clock is not None:
+                    time_ctrl = U.format_lichess_time_control(live_game_data.clock)
+                else:
+                    time_ctrl = 'Correspondence'
 
-                if live_game_data['variant'] == 'standard':
+                if live_game_data.variant == 'standard':
                     variant = ''
                 else:
-                    variant = f' {live_game_data["variant"].capitalize()}'
+                    variant = f' {live_game_data.variant.capitalize()}'
 
                 lines.append(f'**`{username}`**: Playing {time_ctrl}{variant} on Lichess '
                              f'({shown_below}[Spectate]({url}))')
@@ -150,51 +247,68 @@ class Show(commands.Cog):
             featured_player_username = featured_player_status_data['name']
 
             featured_game_data = live_games_data[featured_player_username]
-            featured_game_id = featured_game_data['id']
-            featured_game_obj = chess.pgn.read_game(io.StringIO(featured_game_data['moves'])) \
-                                or chess.pgn.Game()  # read_game() -> None if reading empty string
-
-            featured_game_fen = featured_game_obj.end().board().fen()
-            featured_game_orientation = chess.COLOR_NAMES[
-                featured_game_obj.headers['White'] == featured_player_username]
-            if featured_game_obj.end().move is None:
-                # No moves in this game yet
-                featured_game_last_move_uci = None
-            else:
-                featured_game_last_move_uci = featured_game_obj.end().move.uci()
-            featured_game_img = U.get_board_image_url(featured_game_fen,
-                                                      orientation=featured_game_orientation,
-                                                      last_move_uci=featured_game_last_move_uci,
-                                                      size=Show.EMBED_BOARD_SIZE_PX)
-            e.set_image(url=featured_game_img)
+            featured_game_id = featured_game_data.id
+            featured_game_moves = live_game_moves.get(featured_game_id)
+            # The other games' moves aren't needed
+            live_game_moves.clear()
+            if featured_game_moves is None:
+                # Games in ``RS.ROSTER`` are exported without moves when they start, so get
+                # the current position (unless the game ended in the meantime)
+                try:
+                    featured_game_moves = (await Show._export_live_games(featured_game_id))[1].get(featured_game_id)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                    # Show the last position we know of instead
+                    logger.error(f'_show_usernames(): failed to export featured game {featured_game_id} '
+                                 f'({type(ex).__name__}: {ex})')
+            # Shared with any other command showing this game, so the SAN moves are
+            # only replayed the first time it's seen
+            featured_game_state = LGS.STATES.for_game(featured_game_data, featured_game_moves or '')
+            # Only needed until the position is on the board
+            del featured_game_moves
+            featured_game_orientation = chess.COLOR_NAMES[featured_game_data.color_of(featured_player_username)]
+            board_files.append(await Show._board_image_file(featured_game_state.board_fen,
+                                                            orientation=featured_game_orientation,
+                                                            last_move_uci=featured_game_state.last_move_uci))
+            e.set_image(url=f'attachment://{Show.EMBED_BOARD_FILENAME}')
 
             # Set the string that will be prepended to embed's footer at end of function
-            w_username = featured_game_data['players']['white']['user']['name']
-            b_username = featured_game_data['players']['black']['user']['name']
-            w_elo = featured_game_data['players']['white']['rating']
-            b_elo = featured_game_data['players']['black']['rating']
-            w_title = featured_game_data['players']['white']['user'].get('title')
-            b_title = featured_game_data['players']['black']['user'].get('title')
+            w_username = featured_game_data.white.name
+            b_username = featured_game_data.black.name
+            w_elo = featured_game_data.white.rating
+            b_elo = featured_game_data.black.rating
+            w_title = featured_game_data.white.title
+            b_title = featured_game_data.black.title
             featured_game_description = f'{{}}{f"{w_title} " if w_title else ""}{w_username} ({w_elo}{{}}) ' \
                                         f'- {f"{b_title} " if b_title else ""}{b_username} ({b_elo}{{}}) ' \
                                         f'on Lichess\n\n'
         elif only_live:
-            top_live_username = C.BERSERK_CLIENT.tv.get_current_games()['Blitz']['user']['name']
+            try:
+                top_live_username = (await L.CLIENT.get_current_tv_games())['Blitz']['user']['name']
+            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                logger.error(f'_show_usernames(): failed to get TV games ({type(ex).__name__}: {ex})')
+                top_live_username = None
             e.add_field(name='No players with live games :(',
-                        value=f'How about `/watch player:{top_live_username}`?')
+                        value=f'How about `/watch player:{top_live_username}`?' if top_live_username
+                              else 'How about watching [Lichess TV](https://lichess.org/tv)?')
+
+        # Chess.com's API doesn't show live games, so its members are only ever active or offline
+        online.extend(d | {'site': U.SupportedSites.CHESS_COM} for d in chess_com_statuses if d['online'])
+        offline.extend(d for d in chess_com_statuses if not d['online'])
 
         if online and not only_live:
-            lines = [f'**`{u["name"]}`**: Active on Lichess' for u in online]
+            lines = [f'**`{u["name"]}`**: Active on '
+                     f'{"Chess.com" if u.get("site") == U.SupportedSites.CHESS_COM else "Lichess"}'
+                     for u in online]
             e.add_field(name='Active  ⚡', value='\n'.join(lines), inline=False)
 
         if offline and not only_live:
             lines = [f'**`{u["name"]}`**' for u in offline]
             e.add_field(name='Offline  💤', value='\n'.join(lines), inline=False)
 
-        e.set_footer(text=featured_game_description.format('', '', '') + C.EMBED_FOOTER)
+        presence_age = f'Updated {presence_snapshot.age_seconds:.0f}s ago\n' if presence_snapshot is not None else ''
+        e.set_footer(text=featured_game_description.format('', '', '') + presence_age + C.EMBED_FOOTER)
 
-        await ctx.respond(embed=e)
-        # msg = await ctx.respond(embed=e)
+        await ctx.respond(embed=e, files=board_files)
 
         if not stream_new_moves or not playing:
             return
@@ -206,11 +320,9 @@ class Show(commands.Cog):
 
         # Explicit raise for PyCharm typehints
         try:
-            featured_game_obj
+            featured_game_state
             try:
                 featured_game_id
-                featured_game_fen
-                featured_game_last_move_uci
                 featured_game_orientation
                 featured_player_username
                 in_game_embed_field
@@ -226,42 +338,61 @@ class Show(commands.Cog):
         # the same as in the initial packet (**not** until it's the same as the FEN set in the
         # current embed image - ex. for <=bullet games, maybe several moves have been played
         # since the last API call, and we don't want to update the image for every one of those)
-        async for packet, is_new_move in U.stream_moves_lichess(featured_game_id):
-
-            if not is_new_move:
-                continue
-
-            # Update the embed image
-            # TODO - Explore discord docs to see if uploading attachment and using it as
-            #   embed url is less jumpy:
-            #   https://discord.com/developers/docs/reference#editing-message-attachments-using-attachments-within-embeds
-            new_board_img_url = U.get_board_image_url(packet['fen'],
+        # Edits are rate-limited and latest-wins, so in fast games some positions are skipped.
+        embed_updater = EU.EmbedUpdater(ctx.interaction.edit_original_response)
+
+        async def render_board() -> Dict[str, Any]:
+            # Update the embed image by replacing the attachment it points to. Only called for
+            # frames that are actually sent, so skipped positions are never rendered.
+            # https://discord.com/developers/docs/reference#editing-message-attachments-using-attachments-within-embeds
+            board_file = await Show._board_image_file(featured_game_state.board_fen,
                                                       orientation=featured_game_orientation,
-                                                      last_move_uci=packet.get('lm'),
-                                                      size=Show.EMBED_BOARD_SIZE_PX)
-            e.set_image(url=new_board_img_url)
-            await msg.edit(embed=e)
+                                                      last_move_uci=featured_game_state.last_move_uci)
+            return {'file': board_file, 'attachments': []}
 
-        # Explicit raise for PyCharm typehints
+        packet = None
+        received_at = time.monotonic()
         try:
-            packet
-        except NameError:
-            raise
+            async for packet, is_new_move in SH.HUB.subscribe(featured_game_id):
+                received_at = time.monotonic()
+
+                if not is_new_move:
+                    continue
+
+                # Ignored if another command following this game already applied it
+                featured_game_state.apply_packet(packet)
+
+                embed_updater.submit(created_at=received_at, embed=e.copy(), render=render_board)
+        except SH.UpstreamFailed as ex:
+            logger.error(f'_show_usernames(): lost the stream of game {featured_game_id} '
+                         f'({type(ex.__cause__).__name__}: {ex.__cause__})')
+            packet = None
+
+        LGS.STATES.discard(featured_game_id)
+        if not (isinstance(packet, LM.GameInfo) and packet.is_over):
+            # The stream failed (or ended without saying how the game ended), so keep
+            # the last position we showed, but say it's not live anymore
+            in_game_embed_field.name = 'Live Feed Lost  📡'
+            e.set_footer(text=featured_game_description.format('', '', '')
+                              + 'Lost the live feed of this game, so this is the last position we saw.\n'
+                              + C.EMBED_FOOTER)
+            result = await embed_updater.finish(created_at=time.monotonic(), embed=e)
+            logger.info(f'Stopped streaming game {featured_game_id}: {embed_updater.stats()}')
+            return result
 
         ''' At this point the game is over, and we have the last packet with info about result '''
-
-        if packet.get('winner') is None:
+        if packet.winner is None:
             result = '1/2-1/2'
-        elif packet['winner'] == 'white':
+        elif packet.winner == 'white':
             result = '1-0'
         else:
-            assert packet['winner'] == 'black'
+            assert packet.winner == 'black'
             result = '0-1'
 
-        if featured_game_orientation == packet.get('winner'):
+        if featured_game_orientation == packet.winner:
             featured_player_won = True
             emoji = '<:winner:971525261835264081>'
-        elif packet.get('winner') is None:
+        elif packet.winner is None:
             featured_player_won = None
             if featured_game_orientation == 'white':
                 emoji = '<:draw_white:971525015654789230>'
@@ -289,9 +420,10 @@ class Show(commands.Cog):
             37: ('{} lost by forfeit', '{} won, opponent forfeited'),
             60: ('{} lost', '{} won'),  # Variant end
         }
-        status_id = packet['status']['id']
+        status_id = packet.status_id
         if status_id not in STATUS_ID_MAP:
-            logger.warning(f'Unexpected status_id (reason for game end). packet[\'status\']: {packet["status"]}. '
+            logger.warning(f'Unexpected status_id (reason for game end). Status: {packet.status_id} '
+                           f'({packet.status_name}). '
                            f'Check https://github.com/lichess-org/lila/blob/master/ui/game/src/status.ts')
             status_id = -1
         end_msg = STATUS_ID_MAP[status_id][featured_player_won or 0].format(featured_player_username)
@@ -310,74 +442,81 @@ class Show(commands.Cog):
         in_game_embed_field.name = f'Game Over {emoji}'
         in_game_embed_field.value = '\n'.join(lines)
 
+        # Rated games that were aborted (for example) don't have rating changes
         e.set_footer(text=featured_game_description.format(
             '',  # f'{result} - ',
-            f'{packet["players"]["white"]["ratingDiff"]:+}' if packet.get('rated') else '',
-            f'{packet["players"]["black"]["ratingDiff"]:+}' if packet.get('rated') else '')
+            f'{packet.white.rating_diff:+}' if packet.rated and packet.white.rating_diff is not None else '',
+            f'{packet.black.rating_diff:+}' if packet.rated and packet.black.rating_diff is not None else '')
                           + C.EMBED_FOOTER)
 
         # TODO compare loading speed in Discord of these methods.
         #   `edit_original_response()` is a "lower level interface" to `InteractionMessage.edit()`
-        return await ctx.interaction.edit_original_response(embed=e)
-        # return await msg.edit(embed=e)
+        result = await embed_updater.finish(created_at=received_at, embed=e)
+        logger.info(f'Finished streaming game {featured_game_id}: {embed_updater.stats()}')
+        return result
 
     @staticmethod
-    async def _get_usernames(ctx, player, site) -> Tuple[List[str], str | None]:
+    def _split_by_site(records: List[UC.ChessUsernameRecord], site: str | None) -> Tuple[List[str], List[str]]:
+        """ Lichess and Chess.com usernames of ``records`` (only ``site``'s, if given). """
+        by_site = {U.SupportedSites.LICHESS: [], U.SupportedSites.CHESS_COM: []}
+        for record in records:
+            if site is None or record.site.lower() == site.lower():
+                by_site.get(record.site.lower(), []).append(record.username)
+        return by_site[U.SupportedSites.LICHESS], by_site[U.SupportedSites.CHESS_COM]
+
+    @staticmethod
+    async def _get_usernames(ctx, player, site) -> Tuple[List[str], List[str], str | None] | None:
         """
-        Return a list of usernames to show in a response based on user's command arguments,
-        and a ``msg_on_empty`` message to respond with if the resulting list is empty
-        (message is ``None`` for a non-empty list).
+        Return lists of Lichess and Chess.com usernames to show in a response based on user's
+        command arguments, and a ``msg_on_empty`` message to respond with if both lists are
+        empty (message is ``None`` otherwise). Return ``None`` if the usernames couldn't be
+        looked up, in which case the user has already been told.
 
         If user entered a value for ``player`` and it's not a Discord tag/ID, it should be
-        interpreted as a chess username (so we can set ``usernames`` right away). For other
-        cases, we need to do a ``db_query()`` to get the appropriate usernames.
-
-        TODO: use ``site`` to handle Lichess/chess.com APIs differently.
+        interpreted as a chess username on ``site`` (Lichess if not given), so we can set the
+        usernames right away. For other cases, we look up the appropriate usernames in
+        ``UC.CACHE``, only for ``site`` if it was given.
         """
         msg_on_empty = None
         if not player:
             # Show all players in db
-            _, results = await D.db_query('SELECT username FROM chess_usernames '
-                                          'WHERE site = %s '
-                                          'ORDER BY username',
-                                          params=(str(U.SupportedSites.LICHESS),),
-                                          auto_respond_on_fail=ctx)
-            usernames = [e for e, in results]
-            if not usernames:
+            if await UC.CACHE.ensure_loaded(auto_respond_on_fail=ctx) != D.QueryExitCode.SUCCESS:
+                return None
+            usernames, chess_com_usernames = Show._split_by_site(UC.CACHE.records(), site)
+            if not usernames and not chess_com_usernames:
                 msg_on_empty = f'There are no players in our database. Add yourselves with ' \
                                f'`/add player:<username> site:<{"/".join(U.SupportedSites)}>`!'
         elif player.lower() == 'me':
             # Show chess accounts linked to the author's discord_id
-            _, results = await D.db_query('SELECT username FROM chess_usernames '
-                                          'WHERE discord_id = %s',
-                                          params=(str(ctx.author),),
-                                          auto_respond_on_fail=ctx)
-            usernames = [e for e, in results]
-            if not usernames:
+            if await UC.CACHE.ensure_loaded(auto_respond_on_fail=ctx) != D.QueryExitCode.SUCCESS:
+                return None
+            usernames, chess_com_usernames = Show._split_by_site(UC.CACHE.records(discord_id=str(ctx.author)), site)
+            if not usernames and not chess_com_usernames:
                 msg_on_empty = f'You don\'t have any chess usernames linked to your Discord ' \
                                f'account in our database. Use `/add player:<username> ' \
                                f'site:<{"/".join(U.SupportedSites)}>`, then ' \
                                f'`/iam player:<username> site:<{"/".join(U.SupportedSites)}>` to link one!'
         elif U.is_valid_discord_tag(player):
             # Show one player by looking up chess accounts linked to their discord_id
-            _, results = await D.db_query('SELECT username FROM chess_usernames '
-                                          'WHERE discord_id = %s',
-                                          params=(player,),
-                                          auto_respond_on_fail=ctx)
-            usernames = [e for e, in results]
-            if not usernames:
+            if await UC.CACHE.ensure_loaded(auto_respond_on_fail=ctx) != D.QueryExitCode.SUCCESS:
+                return None
+            usernames, chess_com_usernames = Show._split_by_site(UC.CACHE.records(discord_id=player), site)
+            if not usernames and not chess_com_usernames:
                 msg_on_empty = f'`{player}` doesn\'t have any chess usernames linked to their Discord ' \
                                f'account in our database. They can use `/add player:<username> ' \
                                f'site:<{"/".join(U.SupportedSites)}>`, then `/iam player:<username> ' \
                                f'site:<{"/".join(U.SupportedSites)}>` to link one!'
+        elif site is not None and site.lower() == U.SupportedSites.CHESS_COM:
+            # Show one player by a Chess.com username (not necessarily one in the db)
+            usernames, chess_com_usernames = [], [player]
         else:
-            # Show one player by a chess username (not necessarily one in the db)
-            usernames = [player]
+            # Show one player by a Lichess username (not necessarily one in the db)
+            usernames, chess_com_usernames = [player], []
 
-        return usernames, msg_on_empty
+        return usernames, chess_com_usernames, msg_on_empty
 
     @discord.slash_command(name='show',
-                           description='Show player statuses on Lichess (Chess.com support coming soon!)')
+                           description='Show player statuses on Lichess and Chess.com')
     async def show(self,
                    ctx: discord.ApplicationContext,
                    player: discord.Option(str,
@@ -385,16 +524,20 @@ class Show(commands.Cog):
                    site: discord.Option(str,
                                         description='Which chess site?',
                                         choices=U.SUPPORTED_SITES_LIST) = None):
-        e = discord.Embed(title='Lichess Player Statuses',
+        e = discord.Embed(title='Player Statuses',
                           color=C.LICHESS_BROWN_COLOR)
         e.set_author(name=self.bot.user.name,
                      url=C.LINK_TO_CODE)
 
         await ctx.response.defer(invisible=False)
-        usernames, msg_on_empty = await Show._get_usernames(ctx, player, site)
+        found = await Show._get_usernames(ctx, player, site)
+        if found is None:
+            return
+        usernames, chess_com_usernames, msg_on_empty = found
         await Show._show_usernames(ctx,
                                    e,
                                    usernames,
+                                   chess_com_usernames=chess_com_usernames,
                                    msg_on_empty=msg_on_empty,
                                    stream_new_moves=False,
                                    only_live=False)
@@ -414,10 +557,14 @@ class Show(commands.Cog):
                      url=C.LINK_TO_CODE)
 
         await ctx.response.defer(invisible=False)
-        usernames, msg_on_empty = await Show._get_usernames(ctx, player, site)
+        found = await Show._get_usernames(ctx, player, site)
+        if found is None:
+            return
+        usernames, chess_com_usernames, msg_on_empty = found
         await Show._show_usernames(ctx,
                                    e,
                                    usernames,
+                                   chess_com_usernames=chess_com_usernames,
                                    msg_on_empty=msg_on_empty,
                                    stream_new_moves=True,
                                    only_live=True)
@@ -2,66 +2,71 @@ import uvmcc.utils as U
 import uvmcc.error_msgs as E
 import uvmcc.constants as C
 import uvmcc.database_utils as D
+import uvmcc.chess_com_api as CC
+import uvmcc.lichess_api as L
+import uvmcc.username_cache as UC
+import uvmcc.username_autocomplete as UA
+import uvmcc.bio_verification as BV
 from uvmcc.uvmcc_logging import logger
 
 from typing import List
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 import aiohttp
 import asyncio
 import datetime
-import json
 import time
 
 
 class UserManagement(commands.Cog):
 
     VALIDATE_IAM_RANDOM_CODE_LEN = 6
+    RECONCILE_USERNAMES_CACHE_MINUTES = 10
 
 
     def __init__(self, bot):
         self.bot = bot
+        self.reconcile_usernames_cache.start()
+
+    def cog_unload(self):
+        self.reconcile_usernames_cache.cancel()
+
+    @tasks.loop(minutes=RECONCILE_USERNAMES_CACHE_MINUTES)
+    async def reconcile_usernames_cache(self):
+        """ Catch edits to ``chess_usernames`` that were made outside of this cog. """
+        await UC.CACHE.reconcile()
+
+    @reconcile_usernames_cache.before_loop
+    async def _before_reconcile_usernames_cache(self):
+        await self.bot.wait_until_ready()
+
+    @staticmethod
+    def _site_name(site: str) -> str:
+        """ How to write ``site`` in messages. """
+        return 'Chess.com' if site.lower() == U.SupportedSites.CHESS_COM else 'Lichess'
 
     @staticmethod
     async def _autocomplete_adding_username(ctx: discord.AutocompleteContext) -> List[str]:
         """
-        Query the Lichess/Chess.com APIs for autocomplete suggestions for the given partial username.
+        Autocomplete suggestions for the given partial username, from our database and the Lichess API.
 
         TODO - Merge Chess.com username autocompletion results, but first check if
                ``site`` was already was inputted (we can get this through ctx somehow)
         """
-        partial_usernames = ctx.options['username']
-
-        # Note: Not yet supported in berserk
-        url = f'https://lichess.org/api/player/autocomplete?term={partial_usernames}'
-        headers = {'Accept': 'application/x-ndjson'}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status != 200:
-                    logger.error(f'Failed to get autocomplete suggestions for username {partial_usernames} from '
-                                 f'Lichess API (response.status={response.status})')
-                    return []
-
-                return json.loads(await response.text())
+        return await UA.AUTOCOMPLETER.complete(ctx.options['username'] or '', user_key=ctx.interaction.user.id)
 
     @staticmethod
     async def _autocomplete_chess_usernames_in_db(ctx: discord.AutocompleteContext) -> List[str]:
-        """ Get a list of matching  """
-        partial_usernames = ctx.options['username']
-
-        # Get all chess usernames in database that start with the given username (a partial match)
-        exit_code, results = await D.db_query('SELECT username FROM chess_usernames '
-                                              'WHERE username LIKE %s',
-                                              params=(f'{partial_usernames}%',))
-        # exit_code, results = await D.db_query('SELECT username FROM ChessUsernames')
+        """ Get a list of chess usernames in the database that start with the partial username. """
+        partial_username = ctx.options['username'] or ''
 
-        if exit_code != D.QueryExitCode.SUCCESS:
+        if await UC.CACHE.ensure_loaded() != D.QueryExitCode.SUCCESS:
             logger.error('Failed to get all chess usernames in database for autocomplete context')
             return []
 
-        return [e for e, in results]
+        return UC.CACHE.complete_username(partial_username, limit=C.DISCORD_MAX_AUTOCOMPLETE_CHOICES)
 
     @staticmethod
     async def _autocomplete_sites_for_db_username(ctx: discord.AutocompleteContext) -> List[str]:
@@ -71,16 +76,13 @@ class UserManagement(commands.Cog):
         """
         partial_username = ctx.options['username']
 
-        exit_code, results = await D.db_query('SELECT site FROM chess_usernames '
-                                              'WHERE username = %s',
-                                              params=(partial_username,))
-
-        if exit_code != D.QueryExitCode.SUCCESS:
+        if await UC.CACHE.ensure_loaded() != D.QueryExitCode.SUCCESS:
             logger.error(f'Failed to get sites for username {partial_username} for autocomplete context')
             return []
 
-        if results:
-            return [e for e, in results]
+        sites = UC.CACHE.sites_for(partial_username or '')
+        if sites:
+            return sites
 
         # If username isn't in the database for any site, give the illusion of choice
         return U.SUPPORTED_SITES_LIST
@@ -98,46 +100,68 @@ class UserManagement(commands.Cog):
 
         site = site.lower()
         if site == U.SupportedSites.LICHESS:
-            response = C.BERSERK_CLIENT.users.get_realtime_statuses(username)
-
-            if not response:
-                # Not an existing username
+            # Profiles are cached on disk (see ``L.LichessClient.cache``), so re-adding someone is cheap
+            try:
+                user_data = await L.CLIENT.get_public_data(username)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if not isinstance(e, aiohttp.ClientResponseError) or e.status != 404:
+                    logger.error(f'Failed to get the profile of {username} from Lichess ({type(e).__name__}: {e})')
+                    return await ctx.respond(E.LICHESS_UNAVAILABLE_MSG)
+                user_data = None
+
+            if user_data is None or user_data.get('disabled'):
+                # Not an existing username (or the account was closed)
                 return await ctx.respond(f'`{username}` wasn\'t found on Lichess.')
 
-            user_data = response[0]
-
             # Response will give correct capitalization of username
-            username_proper_caps: str = user_data['name']
-
-            ''' Insert username  '''
-            exit_code, _ = await D.db_query('INSERT INTO chess_usernames(username, site) '
-                                            'VALUES (%s, %s)',
-                                            params=(username_proper_caps,
-                                                    U.SupportedSites.LICHESS))
-            if exit_code == D.QueryExitCode.INTEGRITY_ERROR:
-                # Probably trying to insert duplicate primary key, the (username, site) pair
-                # Let's verify what's happening and send an appropriate error msg
-                exit_code, results = await D.db_query('SELECT username, site FROM chess_usernames '
-                                                      'WHERE username LIKE %s '
-                                                      '      AND site = %s',
-                                                      params=(username_proper_caps,
-                                                              U.SupportedSites.LICHESS))
-
-                if not results:  # it wasn't a dupe primary key
-                    return await ctx.respond(E.DB_INTEGRITY_ERROR_MSG)
-
-                return await ctx.respond(f'`{username_proper_caps}` is already in the Lichess database!')
-            elif exit_code != D.QueryExitCode.SUCCESS:
-                return await ctx.respond(E.DB_ERROR_MSG(exit_code))
-
-            ''' Insertion successful ╰(*°▽°*)╯ '''
-            return await ctx.respond(f'Added `{username_proper_caps}` ({U.SupportedSites.LICHESS}) to the database. '
-                                     f'Use `/show` to see who\'s online!')
+            username_proper_caps: str = user_data['username']
         elif site == U.SupportedSites.CHESS_COM:
-            return await ctx.respond('Chess.com is not currently supported, but it will be soon!')
+            try:
+                player_data = await CC.CLIENT.get_player(username)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if not isinstance(e, aiohttp.ClientResponseError) or e.status != 404:
+                    logger.error(f'Failed to get the profile of {username} from Chess.com ({type(e).__name__}: {e})')
+                    return await ctx.respond(E.CHESS_COM_UNAVAILABLE_MSG)
+                player_data = None
+
+            # Closed accounts have a status like "closed" or "closed:fair_play_violations"
+            if player_data is None or player_data.get('status', '').startswith('closed'):
+                return await ctx.respond(f'`{username}` wasn\'t found on Chess.com.')
+
+            username_proper_caps: str = CC.proper_username(player_data)
         else:
             return await ctx.respond(E.SITE_NOT_YET_SUPPORTED_FOR_ACTION_MSG(site))
 
+        site_name = UserManagement._site_name(site)
+
+        ''' Insert username  '''
+        exit_code, _ = await D.db_query('INSERT INTO chess_usernames(username, site) '
+                                        'VALUES (%s, %s)',
+                                        params=(username_proper_caps, site))
+        if exit_code == D.QueryExitCode.INTEGRITY_ERROR:
+            # Probably trying to insert duplicate primary key, the (username, site) pair
+            # Let's verify what's happening and send an appropriate error msg
+            exit_code, results = await D.db_query('SELECT username, site, guild_id, discord_id '
+                                                  'FROM chess_usernames '
+                                                  'WHERE username LIKE %s '
+                                                  '      AND site = %s',
+                                                  params=(username_proper_caps, site))
+
+            if not results:  # it wasn't a dupe primary key
+                return await ctx.respond(E.DB_INTEGRITY_ERROR_MSG)
+
+            # It was already there, so our cached copy must have been stale
+            UC.CACHE.put(UC.ChessUsernameRecord(*results[0]))
+            return await ctx.respond(f'`{username_proper_caps}` is already in the {site_name} database!')
+        elif exit_code != D.QueryExitCode.SUCCESS:
+            return await ctx.respond(E.DB_ERROR_MSG(exit_code))
+
+        UC.CACHE.put(UC.ChessUsernameRecord(username_proper_caps, site))
+
+        ''' Insertion successful ╰(*°▽°*)╯ '''
+        return await ctx.respond(f'Added `{username_proper_caps}` ({site}) to the database. '
+                                 f'Use `/show` to see who\'s online!')
+
     @discord.slash_command(name='remove',
                            description='Remove your chess username from our database')
     async def remove(self,
@@ -152,29 +176,23 @@ class UserManagement(commands.Cog):
         # Decide which sites to remove for this username
         sites = (site,) if site is not None else tuple(U.SUPPORTED_SITES_LIST)
 
-        # First get the matching database entries
-        exit_code, results = await D.db_query('SELECT username, site FROM chess_usernames '
+        # Remove the matching database entries, getting back which ones there were
+        exit_code, results = await D.db_query('DELETE FROM chess_usernames '
                                               'WHERE username LIKE %s '
-                                              '      AND site IN (SELECT site FROM json_each(%s))',
-                                              params=(username, json.dumps(sites)))
-
+                                              '      AND site = ANY(%s) '
+                                              'RETURNING username, site',
+                                              params=(username, list(sites)))
 
         if exit_code != D.QueryExitCode.SUCCESS:
             return await ctx.respond(E.DB_ERROR_MSG(exit_code))
 
+        for removed_username, removed_site in results:
+            UC.CACHE.discard(removed_username, removed_site)
+
         if not results:
             return await ctx.respond(f'`{username}`{f" {(sites[0])}" if len(sites) == 1 else ""} '
                                      f'is not in the database.')
 
-        # Remove the matching database entries
-        exit_code, _ = await D.db_query('DELETE FROM chess_usernames '
-                                        'WHERE username LIKE %s '
-                                        '      AND site IN (SELECT site FROM json_each(%s))',
-                                        params=(username, json.dumps(sites)))
-
-        if exit_code != D.QueryExitCode.SUCCESS:
-            return await ctx.respond(E.DB_ERROR_MSG(exit_code))
-
         # Success!
         await ctx.respond(f'Removed `{username}`{f" ({site})" if len(sites) == 1 else ""} '
                             f'from the database.')
@@ -189,109 +207,80 @@ class UserManagement(commands.Cog):
                   site: discord.Option(str,
                                        description='What site is this username for?',
                                        autocomplete=discord.utils.basic_autocomplete(_autocomplete_sites_for_db_username))):
-        exit_code, results = await D.db_query('SELECT username, discord_id FROM chess_usernames '
-                                              'WHERE username LIKE %s '
-                                              'AND site = %s',
-                                              params=(username, site))
+        exit_code = await UC.CACHE.ensure_loaded()
 
         if exit_code != D.QueryExitCode.SUCCESS:
             return await ctx.respond(E.DB_ERROR_MSG(exit_code))
 
-        if not results:
+        record = UC.CACHE.get(username, site)
+        if record is None:
             return await ctx.respond(f'Please run `/add player:{username} '
                                      f'site:<{"/".join(U.SupportedSites) if site is None else site}>` first!')
 
-        assert len(results) == 1, E.DB_INTEGRITY_ERROR_MSG + ' There are multiple records for `{username}` ({site})'
+        site = site.lower()
+        if site == U.SupportedSites.LICHESS:
+            verifier = BV.VERIFIER
+            where_to_paste = '[your Lichess bio](https://lichess.org/account/profile)'
+        elif site == U.SupportedSites.CHESS_COM:
+            # Chess.com's API doesn't show bios, but it does show the profile's location
+            verifier = BV.CHESS_COM_VERIFIER
+            where_to_paste = 'the "Location" field of [your Chess.com profile](https://www.chess.com/settings)'
+        else:
+            return await ctx.respond(E.SITE_NOT_YET_SUPPORTED_FOR_ACTION_MSG(site))
+        site_name = UserManagement._site_name(site)
 
         # Now check if the user's profile is already linked to this entry in the database
-        if results[0][1] == str(ctx.author):
-            e = discord.Embed(title=f'Already linked {username} (Lichess) to {ctx.author}',
+        if record.discord_id == str(ctx.author):
+            e = discord.Embed(title=f'Already linked {username} ({site_name}) to {ctx.author}',
                               description=f'Use `/show player:me` to see your status!')
             return await ctx.respond(embed=e)
 
-        site = site.lower()
-        if site == U.SupportedSites.LICHESS:
-            random_code = U.random_code(UserManagement.VALIDATE_IAM_RANDOM_CODE_LEN)
-            code_expires = datetime.timedelta(minutes=5)
-            delay_seconds = 10
-
-            e = discord.Embed(title=f'Verify that you are {username} on Lichess',
-                              description=f'1. Paste the code `{random_code}` somewhere in '
-                                          f'[your Lichess bio](https://lichess.org/account/profile) to verify your '
-                                          f'identity. The code expires '
-                                          f'{U.format_discord_relative_time(unix_time=time.time(), td=code_expires)}.\n'
-                                          f'2. Save your changes and this message will update within '
-                                          f'{delay_seconds} seconds.\n'
-                                          f'3. Once verified, you can remove the code from your bio.',
-                              color=C.ACTION_REQUESTED_COLOR)
-            await ctx.respond(embed=e, ephemeral=True)
-
-            '''
-            Get public profile data repeatedly at an interval, asynchronously
-            
-            Don't look too hard at the code below, it might hurt
-            '''
-
-            URL = f'https://lichess.org/api/user/{username}'
-            async def check_bio(session: aiohttp.ClientSession) -> bool:
-                async with session.get(URL) as response:
-                    data = await response.json()
-                    try:
-                        bio = data['profile']['bio']
-                    except KeyError:
-                        logger.warning('`data[\'profile\'][\'bio\']` not found when requesting user public data')
-
-                    if random_code in bio:
-                        return True
-
-            async def check_bio_loop() -> bool:
-                while True:
-                    async with aiohttp.ClientSession() as session:
-                        code_found = await check_bio(session)
-                        if code_found:
-                            return True
-                    await asyncio.sleep(delay_seconds)
+        random_code = U.random_code(UserManagement.VALIDATE_IAM_RANDOM_CODE_LEN)
+        code_expires = datetime.timedelta(minutes=5)
+        delay_seconds = int(verifier.tick_seconds)
+
+        e = discord.Embed(title=f'Verify that you are {username} on {site_name}',
+                          description=f'1. Paste the code `{random_code}` somewhere in '
+                                      f'{where_to_paste} to verify your '
+                                      f'identity. The code expires '
+                                      f'{U.format_discord_relative_time(unix_time=time.time(), td=code_expires)}.\n'
+                                      f'2. Save your changes and this message will update within '
+                                      f'{delay_seconds} seconds.\n'
+                                      f'3. Once verified, you can remove the code from your profile.',
+                          color=C.ACTION_REQUESTED_COLOR)
+        await ctx.respond(embed=e, ephemeral=True)
+
+        # Checked along with everyone else's pending verifications
+        code_found = await verifier.verify(username, random_code, expires_in=code_expires.total_seconds())
+
+        if not code_found:
+            e = discord.Embed(title=f'Cound not verify {username} on {site_name}',
+                              description=f'Code expired. Please try again.',
+                              color=C.ACTION_FAILED_COLOR)
+            return await ctx.interaction.edit_original_response(embed=e)
 
-            try:
-                code_found = await asyncio.wait_for(check_bio_loop(), code_expires.total_seconds())
-                if code_found:
-                    raise asyncio.CancelledError
-            except asyncio.TimeoutError:
-                # Timed out, check bio one last time (last check might have been 9s ago)
-                async with aiohttp.ClientSession() as session:
-                    code_found = await check_bio(session)
-            except asyncio.CancelledError:
-                # Found the code, stopping early
-                pass
-
-            ''' okay, you can look again '''
-            if not code_found:
-                e = discord.Embed(title=f'Cound not verify {username} on Lichess',
-                                  description=f'Code expired. Please try again.',
-                                  color=C.ACTION_FAILED_COLOR)
-                return await ctx.interaction.edit_original_response(embed=e)
-
-            # Update the discord_id for the given username in ChessUsernames
-            discord_id = str(ctx.author)
-            exit_code, results = await D.db_query('UPDATE chess_usernames '
-                                                  'SET discord_id = %s '
-                                                  'WHERE username LIKE %s',
-                                                  params=(discord_id, username))
-
-            if exit_code != D.QueryExitCode.SUCCESS:
-                e = discord.Embed(title='Could not link username',
-                                  description=f'{E.DB_ERROR_MSG(exit_code)}',
-                                  color=C.ACTION_FAILED_COLOR)
-                return await ctx.interaction.edit_original_response(embed=e)
-
-            e = discord.Embed(title=f'Linked `{username}` (Lichess) to `{ctx.author}`',
-                              description='Use `/show player:me` to see your status!',
-                              color=C.ACTION_SUCCEEDED_COLOR)
+        # Update the discord_id for the given username in ChessUsernames
+        discord_id = str(ctx.author)
+        exit_code, results = await D.db_query('UPDATE chess_usernames '
+                                              'SET discord_id = %s '
+                                              'WHERE username LIKE %s '
+                                              '      AND site = %s '
+                                              'RETURNING username, site, guild_id, discord_id',
+                                              params=(discord_id, username, site))
+
+        if exit_code != D.QueryExitCode.SUCCESS:
+            e = discord.Embed(title='Could not link username',
+                              description=f'{E.DB_ERROR_MSG(exit_code)}',
+                              color=C.ACTION_FAILED_COLOR)
             return await ctx.interaction.edit_original_response(embed=e)
-        elif site == U.SupportedSites.CHESS_COM:
-            return await ctx.respond('Chess.com is not currently supported, but it will be soon!')
-        else:
-            return await ctx.respond(E.SITE_NOT_YET_SUPPORTED_FOR_ACTION_MSG(site))
+
+        for row in results:
+            UC.CACHE.put(UC.ChessUsernameRecord(*row))
+
+        e = discord.Embed(title=f'Linked `{username}` ({site_name}) to `{ctx.author}`',
+                          description='Use `/show player:me` to see your status!',
+                          color=C.ACTION_SUCCEEDED_COLOR)
+        return await ctx.interaction.edit_original_response(embed=e)
 
 
 def setup(bot: discord.Bot):
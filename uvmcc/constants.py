@@ -8,13 +8,20 @@ import discord
 import dotenv
 import logging
 import os
-import berserk
 
 
 # Discord bot token
 dotenv.load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 
+# Where Lichess API requests go. Point this at a local stand-in server
+# (see ``benchmarks/lichess_stand_in.py``) to run the bot offline.
+LICHESS_BASE_URL = os.getenv('LICHESS_BASE_URL', 'https://lichess.org')
+CHESS_COM_BASE_URL = os.getenv('CHESS_COM_BASE_URL', 'https://api.chess.com')
+
+# Channel to announce in when someone on the roster starts a Lichess game (optional)
+GAME_STARTED_CHANNEL_ID = int(os.getenv('GAME_STARTED_CHANNEL_ID', 0)) or None
+
 # Discord users to mention for bugs (right click on profile in Discord, "Copy User ID")
 BUG_FIXERS = {
     'Cubigami#3114': '397943957625110540',
@@ -26,8 +33,31 @@ ACTION_REQUESTED_COLOR = discord.Color.blurple()
 ACTION_SUCCEEDED_COLOR = discord.Color.green()
 ACTION_FAILED_COLOR = discord.Color.red()
 
-# Berserk client session
-BERSERK_CLIENT = berserk.Client()
+# Discord shows at most this many choices for an autocomplete option
+DISCORD_MAX_AUTOCOMPLETE_CHOICES = 25
+
+# How long Lichess realtime user statuses are reused before asking again
+REALTIME_STATUS_TTL_SECONDS = 5.0
+
+# How often the whole roster's Lichess statuses are refreshed in the background
+PRESENCE_POLL_SECONDS = 15.0
+
+# How long Lichess username autocomplete results are reused
+USERNAME_AUTOCOMPLETE_TTL_SECONDS = 5 * 60.0
+
+# SQLite file Lichess profiles, autocomplete results and finished games are cached in, so
+# they survive restarts (set to an empty string to turn it off). Heroku dynos' filesystems
+# are wiped on every restart and deploy, so there it only lasts as long as the dyno; point it
+# at persistent storage (ex. a mounted volume) to keep it across deploys.
+LICHESS_CACHE_PATH = os.getenv('LICHESS_CACHE_PATH', '.lichess_cache.sqlite3')
+LICHESS_CACHE_MAX_ENTRIES = 20_000
+
+# Same for Chess.com profiles and game archives
+CHESS_COM_CACHE_PATH = os.getenv('CHESS_COM_CACHE_PATH', '.chess_com_cache.sqlite3')
+CHESS_COM_CACHE_MAX_ENTRIES = 20_000
+
+# Chess.com members seen this recently count as online (its API has no realtime presence)
+CHESS_COM_ONLINE_WINDOW_SECONDS = 10 * 60.0
 
 # Logging stuff
 LOG_FILENAME = '.uvmcc.log'
@@ -46,3 +76,5 @@ LICHESS_GAME_LINK: Callable[[str, chess.Color], str] \
     = lambda game_id, color: f'https://lichess.org/{game_id}/{chess.COLOR_NAMES[color]}'
 LICHESS_BIO_LINK: Callable[[str], str] \
     = lambda username: f'https://lichess.org/@/{username}'
+CHESS_COM_PROFILE_LINK: Callable[[str], str] \
+    = lambda username: f'https://www.chess.com/member/{username}'
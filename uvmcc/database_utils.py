@@ -1,14 +1,17 @@
 import uvmcc.error_msgs as E
 from uvmcc.uvmcc_logging import logger
 
-from typing import Tuple, Any, List
+from typing import Tuple, Any, List, Dict
 
 import discord
 
+import asyncio
 import enum
 import os
-import psycopg2
+import psycopg
+import psycopg_pool
 import re
+import time
 
 
 # This environment var should be set automatically by Heroku.
@@ -17,6 +20,16 @@ import re
 # https://www.enterprisedb.com/docs/postgresql_journey/04_developing/connecting_to_postgres/python/01_psycopg2/
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
+# Connection pool settings. Heroku's smallest Postgres plans allow 20 connections total.
+DB_POOL_MIN_SIZE = 1
+DB_POOL_MAX_SIZE = 10
+DB_POOL_ACQUIRE_TIMEOUT_SECONDS = 10.0
+DB_POOL_MAX_IDLE_SECONDS = 5 * 60.0
+
+# One pool per database url, opened lazily by ``get_db_pool()``
+_db_pools: Dict[str, psycopg_pool.AsyncConnectionPool] = {}
+_db_pools_lock = asyncio.Lock()
+
 
 def replace_password_in_postgres_db_url(url: str) -> str:
     """
@@ -29,6 +42,53 @@ class QueryExitCode(enum.IntEnum):
     SUCCESS = 0
     UNKNOWN_FAILURE = 1
     INTEGRITY_ERROR = 2
+    CONNECTION_TIMEOUT = 3
+
+
+async def get_db_pool(db_url: str = DATABASE_URL) -> psycopg_pool.AsyncConnectionPool:
+    """
+    Get the shared async connection pool for ``db_url``, opening it on first use.
+    Connections are health-checked before they're handed out, so ones dropped by
+    the server (ex. after a Heroku maintenance restart) are replaced transparently.
+    May raise ``psycopg_pool.PoolTimeout`` if the database can't be reached.
+    """
+    pool = _db_pools.get(db_url)
+    if pool is not None:
+        return pool
+
+    async with _db_pools_lock:
+        # Another coroutine may have opened it while we were waiting for the lock
+        pool = _db_pools.get(db_url)
+        if pool is not None:
+            return pool
+
+        logger.info(f'Opening connection pool for {replace_password_in_postgres_db_url(db_url)} '
+                    f'(min_size={DB_POOL_MIN_SIZE}, max_size={DB_POOL_MAX_SIZE})')
+        pool = psycopg_pool.AsyncConnectionPool(db_url,
+                                                kwargs={'sslmode': 'allow', 'autocommit': True},
+                                                min_size=DB_POOL_MIN_SIZE,
+                                                max_size=DB_POOL_MAX_SIZE,
+                                                timeout=DB_POOL_ACQUIRE_TIMEOUT_SECONDS,
+                                                max_idle=DB_POOL_MAX_IDLE_SECONDS,
+                                                check=psycopg_pool.AsyncConnectionPool.check_connection,
+                                                name='uvmcc',
+                                                open=False)
+        try:
+            await pool.open(wait=True, timeout=DB_POOL_ACQUIRE_TIMEOUT_SECONDS)
+        except Exception:
+            await pool.close()
+            raise
+
+        _db_pools[db_url] = pool
+        return pool
+
+
+async def close_db_pools():
+    """ Close all connection pools opened by ``get_db_pool()``. """
+    async with _db_pools_lock:
+        for pool in _db_pools.values():
+            await pool.close()
+        _db_pools.clear()
 
 
 async def db_query(query: str,
@@ -38,7 +98,7 @@ async def db_query(query: str,
                    auto_respond_on_fail: discord.ApplicationContext | None = None) \
         -> Tuple[QueryExitCode, List[Any] | None]:
     """
-    Connect with the given PostgreSQL database by its url ``db_url`` and execute ``query``.
+    Execute ``query`` on the PostgreSQL database at ``db_url`` using a pooled connection.
     Return a custom ``QueryExitCode`` and ``cur.fetchall()`` for the command. Providing a
     ``discord.ApplicationContext`` for ``auto_respond_on_fail`` responds to the context with
     an appropriate message if the query is not successful.
@@ -47,34 +107,41 @@ async def db_query(query: str,
     # Remove big whitespaces (just for logging; shouldn't be necessary for ``db.execute()``)
     query_minified = ' '.join(query.split())
 
-    conn = psycopg2.connect(db_url, sslmode='allow')
-    conn.autocommit = True
-
     try:
-        with conn.cursor() as cursor:
-            logger.info(f'Executing: '
-                        f'db_query(db_url={replace_password_in_postgres_db_url(db_url)},'
-                        f'query={query_minified},'
-                        f'params={params})')
-
-            cursor.execute(query, params)
-            try:
-                results = cursor.fetchall()
-            except psycopg2.ProgrammingError:
-                # No results to fetch
-                results = None
-
-            logger.info('Query succeeded.')
-            return QueryExitCode.SUCCESS, results
-    except psycopg2.IntegrityError as e:
+        pool = await get_db_pool(db_url)
+        async with pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                logger.info(f'Executing: '
+                            f'db_query(db_url={replace_password_in_postgres_db_url(db_url)},'
+                            f'query={query_minified},'
+                            f'params={params})')
+
+                await cursor.execute(query, params)
+                if cursor.description is None:
+                    # No results to fetch
+                    results = None
+                else:
+                    results = await cursor.fetchall()
+
+                logger.info('Query succeeded.')
+                return QueryExitCode.SUCCESS, results
+    except psycopg.IntegrityError as e:
         logger.warning(
-            f'Query FAILED: aiosqlite.IntegrityError. Maybe due to insertion of duplicate primary key? '
+            f'Query FAILED: psycopg.IntegrityError. Maybe due to insertion of duplicate primary key? '
             f'Stack trace:\n{e}')
 
         if auto_respond_on_fail:
             await auto_respond_on_fail.respond(E.DB_INTEGRITY_ERROR_MSG)
 
         return QueryExitCode.INTEGRITY_ERROR, None
+    except psycopg_pool.PoolTimeout as e:
+        logger.error(f'Query FAILED: could not get a database connection within '
+                     f'{DB_POOL_ACQUIRE_TIMEOUT_SECONDS}s. Stack trace:\n{e}')
+
+        exit_code = QueryExitCode.CONNECTION_TIMEOUT
+        if auto_respond_on_fail:
+            await auto_respond_on_fail.respond(E.DB_ERROR_MSG(exit_code))
+        return exit_code, None
     except Exception as e:
         logger.error(f'Query FAILED: {type(e).__name__}. Stack trace:\n{e}')
 
@@ -84,10 +151,226 @@ async def db_query(query: str,
         return exit_code, None
 
 
+# Ordered schema migration steps. Step ``i`` (1-indexed) brings the schema from version
+# ``i - 1`` to version ``i``, and ``schema_version`` records the last step applied. Steps
+# that have already shipped must never be edited or reordered - append new ones instead.
+MIGRATIONS = [
+    'CREATE TABLE IF NOT EXISTS discord_users ('
+    '    discord_id TEXT PRIMARY KEY'
+    ')',
+
+    'CREATE TABLE IF NOT EXISTS guilds '
+    '    (guild_id TEXT PRIMARY KEY)',
+
+    'CREATE TABLE IF NOT EXISTS guild_discord_users ('
+    '    guild_id TEXT, '
+    '    discord_id TEXT, '
+    '    PRIMARY KEY(guild_id, discord_id),'
+    '    FOREIGN KEY(guild_id) REFERENCES guilds(guild_id), '
+    '    FOREIGN KEY(discord_id) REFERENCES discord_users(discord_id)'
+    ')',
+
+    'CREATE TABLE IF NOT EXISTS chess_sites ('
+    '    site CITEXT PRIMARY KEY'
+    ')',
+
+    'INSERT INTO chess_sites(site) '
+    'VALUES '
+    '    (\'lichess.org\'),'
+    '    (\'chess.com\') '
+    'ON CONFLICT DO NOTHING',
+
+    'CREATE TABLE IF NOT EXISTS chess_usernames ('
+    '    username CITEXT PRIMARY KEY, '
+    '    site CITEXT, '
+    '    FOREIGN KEY(site) REFERENCES chess_sites(site),'
+    '    guild_id TEXT, '
+    '    discord_id TEXT, '
+    '    FOREIGN KEY(guild_id, discord_id) REFERENCES guild_discord_users(guild_id, discord_id)'
+    ')',
+
+    # ========== Vote Chess Tables ==========
+    # ----- Types -----
+    # These could be enums but then we can't verify them as foreign keys in other tables
+    'CREATE TABLE IF NOT EXISTS vote_match_status_types ('
+    '    status CITEXT PRIMARY KEY'
+    ')',
+
+    'INSERT INTO vote_match_status_types(status) '
+    'VALUES '
+    '    (\'Not Started\'), '
+    '    (\'Aborted\'), '
+    '    (\'In Progress\'), '
+    '    (\'Abandoned\'), '
+    '    (\'Complete\') '
+    'ON CONFLICT DO NOTHING',
+
+    'CREATE TABLE IF NOT EXISTS vote_match_team_types ('
+    '    team CITEXT PRIMARY KEY'
+    ')',
+
+    'INSERT INTO vote_match_team_types(team) '
+    'VALUES '
+    '    (\'Black\'), '
+    '    (\'White\'), '
+    '    (\'Both\'), '
+    '    (\'random\') '
+    'ON CONFLICT DO NOTHING',
+
+    'CREATE TABLE IF NOT EXISTS vote_match_result_types ('
+    '    result CITEXT PRIMARY KEY'
+    ')',
+
+    'INSERT INTO vote_match_result_types(result) '
+    'VALUES '
+    '    (\'Checkmate\'), '
+    '    (\'Resignation\'), '
+    '    (\'Abandonment\'), '
+    '    (\'Stalemate\'), '
+    '    (\'Threefold Repetition\'), '
+    '    (\'Mutual Agreement\'), '
+    '    (\'50-Move Rule\'), '
+    '    (\'Unknown\') '
+    'ON CONFLICT DO NOTHING',
+
+    'CREATE TABLE IF NOT EXISTS vote_match_termination_types ('
+    '    termination CITEXT PRIMARY KEY'
+    ')',
+
+    'INSERT INTO vote_match_termination_types '
+    'VALUES '
+    '    (\'1-0\'), '
+    '    (\'0-1\'), '
+    '    (\'1/2-1/2\'), '
+    '    (\'*\') '
+    'ON CONFLICT DO NOTHING',
+
+    # ----- Matches, pairings, votes -----
+    'CREATE TABLE IF NOT EXISTS vote_matches ('
+    '    match_code CITEXT, '
+    '    guild_id TEXT NOT NULL, '
+    '    FOREIGN KEY(guild_id) REFERENCES guilds(guild_id), '
+    '    PRIMARY KEY(match_code, guild_id), '
+    '    match_name TEXT, '
+    '    pgn TEXT, '
+    '    starting_fen TEXT NOT NULL DEFAULT \'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1\','
+    '    keep_votes_secret BOOLEAN NOT NULL DEFAULT TRUE, '
+    '    seconds_between_auto_moves INTEGER DEFAULT 1 NOT NULL, '
+    '    unix_time_last_move INTEGER, '
+    '    unix_time_created INTEGER NOT NULL, '
+    '    unix_time_started INTEGER, '
+    '    unix_time_ended INTEGER, '
+    '    status CITEXT NOT NULL DEFAULT \'Not Started\', '
+    '    FOREIGN KEY(status) REFERENCES vote_match_status_types(status), '
+    '    result CITEXT DEFAULT NULL, '
+    '    FOREIGN KEY(result) REFERENCES vote_match_result_types(result), '
+    '    termination CITEXT NOT NULL DEFAULT \'*\', '
+    '    FOREIGN KEY(termination) REFERENCES vote_match_termination_types(termination)'
+    ')',
+
+    'CREATE TABLE IF NOT EXISTS vote_match_pairings ('
+    '    match_code CITEXT NOT NULL, '
+    '    guild_id TEXT NOT NULL, '
+    '    FOREIGN KEY (match_code, guild_id) REFERENCES vote_matches(match_code, guild_id), '
+    '    discord_id TEXT NOT NULL, '
+    '    FOREIGN KEY (guild_id) REFERENCES discord_users(discord_id), '
+    '    PRIMARY KEY (match_code, guild_id, discord_id), '
+    '    team CITEXT NOT NULL, '
+    '    FOREIGN KEY(team) REFERENCES vote_match_team_types(team), '
+    '    num_votes_cast INTEGER DEFAULT 0, '
+    '    num_top_move_votes_cast INTEGER DEFAULT 0'
+    ')',
+
+    'CREATE TABLE IF NOT EXISTS vote_match_votes ('
+    '    match_code CITEXT NOT NULL, '
+    '    guild_id TEXT NOT NULL, '
+    '    discord_id TEXT NOT NULL, '
+    '    FOREIGN KEY(match_code, guild_id, discord_id) '
+    '        REFERENCES vote_match_pairings(match_code, guild_id, discord_id), '
+    '    ply_before INTEGER NOT NULL, '
+    '    PRIMARY KEY(match_code, guild_id, discord_id, ply_before), '
+    '    voted_move_san TEXT DEFAULT NULL, '  # Should init to NULL here, in case ex. a user votes to
+                                              # resign before voting for a move. We're assuming here
+                                              # that users can vote for a move **and** to resign/offer 
+                                              # a draw on each ply. If this feature changes, we might 
+                                              # need to change this schema.
+    '    voted_resign BOOLEAN NOT NULL DEFAULT FALSE, '
+    '    voted_draw BOOLEAN NOT NULL DEFAULT FALSE'
+    ')',
+
+    # ========== Chess.com support ==========
+    # The same handle can be on Lichess and Chess.com (possibly for different people), so
+    # key chess_usernames by (username, site). Lichess was the only site before this.
+    'UPDATE chess_usernames '
+    'SET site = \'lichess.org\' '
+    'WHERE site IS NULL',
+
+    'ALTER TABLE chess_usernames '
+    '    DROP CONSTRAINT chess_usernames_pkey, '
+    '    ALTER COLUMN site SET NOT NULL, '
+    '    ADD PRIMARY KEY (username, site)',
+]
+
+
+async def migrate_schema(db_url: str = DATABASE_URL) -> Tuple[int, int]:
+    """
+    Bring the database schema up to date by applying any steps in ``MIGRATIONS`` that
+    haven't been applied yet, all in one transaction. Return the
+    ``(version before, version after)``.
+
+    If the schema is already current this costs a single query, so it's cheap to call
+    every time the bot (re)connects.
+    """
+    target_version = len(MIGRATIONS)
+
+    pool = await get_db_pool(db_url)
+    async with pool.connection() as conn:
+        # Fast path
+        try:
+            cursor = await conn.execute('SELECT version FROM schema_version')
+            row = await cursor.fetchone()
+            current_version = row[0] if row else 0
+        except psycopg.errors.UndefinedTable:
+            current_version = 0
+
+        if current_version >= target_version:
+            return current_version, current_version
+
+        async with conn.transaction():
+            await conn.execute('CREATE TABLE IF NOT EXISTS schema_version ('
+                               '    id INTEGER PRIMARY KEY CHECK (id = 1), '
+                               '    version INTEGER NOT NULL'
+                               ')')
+
+            # Make concurrent migrators (ex. an old and a new dyno during a deploy) wait
+            # for each other, then re-read the version in case the other one already ran
+            await conn.execute('LOCK TABLE schema_version IN EXCLUSIVE MODE')
+            cursor = await conn.execute('SELECT version FROM schema_version')
+            row = await cursor.fetchone()
+            current_version = row[0] if row else 0
+
+            for version, query in enumerate(MIGRATIONS[current_version:], start=current_version + 1):
+                logger.info(f'Applying migration {version}/{target_version}: {" ".join(query.split())}')
+                await conn.execute(query)
+
+            await conn.execute('INSERT INTO schema_version(id, version) '
+                               'VALUES (1, %s) '
+                               'ON CONFLICT (id) DO UPDATE SET version = EXCLUDED.version',
+                               (target_version,))
+
+    return current_version, target_version
+
+
 async def init_dbs(db_url: str = DATABASE_URL,
                    *,
                    reset_vote_chess_tables: bool = False,
-                   reset_all_tables: bool = False):
+                   reset_all_tables: bool = False) -> float:
+    """
+    Create/update the database schema via ``migrate_schema()``, optionally dropping
+    tables first. Return how many seconds it took.
+    """
+    start_time = time.perf_counter()
+
     logger.info('==================')
     logger.info('Calling init_dbs()')
     logger.info('------------------')
@@ -112,7 +395,9 @@ async def init_dbs(db_url: str = DATABASE_URL,
                 'vote_match_termination_types',
                 'vote_matches',
                 'vote_match_pairings',
-                'vote_match_votes'
+                'vote_match_votes',
+                # Forget the recorded version too, so every migration step re-runs
+                'schema_version'
             ]
 
             for t in TABLES:
@@ -138,7 +423,9 @@ async def init_dbs(db_url: str = DATABASE_URL,
                 'vote_match_termination_types',
                 'vote_matches',
                 'vote_match_pairings',
-                'vote_match_votes'
+                'vote_match_votes',
+                # Forget the recorded version too, so every migration step re-runs
+                'schema_version'
             ]
 
             for t in TABLES:
@@ -150,156 +437,20 @@ async def init_dbs(db_url: str = DATABASE_URL,
             logger.info(f'ATTEMPTED TO RESET VOTE CHESS TABLES FROM ANOTHER FILE. Please run '
                         f'`{__name__}.py` as \'__main__\' to delete & reset tables.')
 
+    try:
+        version_before, version_after = await migrate_schema(db_url)
+    except Exception as e:
+        logger.error(f'migrate_schema() FAILED: {type(e).__name__}. Stack trace:\n{e}')
+        version_before = version_after = None
 
-
-    QUERIES = [
-        'CREATE TABLE IF NOT EXISTS discord_users ('
-        '    discord_id TEXT PRIMARY KEY'
-        ')',
-
-        'CREATE TABLE IF NOT EXISTS guilds '
-        '    (guild_id TEXT PRIMARY KEY)',
-
-        'CREATE TABLE IF NOT EXISTS guild_discord_users ('
-        '    guild_id TEXT, '
-        '    discord_id TEXT, '
-        '    PRIMARY KEY(guild_id, discord_id),'
-        '    FOREIGN KEY(guild_id) REFERENCES guilds(guild_id), '
-        '    FOREIGN KEY(discord_id) REFERENCES discord_users(discord_id)'
-        ')',
-
-        'CREATE TABLE IF NOT EXISTS chess_sites ('
-        '    site CITEXT PRIMARY KEY'
-        ')',
-
-        'INSERT INTO chess_sites(site) '
-        'VALUES '
-        '    (\'lichess.org\'),'
-        '    (\'chess.com\') '
-        'ON CONFLICT DO NOTHING',
-
-        'CREATE TABLE IF NOT EXISTS chess_usernames ('
-        '    username CITEXT PRIMARY KEY, '
-        '    site CITEXT, '
-        '    FOREIGN KEY(site) REFERENCES chess_sites(site),'
-        '    guild_id TEXT, '
-        '    discord_id TEXT, '
-        '    FOREIGN KEY(guild_id, discord_id) REFERENCES guild_discord_users(guild_id, discord_id)'
-        ')',
-
-        # ========== Vote Chess Tables ==========
-        # ----- Types -----
-        # These could be enums but then we can't verify them as foreign keys in other tables
-        'CREATE TABLE IF NOT EXISTS vote_match_status_types ('
-        '    status CITEXT PRIMARY KEY'
-        ')',
-
-        'INSERT INTO vote_match_status_types(status) '
-        'VALUES '
-        '    (\'Not Started\'), '
-        '    (\'Aborted\'), '
-        '    (\'In Progress\'), '
-        '    (\'Abandoned\'), '
-        '    (\'Complete\') '
-        'ON CONFLICT DO NOTHING',
-
-        'CREATE TABLE IF NOT EXISTS vote_match_team_types ('
-        '    team CITEXT PRIMARY KEY'
-        ')',
-
-        'INSERT INTO vote_match_team_types(team) '
-        'VALUES '
-        '    (\'Black\'), '
-        '    (\'White\'), '
-        '    (\'Both\'), '
-        '    (\'random\') '
-        'ON CONFLICT DO NOTHING',
-
-        'CREATE TABLE IF NOT EXISTS vote_match_result_types ('
-        '    result CITEXT PRIMARY KEY'
-        ')',
-
-        'INSERT INTO vote_match_result_types(result) '
-        'VALUES '
-        '    (\'Checkmate\'), '
-        '    (\'Resignation\'), '
-        '    (\'Abandonment\'), '
-        '    (\'Stalemate\'), '
-        '    (\'Threefold Repetition\'), '
-        '    (\'Mutual Agreement\'), '
-        '    (\'50-Move Rule\'), '
-        '    (\'Unknown\') '
-        'ON CONFLICT DO NOTHING',
-
-        'CREATE TABLE IF NOT EXISTS vote_match_termination_types ('
-        '    termination CITEXT PRIMARY KEY'
-        ')',
-
-        'INSERT INTO vote_match_termination_types '
-        'VALUES '
-        '    (\'1-0\'), '
-        '    (\'0-1\'), '
-        '    (\'1/2-1/2\'), '
-        '    (\'*\') '
-        'ON CONFLICT DO NOTHING',
-
-        # ----- Matches, pairings, votes -----
-        'CREATE TABLE IF NOT EXISTS vote_matches ('
-        '    match_code CITEXT, '
-        '    guild_id TEXT NOT NULL, '
-        '    FOREIGN KEY(guild_id) REFERENCES guilds(guild_id), '
-        '    PRIMARY KEY(match_code, guild_id), '
-        '    match_name TEXT, '
-        '    pgn TEXT, '
-        '    starting_fen TEXT NOT NULL DEFAULT \'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1\','
-        '    keep_votes_secret BOOLEAN NOT NULL DEFAULT TRUE, '
-        '    seconds_between_auto_moves INTEGER DEFAULT 1 NOT NULL, '
-        '    unix_time_last_move INTEGER, '
-        '    unix_time_created INTEGER NOT NULL, '
-        '    unix_time_started INTEGER, '
-        '    unix_time_ended INTEGER, '
-        '    status CITEXT NOT NULL DEFAULT \'Not Started\', '
-        '    FOREIGN KEY(status) REFERENCES vote_match_status_types(status), '
-        '    result CITEXT DEFAULT NULL, '
-        '    FOREIGN KEY(result) REFERENCES vote_match_result_types(result), '
-        '    termination CITEXT NOT NULL DEFAULT \'*\', '
-        '    FOREIGN KEY(termination) REFERENCES vote_match_termination_types(termination)'
-        ')',
-
-        'CREATE TABLE IF NOT EXISTS vote_match_pairings ('
-        '    match_code CITEXT NOT NULL, '
-        '    guild_id TEXT NOT NULL, '
-        '    FOREIGN KEY (match_code, guild_id) REFERENCES vote_matches(match_code, guild_id), '
-        '    discord_id TEXT NOT NULL, '
-        '    FOREIGN KEY (guild_id) REFERENCES discord_users(discord_id), '
-        '    PRIMARY KEY (match_code, guild_id, discord_id), '
-        '    team CITEXT NOT NULL, '
-        '    FOREIGN KEY(team) REFERENCES vote_match_team_types(team), '
-        '    num_votes_cast INTEGER DEFAULT 0, '
-        '    num_top_move_votes_cast INTEGER DEFAULT 0'
-        ')',
-
-        'CREATE TABLE IF NOT EXISTS vote_match_votes ('
-        '    match_code CITEXT NOT NULL, '
-        '    guild_id TEXT NOT NULL, '
-        '    discord_id TEXT NOT NULL, '
-        '    FOREIGN KEY(match_code, guild_id, discord_id) '
-        '        REFERENCES vote_match_pairings(match_code, guild_id, discord_id), '
-        '    ply_before INTEGER NOT NULL, '
-        '    PRIMARY KEY(match_code, guild_id, discord_id, ply_before), '
-        '    voted_move_san TEXT DEFAULT NULL, '  # Should init to NULL here, in case ex. a user votes to
-                                                  # resign before voting for a move. We're assuming here
-                                                  # that users can vote for a move **and** to resign/offer 
-                                                  # a draw on each ply. If this feature changes, we might 
-                                                  # need to change this schema.
-        '    voted_resign BOOLEAN NOT NULL DEFAULT FALSE, '
-        '    voted_draw BOOLEAN NOT NULL DEFAULT FALSE'
-        ')',
-    ]
-
-    for query in QUERIES:
-        await db_query(query, db_url=db_url)
+    elapsed = time.perf_counter() - start_time
 
     logger.info('-------------------')
-    logger.info('Finished init_dbs()')
+    if version_before == version_after:
+        logger.info(f'Finished init_dbs() in {elapsed * 1000:.0f} ms (schema version {version_after})')
+    else:
+        logger.info(f'Finished init_dbs() in {elapsed * 1000:.0f} ms '
+                    f'(migrated schema version {version_before} -> {version_after})')
     logger.info('===================')
+
+    return elapsed
@@ -0,0 +1,183 @@
+from uvmcc.uvmcc_logging import logger
+
+from typing import AsyncContextManager, Callable, Dict, Iterable, NamedTuple
+
+import aiohttp
+import aiosqlite
+import asyncio
+import sqlite3
+import time
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str | None
+    last_modified: str | None
+    # Unix time the entry goes stale at
+    expires_at: float
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+
+class DiskCache:
+    """
+    Response bodies (with their ``ETag``/``Last-Modified`` validators) kept in an SQLite file,
+    so they survive restarts. Each entry has its own TTL; stale entries are kept, so they can
+    be revalidated instead of downloaded again. Past ``max_entries``, the least recently used
+    entries are evicted.
+
+    ``fetch()`` does a whole cached GET: fresh entries are answered from the file, and stale
+    ones are revalidated with a conditional request.
+
+    The file is opened on first use (inside the event loop). Any ``sqlite3.Error`` is logged
+    and treated like a miss, so a broken cache never takes a request down with it.
+    """
+
+    SCHEMA = ('CREATE TABLE IF NOT EXISTS http_cache ('
+              '    key TEXT PRIMARY KEY,'
+              '    body BLOB NOT NULL,'
+              '    etag TEXT,'
+              '    last_modified TEXT,'
+              '    expires_at REAL NOT NULL,'
+              '    accessed_at REAL NOT NULL)',
+              'CREATE INDEX IF NOT EXISTS http_cache_accessed_at ON http_cache(accessed_at)')
+    # SQLite limits how many parameters a query can have
+    MAX_KEYS_PER_QUERY = 500
+
+    def __init__(self, path: str, *, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: aiosqlite.Connection | None = None
+        self._connect_lock = asyncio.Lock()
+
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.stores = 0
+        self.revalidated = 0
+        self.errors = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits,
+                'stale': self.stale,
+                'misses': self.misses,
+                'stores': self.stores,
+                'revalidated': self.revalidated,
+                'errors': self.errors}
+
+    async def _connection(self) -> aiosqlite.Connection:
+        async with self._connect_lock:
+            if self._conn is None:
+                conn = aiosqlite.connect(self.path, isolation_level=None)
+                # Don't keep the bot from exiting if the cache is never closed
+                conn.daemon = True
+                await conn
+                await conn.execute('PRAGMA journal_mode=WAL')
+                for statement in DiskCache.SCHEMA:
+                    await conn.execute(statement)
+                self._conn = conn
+        return self._conn
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def _failed(self, action: str, e: sqlite3.Error):
+        self.errors += 1
+        logger.error(f'DiskCache({self.path}): failed to {action} ({type(e).__name__}: {e})')
+
+    async def get(self, key: str) -> CachedResponse | None:
+        """ The entry for ``key``, even if it's stale (check ``is_fresh``), or ``None``. """
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, CachedResponse]:
+        """ Like ``get()``, for many keys at once (leaving out ones that aren't cached). """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, CachedResponse] = {}
+        try:
+            conn = await self._connection()
+            for i in range(0, len(keys), DiskCache.MAX_KEYS_PER_QUERY):
+                chunk = keys[i:i + DiskCache.MAX_KEYS_PER_QUERY]
+                placeholders = ','.join('?' * len(chunk))
+                async with conn.execute(f'SELECT key, body, etag, last_modified, expires_at FROM http_cache '
+                                        f'WHERE key IN ({placeholders})', chunk) as cursor:
+                    found.update((row[0], CachedResponse(*row[1:])) for row in await cursor.fetchall())
+                if found:
+                    await conn.execute(f'UPDATE http_cache SET accessed_at = ? WHERE key IN ({placeholders})',
+                                       (time.time(), *chunk))
+        except sqlite3.Error as e:
+            self._failed(f'get {len(keys)} entries', e)
+            return {}
+
+        fresh = sum(entry.is_fresh for entry in found.values())
+        self.hits += fresh
+        self.stale += len(found) - fresh
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def put(self,
+                  key: str,
+                  body: bytes,
+                  *,
+                  ttl_seconds: float,
+                  etag: str | None = None,
+                  last_modified: str | None = None):
+        now = time.time()
+        try:
+            conn = await self._connection()
+            await conn.execute('INSERT OR REPLACE INTO http_cache(key, body, etag, last_modified, expires_at, accessed_at) '
+                               'VALUES (?, ?, ?, ?, ?, ?)',
+                               (key, body, etag, last_modified, now + ttl_seconds, now))
+            await conn.execute('DELETE FROM http_cache WHERE key IN ('
+                               '    SELECT key FROM http_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                               (self.max_entries,))
+        except sqlite3.Error as e:
+            self._failed(f'store {key!r}', e)
+            return
+        self.stores += 1
+
+    async def refresh(self, key: str, *, ttl_seconds: float):
+        """ Make a stale entry fresh again, ex. once the server says it hasn't changed (304). """
+        now = time.time()
+        try:
+            conn = await self._connection()
+            await conn.execute('UPDATE http_cache SET expires_at = ?, accessed_at = ? WHERE key = ?',
+                               (now + ttl_seconds, now, key))
+        except sqlite3.Error as e:
+            self._failed(f'refresh {key!r}', e)
+            return
+        self.revalidated += 1
+
+    async def fetch(self,
+                    key: str,
+                    request: Callable[[Dict[str, str]], AsyncContextManager[aiohttp.ClientResponse]],
+                    *,
+                    ttl_seconds: float) -> bytes:
+        """
+        The body cached for ``key`` while it's fresh. Otherwise, ``request(headers)`` (ex. a
+        ``session.get()`` with those extra headers) is made with ``If-None-Match``/``If-Modified-Since``
+        from the stale entry, which is refreshed on a 304 and replaced by anything else.
+        """
+        cached = await self.get(key)
+        if cached is not None and cached.is_fresh:
+            return cached.body
+
+        headers = {}
+        if cached is not None and cached.etag is not None:
+            headers['If-None-Match'] = cached.etag
+        if cached is not None and cached.last_modified is not None:
+            headers['If-Modified-Since'] = cached.last_modified
+
+        async with request(headers) as response:
+            if response.status == 304 and cached is not None:
+                await self.refresh(key, ttl_seconds=ttl_seconds)
+                return cached.body
+            body = await response.read()
+            await self.put(key, body,
+                           ttl_seconds=ttl_seconds,
+                           etag=response.headers.get('ETag'),
+                           last_modified=response.headers.get('Last-Modified'))
+        return body
@@ -0,0 +1,135 @@
+from uvmcc.rate_limit import TokenBucket
+from uvmcc.uvmcc_logging import logger
+
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+RenderT = Callable[[], Awaitable[Dict[str, Any]]]
+
+import asyncio
+import time
+
+
+class EmbedUpdater:
+    """
+    Rate-limited, latest-wins edits of one Discord message.
+
+    ``submit()`` never waits: it replaces whatever update was still pending, so when moves
+    come in faster than Discord lets us edit (ex. bullet games), intermediate positions are
+    dropped instead of queueing up and lagging further and further behind the live game.
+    ``finish()`` always sends the final edit.
+
+    Arguments that are expensive to make (ex. a rendered board image) can be given as a
+    ``render`` coroutine function instead, which is only awaited for frames that are sent.
+    """
+
+    # Discord rate limits message edits to about 5 per 5 seconds
+    EDITS_PER_SECOND = 1.0
+    EDIT_BURST = 3
+
+    def __init__(self,
+                 edit: Callable[..., Awaitable[Any]],
+                 *,
+                 edits_per_second: float = EDITS_PER_SECOND,
+                 burst: int = EDIT_BURST):
+        """ ``edit`` is called with the keyword arguments given to ``submit()``/``finish()``. """
+        self._edit = edit
+        self._bucket = TokenBucket(edits_per_second, burst)
+
+        # (edit kwargs, ``render`` or ``None``, time.monotonic() when the frame was created)
+        self._pending: Tuple[Dict[str, Any], RenderT | None, float] | None = None
+        self._wakeup = asyncio.Event()
+        self._finishing = False
+        self._task: asyncio.Task | None = None
+
+        self.frames_submitted = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.total_delay_seconds = 0.0
+        self.max_delay_seconds = 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {'frames_submitted': self.frames_submitted,
+                'frames_sent': self.frames_sent,
+                'frames_dropped': self.frames_dropped,
+                'mean_delay_seconds': self.total_delay_seconds / self.frames_sent if self.frames_sent else 0.0,
+                'max_delay_seconds': self.max_delay_seconds}
+
+    def submit(self, *, created_at: float | None = None, render: RenderT | None = None, **edit_kwargs: Any):
+        """
+        Schedule an edit, replacing any edit that hasn't been sent yet. ``created_at`` is the
+        ``time.monotonic()`` when the frame's data arrived (ex. when the move was received),
+        used to measure the delay until it's displayed. ``render``, if given, is awaited right
+        before the edit is sent, and returns more keyword arguments for it.
+        """
+        if self._finishing:
+            raise RuntimeError('EmbedUpdater.submit() called after finish()')
+
+        self.frames_submitted += 1
+        if self._pending is not None:
+            self.frames_dropped += 1
+        self._pending = (edit_kwargs, render, time.monotonic() if created_at is None else created_at)
+        self._wakeup.set()
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    # Edit arguments of a dropped frame that ``finish()`` still sends, since they aren't shown yet
+    CARRIED_OVER_KWARGS = ('file', 'files', 'attachments')
+
+    async def finish(self,
+                     *,
+                     created_at: float | None = None,
+                     render: RenderT | None = None,
+                     **edit_kwargs: Any) -> Any:
+        """
+        Drop any pending edit and send this one as soon as the rate limit allows, after any
+        edit that's already in flight. The dropped edit's attachments (``CARRIED_OVER_KWARGS``,
+        and its ``render``) are sent along, unless this one has its own, so the message doesn't
+        end up showing an older image. Return the result of the edit call.
+        """
+        self._finishing = True
+        if self._pending is not None:
+            self.frames_dropped += 1
+            pending_kwargs, pending_render, _ = self._pending
+            self._pending = None
+            edit_kwargs = {**{k: v for k, v in pending_kwargs.items() if k in EmbedUpdater.CARRIED_OVER_KWARGS},
+                           **edit_kwargs}
+            render = render or pending_render
+
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+
+        self.frames_submitted += 1
+        await self._bucket.acquire()
+        result = await self._edit_and_record(edit_kwargs, render,
+                                             time.monotonic() if created_at is None else created_at)
+        logger.debug(f'EmbedUpdater finished: {self.stats()}')
+        return result
+
+    async def _run(self):
+        while not self._finishing:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            while self._pending is not None:
+                await self._bucket.acquire()
+                # Take whatever is newest once we're allowed to send
+                pending, self._pending = self._pending, None
+                if pending is None:
+                    break
+                try:
+                    await self._edit_and_record(*pending)
+                except Exception as e:
+                    logger.warning(f'EmbedUpdater: edit FAILED: {type(e).__name__}. Stack trace:\n{e}')
+
+    async def _edit_and_record(self, edit_kwargs: Dict[str, Any], render: RenderT | None, created_at: float) -> Any:
+        if render is not None:
+            edit_kwargs = {**edit_kwargs, **await render()}
+        result = await self._edit(**edit_kwargs)
+
+        delay = time.monotonic() - created_at
+        self.frames_sent += 1
+        self.total_delay_seconds += delay
+        self.max_delay_seconds = max(self.max_delay_seconds, delay)
+        return result
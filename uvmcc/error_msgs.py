@@ -17,5 +17,9 @@ USERNAME_IN_DB_NOT_FOUND_MSG = \
 INTERNAL_ERROR_MSG = _tag_bug_fixers('There was an internal error (some code may need debugging) :(')
 SITE_NOT_YET_SUPPORTED_FOR_ACTION_MSG: Callable[[str], str] \
     = lambda site: f'`{site}` is not yet supported for this action :('
+LICHESS_UNAVAILABLE_MSG = 'Lichess isn\'t answering right now (or we\'ve been asking too often). ' \
+                          'Please try again in a minute!'
+CHESS_COM_UNAVAILABLE_MSG = 'Chess.com isn\'t answering right now (or we\'ve been asking too often). ' \
+                            'Please try again in a minute!'
 HTTPS_STATUS_ERROR_MSG: Callable[[int], str] \
     = lambda status: _tag_bug_fixers(f'There was an unhandled HTTPS error (status {status}) :(')
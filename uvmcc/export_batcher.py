@@ -0,0 +1,148 @@
+import uvmcc.lichess_api as L
+import uvmcc.lichess_models as LM
+import uvmcc.rate_limit as R
+from uvmcc.uvmcc_logging import logger
+
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import asyncio
+import collections
+
+
+GameJson = Dict[str, Any]
+
+
+async def _export_from_lichess(*game_ids: str, moves: bool, priority: R.Priority) -> List[GameJson]:
+    return await L.CLIENT.export_multi(*game_ids, moves=moves, priority=priority)
+
+
+class _Batch:
+    """ Game ids collected during one window, and the task that exports them all at once. """
+
+    def __init__(self, moves: bool, priority: R.Priority):
+        self.moves = moves
+        self.priority = priority
+        self.game_ids: Dict[str, None] = {}
+        self.task: asyncio.Task | None = None
+
+
+class ExportBatcher:
+    """
+    Micro-batching in front of ``L.CLIENT.export_multi()``, for commands in different guilds
+    asking for overlapping live games at about the same time.
+
+    Game ids requested within ``window_seconds`` of each other are exported together in one
+    deduplicated request, and every caller gets just the games it asked for. Callers asking
+    for a game that's already being exported wait on that request instead of starting their
+    own (``moves=False`` callers can also wait on a ``moves=True`` export). A batch is sent
+    with the most urgent ``priority`` of its callers.
+
+    Finished games never change, so their exports (with moves) are kept, up to
+    ``MAX_FINISHED_GAMES`` of the most recently used. Returned games are shared between
+    callers, and must not be modified.
+    """
+
+    WINDOW_SECONDS = 0.005
+    MAX_FINISHED_GAMES = 500
+
+    def __init__(self,
+                 export: Callable[..., Awaitable[List[GameJson]]] = _export_from_lichess,
+                 *,
+                 window_seconds: float = WINDOW_SECONDS):
+        self._export = export
+        self.window_seconds = window_seconds
+
+        # ``moves`` -> the batch still collecting game ids
+        self._collecting: Dict[bool, _Batch] = {}
+        # (game id, ``moves``) -> the batch that will export it
+        self._pending: Dict[Tuple[str, bool], _Batch] = {}
+        # Game id -> export of a finished game (with moves), least recently used first
+        self._finished: collections.OrderedDict[str, GameJson] = collections.OrderedDict()
+
+        self.requests = 0
+        self.finished_hits = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.upstream_games = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'requests': self.requests,
+                'finished_hits': self.finished_hits,
+                'coalesced': self.coalesced,
+                'batches': self.batches,
+                'upstream_games': self.upstream_games,
+                'finished_games': len(self._finished)}
+
+    async def export(self,
+                     *game_ids: str,
+                     moves: bool = True,
+                     priority: R.Priority = R.Priority.INTERACTIVE) -> List[GameJson]:
+        """
+        Like ``L.CLIENT.export_multi(*game_ids, moves=moves)``: get the games in the same order as
+        ``game_ids`` (without duplicates), leaving out ones that weren't found.
+        """
+        self.requests += 1
+        games: Dict[str, GameJson | None] = {}
+        waiting_on: Dict[str, _Batch] = {}
+
+        game_ids = list(dict.fromkeys(game_ids))
+        for game_id in game_ids:
+            finished = self._finished.get(game_id)
+            if finished is not None:
+                self.finished_hits += 1
+                self._finished.move_to_end(game_id)
+                games[game_id] = finished
+                continue
+
+            batch = self._pending.get((game_id, moves)) or (None if moves else self._pending.get((game_id, True)))
+            if batch is not None:
+                self.coalesced += 1
+            else:
+                batch = self._collecting_batch(moves, priority)
+                batch.game_ids[game_id] = None
+                self._pending[game_id, moves] = batch
+            batch.priority = min(batch.priority, priority)
+            waiting_on[game_id] = batch
+
+        for batch in {id(b): b for b in waiting_on.values()}.values():
+            # Shielded, so one caller being cancelled doesn't fail everyone else in the batch
+            exported = await asyncio.shield(batch.task)
+            games.update((game_id, exported.get(game_id)) for game_id, b in waiting_on.items() if b is batch)
+
+        return [games[game_id] for game_id in game_ids if games[game_id] is not None]
+
+    def _collecting_batch(self, moves: bool, priority: R.Priority) -> _Batch:
+        batch = self._collecting.get(moves)
+        if batch is None:
+            batch = self._collecting[moves] = _Batch(moves, priority)
+            batch.task = asyncio.create_task(self._export_batch(batch))
+        return batch
+
+    async def _export_batch(self, batch: _Batch) -> Dict[str, GameJson]:
+        # Let other commands add to the batch first
+        await asyncio.sleep(self.window_seconds)
+        if self._collecting.get(batch.moves) is batch:
+            del self._collecting[batch.moves]
+
+        game_ids = list(batch.game_ids)
+        self.batches += 1
+        self.upstream_games += len(game_ids)
+        try:
+            exported = {g['id']: g for g in await self._export(*game_ids, moves=batch.moves, priority=batch.priority)}
+        finally:
+            for game_id in game_ids:
+                self._pending.pop((game_id, batch.moves), None)
+
+        if batch.moves:
+            for game_id, game in exported.items():
+                if game.get('status') not in LM.LIVE_GAME_STATUSES:
+                    self._finished[game_id] = game
+                    self._finished.move_to_end(game_id)
+            while len(self._finished) > ExportBatcher.MAX_FINISHED_GAMES:
+                self._finished.popitem(last=False)
+
+        logger.debug(f'ExportBatcher: exported {len(game_ids)} games, stats={self.stats()}')
+        return exported
+
+
+BATCHER = ExportBatcher()
@@ -0,0 +1,355 @@
+import uvmcc.constants as C
+import uvmcc.disk_cache as DC
+import uvmcc.lichess_models as LM
+import uvmcc.ndjson_stream as NJ
+import uvmcc.rate_limit as R
+
+from typing import Any, Awaitable, Callable, Dict, List, AsyncIterator, Sequence
+
+import aiohttp
+import asyncio
+import contextlib
+import datetime
+import urllib.parse
+
+import orjson
+
+
+def _datetime_from_millis(millis: int) -> datetime.datetime:
+    """ Same conversion berserk applies to Lichess timestamps (UTC, timezone-aware). """
+    return datetime.datetime.fromtimestamp(millis / 1000, tz=datetime.timezone.utc)
+
+
+def _convert_timestamps(data: Dict[str, Any], *keys: str) -> Dict[str, Any]:
+    for key in keys:
+        if key in data:
+            data[key] = _datetime_from_millis(data[key])
+    return data
+
+
+class LichessClient:
+    """
+    Non-blocking Lichess API client built on one shared, long-lived ``aiohttp.ClientSession``,
+    so requests reuse pooled keep-alive connections instead of doing a fresh TCP+TLS handshake
+    each time. Return values have the same shapes as the equivalent ``berserk.Client`` calls
+    (including converting timestamps to ``datetime.datetime``).
+
+    Every request first waits for its turn from ``governor`` (see ``R.RateGovernor``): per-endpoint
+    rate limits, slash commands (``R.Priority.INTERACTIVE``, the default) before background work,
+    and no requests at all for a minute after a 429, as Lichess asks.
+
+    Non-2xx responses raise ``aiohttp.ClientResponseError``. Requests that can't get a turn
+    within their timeout raise ``asyncio.TimeoutError``.
+
+    With a ``cache``, profiles, autocomplete results and finished games are kept on disk for
+    ``CACHE_TTL_SECONDS`` (see ``DC.DiskCache``), and revalidated with ``ETag``/``Last-Modified``
+    once stale, if Lichess sent them.
+    """
+
+    BASE_URL = 'https://lichess.org'
+
+    # Connection pool settings
+    MAX_CONNECTIONS = 20
+    KEEPALIVE_SECONDS = 60
+
+    # Most ids each endpoint accepts per request. Longer lists are split into
+    # chunks of this size, fetched at most ``MAX_CONCURRENT_CHUNKS`` at a time.
+    STATUS_MAX_IDS = 100
+    USERS_MAX_IDS = 300
+    EXPORT_MAX_IDS = 300
+    STREAM_GAMES_BY_USERS_MAX_IDS = 300
+    MAX_CONCURRENT_CHUNKS = 4
+
+    # Player autocomplete ignores shorter terms, and returns at most this many usernames
+    AUTOCOMPLETE_MIN_TERM_LENGTH = 3
+    AUTOCOMPLETE_MAX_RESULTS = 10
+
+    # (requests per second, burst) allowed for each endpoint
+    RATE_LIMITS = {
+        'status': (2.0, 5),
+        'users': (1.0, 2),
+        'user': (2.0, 5),
+        'export': (2.0, 5),
+        'tv': (1.0, 2),
+        'autocomplete': (4.0, 8),
+        'stream_game': (2.0, 5),
+        'stream_games_by_users': (0.2, 2),
+    }
+    # https://lichess.org/page/api-tips
+    RATE_LIMITED_COOLDOWN_SECONDS = 60.0
+
+    # How long responses of each endpoint are kept in ``cache`` (finished games never change)
+    CACHE_TTL_SECONDS = {
+        'user': 60 * 60.0,
+        'autocomplete': 24 * 60 * 60.0,
+        'export': 30 * 24 * 60 * 60.0,
+    }
+
+    # Per-endpoint timeouts
+    STATUS_TIMEOUT = aiohttp.ClientTimeout(total=5)
+    EXPORT_TIMEOUT = aiohttp.ClientTimeout(total=10)
+    TV_TIMEOUT = aiohttp.ClientTimeout(total=5)
+    USER_TIMEOUT = aiohttp.ClientTimeout(total=5)
+    USERS_TIMEOUT = aiohttp.ClientTimeout(total=10)
+    AUTOCOMPLETE_TIMEOUT = aiohttp.ClientTimeout(total=3)
+    # Streams stay open for a whole game, so only bound connecting
+    STREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10)
+
+    def __init__(self,
+                 base_url: str = BASE_URL,
+                 *,
+                 governor: R.RateGovernor | None = None,
+                 cache: DC.DiskCache | None = None):
+        self.base_url = base_url.rstrip('/')
+        self.governor = governor or R.RateGovernor(LichessClient.RATE_LIMITS,
+                                                   cooldown_seconds=LichessClient.RATE_LIMITED_COOLDOWN_SECONDS)
+        self.cache = cache
+        self._session: aiohttp.ClientSession | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """ Get the shared session, creating it on first use (it must be created inside the event loop). """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=LichessClient.MAX_CONNECTIONS,
+                                             keepalive_timeout=LichessClient.KEEPALIVE_SECONDS)
+            self._session = aiohttp.ClientSession(base_url=self.base_url,
+                                                  connector=connector,
+                                                  raise_for_status=True)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        if self.cache is not None:
+            await self.cache.close()
+
+    @contextlib.asynccontextmanager
+    async def _request(self,
+                       method: str,
+                       path: str,
+                       *,
+                       endpoint: str,
+                       priority: R.Priority,
+                       timeout: aiohttp.ClientTimeout,
+                       **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """ ``session.request()``, once ``governor`` gives ``endpoint`` a turn. """
+        await self.governor.acquire(endpoint, priority=priority, timeout=timeout.total)
+        try:
+            async with self._get_session().request(method, path, timeout=timeout, **kwargs) as response:
+                yield response
+        except aiohttp.ClientResponseError as e:
+            if e.status == 429:
+                self.governor.report_rate_limited()
+            raise
+
+    async def _get_json(self,
+                        path: str,
+                        *,
+                        endpoint: str,
+                        priority: R.Priority,
+                        timeout: aiohttp.ClientTimeout,
+                        params: Dict[str, str] | None = None) -> Any:
+        async with self._request('GET', path, endpoint=endpoint, priority=priority,
+                                 timeout=timeout, params=params) as response:
+            return await response.json()
+
+    async def _get_json_cached(self,
+                               path: str,
+                               *,
+                               endpoint: str,
+                               priority: R.Priority,
+                               timeout: aiohttp.ClientTimeout,
+                               params: Dict[str, str] | None = None) -> Any:
+        """ Like ``_get_json()``, but answered from ``cache`` when possible. """
+        if self.cache is None:
+            return await self._get_json(path, endpoint=endpoint, priority=priority, timeout=timeout, params=params)
+
+        key = f'GET {path}?{urllib.parse.urlencode(sorted((params or {}).items()))}'
+        body = await self.cache.fetch(key,
+                                      lambda headers: self._request('GET', path, endpoint=endpoint, priority=priority,
+                                                                    timeout=timeout, params=params, headers=headers),
+                                      ttl_seconds=LichessClient.CACHE_TTL_SECONDS[endpoint])
+        return orjson.loads(body)
+
+    @staticmethod
+    async def _fetch_chunked(fetch_chunk: Callable[..., Awaitable[List[Any]]],
+                             ids: Sequence[str],
+                             chunk_size: int) -> List[Any]:
+        """
+        Call ``fetch_chunk(*chunk)`` for each ``chunk_size``-sized chunk of ``ids`` with bounded
+        concurrency, and concatenate the results in the same order as ``ids``.
+        """
+        if not ids:
+            return []
+
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        if len(chunks) == 1:
+            return await fetch_chunk(*chunks[0])
+
+        semaphore = asyncio.Semaphore(LichessClient.MAX_CONCURRENT_CHUNKS)
+
+        async def _fetch(chunk: Sequence[str]) -> List[Any]:
+            async with semaphore:
+                return await fetch_chunk(*chunk)
+
+        results = await asyncio.gather(*(_fetch(chunk) for chunk in chunks))
+        return [item for result in results for item in result]
+
+    async def get_realtime_statuses(self,
+                                    *user_ids: str,
+                                    with_game_ids: bool = False,
+                                    priority: R.Priority = R.Priority.INTERACTIVE) -> List[Dict[str, Any]]:
+        """
+        Like ``berserk.Client().users.get_realtime_statuses()``, but for any number of ``user_ids``.
+        https://lichess.org/api#tag/Users/operation/apiUsersStatus
+        """
+        async def _fetch(*chunk: str) -> List[Dict[str, Any]]:
+            params = {'ids': ','.join(chunk)}
+            if with_game_ids:
+                params['withGameIds'] = 'true'
+            return await self._get_json('/api/users/status',
+                                        endpoint='status',
+                                        priority=priority,
+                                        params=params,
+                                        timeout=LichessClient.STATUS_TIMEOUT)
+
+        return await LichessClient._fetch_chunked(_fetch, user_ids, LichessClient.STATUS_MAX_IDS)
+
+    async def export_multi(self,
+                           *game_ids: str,
+                           moves: bool = True,
+                           priority: R.Priority = R.Priority.INTERACTIVE) -> List[Dict[str, Any]]:
+        """
+        Like ``[*berserk.Client().games.export_multi()]``, but for any number of ``game_ids``.
+        Games are returned in the same order as ``game_ids``, leaving out ones that weren't found.
+        With ``moves``, finished games are kept in ``cache``.
+        https://lichess.org/api#tag/Games/operation/gamesExportIds
+        """
+        cached_games: Dict[str, Dict[str, Any]] = {}
+        if self.cache is not None and moves:
+            cached = await self.cache.get_many(f'export {game_id}' for game_id in game_ids)
+            cached_games = {game_id: orjson.loads(cached[f'export {game_id}'].body) for game_id in game_ids
+                            if f'export {game_id}' in cached and cached[f'export {game_id}'].is_fresh}
+
+        async def _fetch(*chunk: str) -> List[Dict[str, Any]]:
+            async with self._request('POST', '/api/games/export/_ids',
+                                     endpoint='export',
+                                     priority=priority,
+                                     params={'moves': str(moves).lower()},
+                                     data=','.join(chunk),
+                                     headers={'Accept': 'application/x-ndjson'},
+                                     timeout=LichessClient.EXPORT_TIMEOUT) as response:
+                games = {g['id']: g for g in NJ.loads(await response.read())}
+            if self.cache is not None and moves:
+                for game_id, game in games.items():
+                    if game.get('status') not in LM.LIVE_GAME_STATUSES:
+                        await self.cache.put(f'export {game_id}', orjson.dumps(game),
+                                             ttl_seconds=LichessClient.CACHE_TTL_SECONDS['export'])
+            # Lichess doesn't promise to keep the order, and leaves out games it can't find
+            return [games[game_id] for game_id in chunk if game_id in games]
+
+        to_fetch = [game_id for game_id in game_ids if game_id not in cached_games]
+        fetched = {g['id']: g for g in await LichessClient._fetch_chunked(_fetch, to_fetch,
+                                                                          LichessClient.EXPORT_MAX_IDS)}
+        return [_convert_timestamps(cached_games.get(game_id) or fetched[game_id], 'createdAt', 'lastMoveAt')
+                for game_id in game_ids if game_id in cached_games or game_id in fetched]
+
+    async def get_current_tv_games(self, *, priority: R.Priority = R.Priority.INTERACTIVE) -> Dict[str, Any]:
+        """
+        Like ``berserk.Client().tv.get_current_games()``.
+        https://lichess.org/api#tag/TV/operation/tvChannels
+        """
+        return await self._get_json('/api/tv/channels',
+                                    endpoint='tv',
+                                    priority=priority,
+                                    timeout=LichessClient.TV_TIMEOUT)
+
+    async def get_public_data(self,
+                              username: str,
+                              *,
+                              priority: R.Priority = R.Priority.INTERACTIVE) -> Dict[str, Any]:
+        """
+        Like ``berserk.Client().users.get_public_data()``.
+        https://lichess.org/api#tag/Users/operation/apiUser
+        """
+        data = await self._get_json_cached(f'/api/user/{username}',
+                                           endpoint='user',
+                                           priority=priority,
+                                           timeout=LichessClient.USER_TIMEOUT)
+        return _convert_timestamps(data, 'createdAt', 'seenAt')
+
+    async def get_users_by_id(self,
+                              *usernames: str,
+                              priority: R.Priority = R.Priority.INTERACTIVE) -> List[Dict[str, Any]]:
+        """
+        Like ``berserk.Client().users.get_by_id()``, but for any number of ``usernames``:
+        public data for many users in one request, leaving out ones that don't exist.
+        https://lichess.org/api#tag/Users/operation/apiUsers
+        """
+        async def _fetch(*chunk: str) -> List[Dict[str, Any]]:
+            async with self._request('POST', '/api/users',
+                                     endpoint='users',
+                                     priority=priority,
+                                     data=','.join(chunk),
+                                     headers={'Content-Type': 'text/plain'},
+                                     timeout=LichessClient.USERS_TIMEOUT) as response:
+                users = await response.json()
+            return [_convert_timestamps(u, 'createdAt', 'seenAt') for u in users]
+
+        return await LichessClient._fetch_chunked(_fetch, usernames, LichessClient.USERS_MAX_IDS)
+
+    async def autocomplete_usernames(self,
+                                     term: str,
+                                     *,
+                                     priority: R.Priority = R.Priority.INTERACTIVE) -> List[str]:
+        """
+        Get usernames starting with ``term`` (not yet supported in berserk).
+        https://lichess.org/api#tag/Users/operation/apiPlayerAutocomplete
+        """
+        return await self._get_json_cached('/api/player/autocomplete',
+                                           endpoint='autocomplete',
+                                           priority=priority,
+                                           params={'term': term},
+                                           timeout=LichessClient.AUTOCOMPLETE_TIMEOUT)
+
+    async def stream_game(self,
+                          game_id: str,
+                          *,
+                          priority: R.Priority = R.Priority.INTERACTIVE) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield each decoded NDJSON packet of a game's move stream until the game ends, as soon
+        as it arrives.
+        https://lichess.org/api#tag/Games/operation/streamGame
+        """
+        async with self._request('GET', f'/api/stream/game/{game_id}',
+                                 endpoint='stream_game',
+                                 priority=priority,
+                                 timeout=LichessClient.STREAM_TIMEOUT) as response:
+            async for packet in NJ.iter_ndjson(response.content.iter_any()):
+                yield packet
+
+    async def stream_games_by_users(self,
+                                    *user_ids: str,
+                                    with_current_games: bool = True,
+                                    priority: R.Priority = R.Priority.INTERACTIVE) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield a packet every time a game between any of ``user_ids`` (at most
+        ``STREAM_GAMES_BY_USERS_MAX_IDS``) and anyone starts or finishes, for as long as the
+        connection stays open. With ``with_current_games``, games already being played are
+        sent first.
+        https://lichess.org/api#tag/Games/operation/gamesByUsers
+        """
+        assert len(user_ids) <= LichessClient.STREAM_GAMES_BY_USERS_MAX_IDS, \
+            f'Lichess streams games for at most {LichessClient.STREAM_GAMES_BY_USERS_MAX_IDS} users'
+        async with self._request('POST', '/api/stream/games-by-users',
+                                 endpoint='stream_games_by_users',
+                                 priority=priority,
+                                 params={'withCurrentGames': str(with_current_games).lower()},
+                                 data=','.join(user_ids),
+                                 headers={'Content-Type': 'text/plain'},
+                                 timeout=LichessClient.STREAM_TIMEOUT) as response:
+            async for packet in NJ.iter_ndjson(response.content.iter_any()):
+                yield _convert_timestamps(packet, 'createdAt')
+
+CLIENT = LichessClient(C.LICHESS_BASE_URL,
+                       cache=DC.DiskCache(C.LICHESS_CACHE_PATH, max_entries=C.LICHESS_CACHE_MAX_ENTRIES)
+                       if C.LICHESS_CACHE_PATH else None)
@@ -0,0 +1,175 @@
+"""
+Compact, immutable models of the Lichess payloads that outlive a single request: live games
+(with their players and clocks) and game stream packets.
+
+They're built once, where the JSON is parsed, and only keep the fields the bot reads, so
+a ``/watch`` that runs for the whole game doesn't keep the export's nested dicts (with every
+SAN move and its ``datetime``s) alive. Repeated strings like variant names are interned.
+"""
+
+from typing import Any, Dict
+
+import chess
+
+import dataclasses
+import sys
+
+
+# Lichess game status ids below this mean the game is still going
+# https://github.com/lichess-org/scalachess/blob/master/core/src/main/scala/Status.scala
+FIRST_FINISHED_STATUS_ID = 25
+# Exported games' ``status`` while they're still going
+LIVE_GAME_STATUSES = ('created', 'started')
+
+
+def _interned(s: str | None) -> str | None:
+    return sys.intern(s) if s is not None else None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Clock:
+    """ A game's time control, in seconds. """
+    initial: int
+    increment: int
+
+    @classmethod
+    def from_json(cls, clock_json: Dict[str, Any]) -> 'Clock':
+        return cls(initial=clock_json['initial'], increment=clock_json['increment'])
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Player:
+    """ One side of a game. """
+    name: str
+    rating: int | None = None
+    title: str | None = None
+    # Only known once a rated game is over
+    rating_diff: int | None = None
+
+    @property
+    def id(self) -> str:
+        return self.name.lower()
+
+    @classmethod
+    def from_json(cls, player_json: Dict[str, Any]) -> 'Player':
+        """ From ``players.white`` or ``players.black`` of an exported game or a stream's first/last packet. """
+        user = player_json.get('user')
+        if user is not None:
+            name = user['name']
+        elif 'aiLevel' in player_json:
+            name = f'Stockfish level {player_json["aiLevel"]}'
+        else:
+            name = 'Anonymous'
+        return cls(name=name,
+                   rating=player_json.get('rating'),
+                   title=_interned((user or {}).get('title')),
+                   rating_diff=player_json.get('ratingDiff'))
+
+
+def _players_from_json(game_json: Dict[str, Any]) -> Dict[str, Player]:
+    players = game_json.get('players', {})
+    return {'white': Player.from_json(players.get('white', {})),
+            'black': Player.from_json(players.get('black', {}))}
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class LiveGame:
+    """ A game being played, as exported by ``L.CLIENT.export_multi()`` (without the moves). """
+    id: str
+    white: Player
+    black: Player
+    variant: str = 'standard'
+    speed: str | None = None
+    rated: bool = False
+    # ``None`` for correspondence games
+    clock: Clock | None = None
+    # Only for games that didn't start from the standard position
+    initial_fen: str | None = None
+
+    @classmethod
+    def from_json(cls, game_json: Dict[str, Any]) -> 'LiveGame':
+        variant = game_json.get('variant', 'standard')
+        if isinstance(variant, dict):
+            # Stream packets describe the variant instead of just naming it
+            variant = variant['key']
+        clock_json = game_json.get('clock')
+        initial_fen = game_json.get('initialFen')
+        return cls(id=game_json['id'],
+                   **_players_from_json(game_json),
+                   variant=sys.intern(variant),
+                   speed=_interned(game_json.get('speed')),
+                   rated=game_json.get('rated', False),
+                   clock=Clock.from_json(clock_json) if clock_json is not None else None,
+                   initial_fen=initial_fen if initial_fen not in (None, 'startpos') else None)
+
+    def player(self, color: chess.Color) -> Player:
+        return self.white if color == chess.WHITE else self.black
+
+    def color_of(self, username: str) -> chess.Color:
+        """ The side ``username`` is playing (black, unless they're white). """
+        return self.white.id == username.lower()
+
+    @property
+    def max_rating(self) -> int:
+        return max(self.white.rating or 0, self.black.rating or 0)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class GameMove:
+    """ A move packet of a game stream (see ``RSM.ResumableGameStream``). Clocks are in seconds. """
+    fen: str
+    last_move: str | None = None
+    white_clock: int | None = None
+    black_clock: int | None = None
+
+    @classmethod
+    def from_json(cls, packet: Dict[str, Any]) -> 'GameMove':
+        return cls(fen=packet['fen'], last_move=packet.get('lm'),
+                   white_clock=packet.get('wc'), black_clock=packet.get('bc'))
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class GameInfo:
+    """ The first or last packet of a game stream, about the game itself. """
+    id: str
+    fen: str
+    white: Player
+    black: Player
+    status_id: int
+    status_name: str
+    last_move: str | None = None
+    # ``'white'``, ``'black'``, or ``None`` for a draw (or a game that isn't over)
+    winner: str | None = None
+    rated: bool = False
+    # Plies played when the packet was sent, and the ply the game started from
+    turns: int = 0
+    started_at_turn: int = 0
+
+    @classmethod
+    def from_json(cls, packet: Dict[str, Any]) -> 'GameInfo':
+        status = packet.get('status', {})
+        return cls(id=packet['id'],
+                   fen=packet['fen'],
+                   **_players_from_json(packet),
+                   status_id=status.get('id', 20),
+                   status_name=sys.intern(status.get('name', 'started')),
+                   last_move=packet.get('lastMove'),
+                   winner=_interned(packet.get('winner')),
+                   rated=packet.get('rated', False),
+                   turns=packet.get('turns', 0),
+                   started_at_turn=packet.get('startedAtTurn', 0))
+
+    @property
+    def is_over(self) -> bool:
+        return self.status_id >= FIRST_FINISHED_STATUS_ID
+
+    def player(self, color: chess.Color) -> Player:
+        return self.white if color == chess.WHITE else self.black
+
+
+StreamPacket = GameInfo | GameMove
+
+
+def stream_packet_from_json(packet: Dict[str, Any]) -> StreamPacket:
+    """ Whichever model fits a decoded line of a game stream. """
+    return GameInfo.from_json(packet) if 'id' in packet else GameMove.from_json(packet)
@@ -0,0 +1,129 @@
+import uvmcc.lichess_models as LM
+from uvmcc.uvmcc_logging import logger
+
+from typing import Any, Dict
+
+import chess
+
+import time
+
+
+class LiveGameState:
+    """
+    The current position of one live game, kept up to date move by move instead of being
+    rebuilt from the full move list every time it's needed.
+    """
+
+    def __init__(self, game_id: str, *, initial_fen: str = chess.STARTING_FEN, chess960: bool = False):
+        self.game_id = game_id
+        self.board = chess.Board(initial_fen, chess960=chess960)
+        self.last_move_uci: str | None = None
+        self.touched_at = time.monotonic()
+        self._initial_ply = self.board.ply()
+
+    @property
+    def board_fen(self) -> str:
+        return self.board.board_fen()
+
+    @property
+    def ply(self) -> int:
+        """ Plies played so far, counting from the standard starting position like FEN move numbers do. """
+        return self.board.ply()
+
+    def advance_to(self, sans: str):
+        """
+        Catch up with a game's full list of SAN moves (like the ``moves`` of an exported game),
+        only playing the ones that aren't on the board yet. Does nothing if this state is
+        already ahead (ex. the stream saw moves the export didn't have yet).
+        """
+        self.touched_at = time.monotonic()
+        for san in sans.split()[self.ply - self._initial_ply:]:
+            try:
+                move = self.board.push_san(san)
+            except ValueError:
+                # Ex. a variant python-chess doesn't play by standard rules
+                logger.warning(f'LiveGameState({self.game_id}): can\'t play {san!r} at ply {self.ply}, '
+                               f'board is {self.board.fen()}')
+                return
+            self.last_move_uci = move.uci()
+
+    def apply_packet(self, packet: LM.StreamPacket):
+        """
+        Update the position from a Lichess game stream packet with a correct fullmove
+        number, i.e. not one of the already-played moves replayed at the start of a stream.
+        Packets for the position already on the board or an earlier one are ignored, so
+        every subscriber of a stream can apply the same packets, even if some of them are
+        lagging behind.
+        """
+        self.touched_at = time.monotonic()
+        fen = packet.fen
+        board_fen, active_color, *_, fullmove_num = fen.split(' ')
+        packet_ply = 2 * (int(fullmove_num) - 1) + (active_color == 'b')
+        if packet_ply < self.ply or board_fen == self.board.board_fen():
+            return
+
+        last_move_uci = packet.last_move
+        if last_move_uci is not None and packet_ply == self.ply + 1:
+            try:
+                self.board.push(self.board.parse_uci(last_move_uci))
+            except ValueError:
+                pass
+            else:
+                if self.board.board_fen() == board_fen:
+                    self.last_move_uci = last_move_uci
+                    return
+                self.board.pop()
+
+        # Missed some moves: jump to the packet's position (this forgets the move stack)
+        logger.debug(f'LiveGameState({self.game_id}): resyncing to {fen}')
+        self.board.set_fen(fen)
+        self.last_move_uci = last_move_uci
+
+
+class LiveGameStates:
+    """
+    One ``LiveGameState`` per live game id, shared by every command looking at that game.
+    States that haven't been used for ``IDLE_TTL_SECONDS`` are dropped.
+    """
+
+    IDLE_TTL_SECONDS = 15 * 60
+
+    def __init__(self):
+        self._states: Dict[str, LiveGameState] = {}
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def get(self, game_id: str) -> LiveGameState | None:
+        return self._states.get(game_id)
+
+    def from_export(self, game_json: Dict[str, Any]) -> LiveGameState:
+        """
+        Get the state for an exported game (like ``L.CLIENT.export_multi()`` returns), only
+        replaying the SAN moves from the first time the game is seen.
+        """
+        return self.for_game(LM.LiveGame.from_json(game_json), game_json.get('moves', ''))
+
+    def for_game(self, game: LM.LiveGame, sans: str = '') -> LiveGameState:
+        """ Like ``from_export()``, for a game model and its SAN moves so far (if known). """
+        self._prune()
+        state = self._states.get(game.id)
+        if state is None:
+            state = self._states[game.id] \
+                = LiveGameState(game.id,
+                                initial_fen=game.initial_fen or chess.STARTING_FEN,
+                                chess960=game.variant == 'chess960')
+        state.advance_to(sans)
+        return state
+
+    def discard(self, game_id: str):
+        """ Forget the state of ``game_id`` (ex. once the game is over). """
+        self._states.pop(game_id, None)
+
+    def _prune(self):
+        now = time.monotonic()
+        self._states = {k: v for k, v in self._states.items()
+                        if now - v.touched_at < LiveGameStates.IDLE_TTL_SECONDS}
+
+
+STATES = LiveGameStates()
@@ -0,0 +1,70 @@
+from typing import Any, AsyncIterator, List
+
+import orjson
+
+
+def _is_blank(line: bytes | bytearray | memoryview) -> bool:
+    # Lichess sends empty lines as keep-alives
+    return len(line) <= 2 and not bytes(line).strip()
+
+
+class NdjsonDecoder:
+    """
+    Incrementally decode a stream of NDJSON bytes that arrives in arbitrary chunks (ex. from
+    ``aiohttp.StreamReader.iter_any()``), where one chunk may hold several lines, part of a
+    line, or both.
+
+    Complete lines are decoded with ``orjson`` straight from a view of the chunk they arrived
+    in. Only the unfinished line at the end of a chunk is copied, to be joined with the next one.
+    """
+
+    def __init__(self):
+        self._partial = bytearray()
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """ Decode every line that ``chunk`` completes, in order. """
+        values = []
+        start = 0
+        end = chunk.find(b'\n')
+
+        if self._partial and end != -1:
+            self._partial += chunk[:end]
+            if not _is_blank(self._partial):
+                values.append(orjson.loads(self._partial))
+            self._partial.clear()
+            start = end + 1
+            end = chunk.find(b'\n', start)
+
+        view = memoryview(chunk)
+        while end != -1:
+            line = view[start:end]
+            if not _is_blank(line):
+                values.append(orjson.loads(line))
+            start = end + 1
+            end = chunk.find(b'\n', start)
+
+        if start < len(chunk):
+            self._partial += view[start:]
+        return values
+
+    def finish(self) -> List[Any]:
+        """ Decode what's left once the stream is over (the last line may not end with a newline). """
+        values = [] if _is_blank(self._partial) else [orjson.loads(self._partial)]
+        self._partial.clear()
+        return values
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """ Decode and yield each value in an NDJSON byte stream as soon as its line is complete. """
+    decoder = NdjsonDecoder()
+    async for chunk in chunks:
+        for value in decoder.feed(chunk):
+            yield value
+    for value in decoder.finish():
+        yield value
+
+
+def loads(data: bytes) -> List[Any]:
+    """ Decode a whole NDJSON document, like ``ndjson.loads()``. """
+    decoder = NdjsonDecoder()
+    return decoder.feed(data) + decoder.finish()
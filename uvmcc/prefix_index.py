@@ -0,0 +1,77 @@
+from typing import Dict, List, Set, Iterable, Tuple
+
+import bisect
+
+
+class UsernamePrefixIndex:
+    """
+    Case-insensitive prefix index over chess usernames, backed by a sorted array of
+    lowercased usernames searched with ``bisect``. Each username also maps to the set
+    of sites it's registered for, so autocomplete callbacks for both the username and
+    the site can be answered without touching the database.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str]] = ()):
+        # Sorted, lowercased usernames
+        self._keys: List[str] = []
+        # Lowercased username -> (username with its original capitalization, sites)
+        self._entries: Dict[str, Tuple[str, Set[str]]] = {}
+
+        self.rebuild(entries)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, username: str) -> bool:
+        return username.lower() in self._entries
+
+    def rebuild(self, entries: Iterable[Tuple[str, str]]):
+        """ Replace the whole index with the given ``(username, site)`` pairs. """
+        self._entries = {}
+        for username, site in entries:
+            k = username.lower()
+            if k in self._entries:
+                self._entries[k][1].add(site)
+            else:
+                self._entries[k] = (username, {site})
+        self._keys = sorted(self._entries)
+
+    def add(self, username: str, site: str):
+        k = username.lower()
+        entry = self._entries.get(k)
+        if entry is None:
+            self._entries[k] = (username, {site})
+            bisect.insort(self._keys, k)
+        else:
+            # Keep the most recently seen capitalization
+            self._entries[k] = (username, entry[1] | {site})
+
+    def remove(self, username: str, site: str | None = None):
+        """ Remove ``username`` for the given ``site``, or for all sites if ``site`` is ``None``. """
+        k = username.lower()
+        entry = self._entries.get(k)
+        if entry is None:
+            return
+
+        sites = entry[1] - {site} if site is not None else set()
+        if sites:
+            self._entries[k] = (entry[0], sites)
+            return
+
+        del self._entries[k]
+        del self._keys[bisect.bisect_left(self._keys, k)]
+
+    def complete(self, prefix: str, *, limit: int | None = None) -> List[str]:
+        """ Get up to ``limit`` usernames that start with ``prefix`` (case-insensitive), sorted. """
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._keys, prefix)
+        # Every key starting with ``prefix`` sorts below ``prefix`` + the highest code point
+        end = bisect.bisect_left(self._keys, prefix + '\U0010ffff', lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return [self._entries[k][0] for k in self._keys[start:end]]
+
+    def sites(self, username: str) -> List[str]:
+        """ Get the sites ``username`` is registered for (exact, case-insensitive match). """
+        entry = self._entries.get(username.lower())
+        return sorted(entry[1]) if entry is not None else []
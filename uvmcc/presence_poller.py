@@ -0,0 +1,175 @@
+import uvmcc.constants as C
+import uvmcc.lichess_api as L
+import uvmcc.rate_limit as R
+import uvmcc.roster_utils as RU
+from uvmcc.uvmcc_logging import logger
+
+from typing import Any, Awaitable, Callable, Collection, Dict, List, NamedTuple
+
+import aiohttp
+import asyncio
+import time
+
+
+StatusJson = Dict[str, Any]
+
+PLAYING = 'playing'
+ONLINE = 'online'
+OFFLINE = 'offline'
+
+
+async def _fetch_from_lichess(*user_ids: str) -> List[StatusJson]:
+    return await L.CLIENT.get_realtime_statuses(*user_ids, with_game_ids=True,
+                                                priority=R.Priority.BACKGROUND)
+
+
+def presence_of(status: StatusJson | None) -> str:
+    if status is None:
+        return OFFLINE
+    if status.get('playing'):
+        return PLAYING
+    return ONLINE if status.get('online') else OFFLINE
+
+
+class PresenceTransition(NamedTuple):
+    """ Someone's presence changing between two snapshots (``before`` is ``None`` if they're new). """
+    username: str
+    before: str | None
+    after: str
+    status: StatusJson | None
+    game_id: str | None = None
+
+
+class PresenceSnapshot:
+    """ Statuses of the whole roster as of one poll. Never modified once made. """
+
+    def __init__(self, version: int, statuses: Dict[str, StatusJson | None]):
+        self.version = version
+        self.taken_at = time.monotonic()
+        # Lowercased username -> status, or ``None`` if there's no such Lichess user
+        self.statuses = statuses
+
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.taken_at
+
+    def covers(self, usernames: Collection[str]) -> bool:
+        return all(u.lower() in self.statuses for u in usernames)
+
+    def statuses_for(self, usernames: Collection[str]) -> List[StatusJson]:
+        """ Like ``SC.CACHE.get_statuses(*usernames)``, for usernames in the snapshot. """
+        statuses = (self.statuses[k] for k in dict.fromkeys(u.lower() for u in usernames))
+        return [s for s in statuses if s is not None]
+
+    def diff(self, previous: 'PresenceSnapshot | None') -> List[PresenceTransition]:
+        """ Everyone whose presence (or live game) is different than in ``previous``. """
+        transitions = []
+        for k, status in self.statuses.items():
+            after = presence_of(status)
+            game_id = (status or {}).get('playingId')
+            if previous is not None and k in previous.statuses:
+                before = presence_of(previous.statuses[k])
+                if before == after and (previous.statuses[k] or {}).get('playingId') == game_id:
+                    continue
+            else:
+                before = None
+            transitions.append(PresenceTransition(username=status['name'] if status is not None else k,
+                                                  before=before,
+                                                  after=after,
+                                                  status=status,
+                                                  game_id=game_id))
+        return transitions
+
+
+class PresencePoller:
+    """
+    Polls the realtime statuses of everyone in ``chess_usernames`` every ``interval_seconds``
+    (``/api/users/status``, in ``L.LichessClient.STATUS_MAX_IDS``-sized batches), as a fallback
+    for what Lichess doesn't push.
+
+    Each poll makes a new versioned ``PresenceSnapshot``, so commands can answer straight from
+    ``snapshot`` without waiting on Lichess. Listeners added with ``add_listener()`` are called
+    with the transitions (ex. offline -> playing) between each snapshot and the one before.
+    """
+
+    # Snapshots older than this many intervals (ex. Lichess is down) aren't used
+    MAX_AGE_INTERVALS = 3
+
+    def __init__(self,
+                 fetch: Callable[..., Awaitable[List[StatusJson]]] = _fetch_from_lichess,
+                 roster: Callable[[], Awaitable[Collection[str]]] = RU.lichess_roster,
+                 *,
+                 interval_seconds: float = C.PRESENCE_POLL_SECONDS):
+        self._fetch = fetch
+        self._roster_source = roster
+        self.interval_seconds = interval_seconds
+
+        self.snapshot: PresenceSnapshot | None = None
+        self._task: asyncio.Task | None = None
+        self._listeners = RU.Listeners('PresencePoller')
+
+        self.polls = 0
+        self.failures = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {'polls': self.polls,
+                'failures': self.failures,
+                'version': self.snapshot.version if self.snapshot is not None else 0,
+                'age_seconds': self.snapshot.age_seconds if self.snapshot is not None else None}
+
+    def start(self):
+        """ Start polling, if not already (call inside the event loop). """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.wait({self._task})
+            self._task = None
+
+    def add_listener(self, listener: Callable[[List[PresenceTransition]], Awaitable[Any]]):
+        self._listeners.add(listener)
+
+    def snapshot_for(self, usernames: Collection[str]) -> PresenceSnapshot | None:
+        """ The latest snapshot, if it's recent enough and has all of ``usernames``. """
+        snapshot = self.snapshot
+        if snapshot is None \
+                or snapshot.age_seconds > PresencePoller.MAX_AGE_INTERVALS * self.interval_seconds \
+                or not snapshot.covers(usernames):
+            return None
+        return snapshot
+
+    async def _run(self):
+        while True:
+            started_at = time.monotonic()
+            try:
+                await self.poll()
+            except Exception as e:
+                # Ex. the roster couldn't be loaded, or a status was malformed. The next poll may work.
+                self.failures += 1
+                logger.error(f'PresencePoller: poll failed ({type(e).__name__}: {e})')
+            await asyncio.sleep(max(0.0, self.interval_seconds - (time.monotonic() - started_at)))
+
+    async def poll(self) -> List[PresenceTransition]:
+        """ Take a new snapshot now, and return the transitions since the last one. """
+        usernames = list(dict.fromkeys(u.lower() for u in await self._roster_source()))
+        self.polls += 1
+        try:
+            found = {s['id']: s for s in await self._fetch(*usernames)} if usernames else {}
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.failures += 1
+            logger.error(f'PresencePoller: failed to get {len(usernames)} statuses '
+                         f'({type(e).__name__}: {e})')
+            return []
+
+        previous = self.snapshot
+        self.snapshot = PresenceSnapshot(previous.version + 1 if previous is not None else 1,
+                                         {k: found.get(k) for k in usernames})
+        transitions = self.snapshot.diff(previous)
+        if transitions and previous is not None:
+            self._listeners.notify(transitions)
+        return transitions
+
+
+POLLER = PresencePoller()
@@ -0,0 +1,174 @@
+from typing import Any, Dict, List, Tuple
+
+import asyncio
+import enum
+import heapq
+import itertools
+import time
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to ``capacity`` tokens and refills at ``rate`` tokens
+    per second. Each operation spends one token (or more), so bursts of up to ``capacity``
+    are allowed but the long-run rate can't exceed ``rate``.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def seconds_until_available(self, tokens: float = 1) -> float:
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """ Spend ``tokens`` if there are enough right now, without waiting. """
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1):
+        """ Wait until ``tokens`` are available, then spend them. """
+        while not self.try_acquire(tokens):
+            await asyncio.sleep(self.seconds_until_available(tokens))
+
+
+class Priority(enum.IntEnum):
+    """ Who goes first when several requests are waiting for the same endpoint (lowest first). """
+    INTERACTIVE = 0  # Someone is waiting on a slash command
+    BACKGROUND = 1   # Polling, prefetching, etc.
+
+
+class _EndpointGate:
+    """ One endpoint's bucket, the requests waiting on it (in priority order), and its metrics. """
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        # Heap of (priority, arrival order); only the first one may take a token
+        self.waiting: List[Tuple[int, int]] = []
+        self.changed = asyncio.Event()
+
+        self.acquired = 0
+        self.timed_out = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.max_depth = 0
+
+    def notify(self):
+        """ Wake everyone waiting, so they check whether it's their turn. """
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class RateGovernor:
+    """
+    One place to throttle every request to an API, so heavy use degrades into waiting (or
+    failing fast) instead of getting the bot rate-limited or banned:
+
+    - Each endpoint has its own ``TokenBucket``, and every request spends one token.
+    - Requests waiting on the same endpoint get tokens in ``Priority`` order, then first come
+      first served, so slash commands overtake background polling.
+    - After a 429 (``report_rate_limited()``), no request goes out for ``cooldown_seconds``.
+    - Requests with a ``timeout`` raise ``asyncio.TimeoutError`` as soon as it's clear they
+      won't get a token in time (ex. during a cool-down), rather than waiting it out.
+    """
+
+    def __init__(self,
+                 limits: Dict[str, Tuple[float, float]],
+                 *,
+                 default_limit: Tuple[float, float] = (1.0, 1.0),
+                 cooldown_seconds: float = 60.0):
+        """ ``limits`` maps each endpoint name to its bucket's ``(rate, capacity)``. """
+        self.limits = limits
+        self.default_limit = default_limit
+        self.cooldown_seconds = cooldown_seconds
+
+        self._gates: Dict[str, _EndpointGate] = {}
+        self._arrivals = itertools.count()
+        self._cooldown_until = 0.0
+        self.rate_limited = 0
+
+    @property
+    def cooldown_remaining(self) -> float:
+        return max(0.0, self._cooldown_until - time.monotonic())
+
+    def report_rate_limited(self):
+        """ Call when the API answers 429 Too Many Requests. """
+        self.rate_limited += 1
+        self._cooldown_until = time.monotonic() + self.cooldown_seconds
+        for gate in self._gates.values():
+            gate.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'rate_limited': self.rate_limited,
+                'cooldown_remaining': self.cooldown_remaining,
+                'endpoints': {endpoint: {'acquired': gate.acquired,
+                                         'timed_out': gate.timed_out,
+                                         'queue_depth': len(gate.waiting),
+                                         'max_queue_depth': gate.max_depth,
+                                         'mean_wait_seconds': gate.total_wait_seconds / max(1, gate.acquired),
+                                         'max_wait_seconds': gate.max_wait_seconds}
+                              for endpoint, gate in self._gates.items()}}
+
+    def _gate(self, endpoint: str) -> _EndpointGate:
+        gate = self._gates.get(endpoint)
+        if gate is None:
+            rate, capacity = self.limits.get(endpoint, self.default_limit)
+            gate = self._gates[endpoint] = _EndpointGate(TokenBucket(rate, capacity))
+        return gate
+
+    async def acquire(self,
+                      endpoint: str,
+                      *,
+                      priority: Priority = Priority.INTERACTIVE,
+                      timeout: float | None = None):
+        """ Wait for a turn to send a request to ``endpoint``. """
+        gate = self._gate(endpoint)
+        entry = (priority, next(self._arrivals))
+        heapq.heappush(gate.waiting, entry)
+        gate.max_depth = max(gate.max_depth, len(gate.waiting))
+        if gate.waiting[0] == entry:
+            # Jumped the queue, so whoever was first has to check again
+            gate.notify()
+
+        started_at = time.monotonic()
+        deadline = started_at + timeout if timeout is not None else None
+        try:
+            while True:
+                changed = gate.changed
+                delay = None
+                if gate.waiting[0] == entry:
+                    delay = max(self.cooldown_remaining, gate.bucket.seconds_until_available())
+                    if delay <= 0 and gate.bucket.try_acquire():
+                        break
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if (delay or 0) > remaining:
+                        gate.timed_out += 1
+                        raise asyncio.TimeoutError(f'No turn for {endpoint!r} within {timeout}s')
+                    if delay is None:
+                        delay = remaining
+
+                try:
+                    await asyncio.wait_for(changed.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            gate.waiting.remove(entry)
+            heapq.heapify(gate.waiting)
+            gate.notify()
+
+        waited = time.monotonic() - started_at
+        gate.acquired += 1
+        gate.total_wait_seconds += waited
+        gate.max_wait_seconds = max(gate.max_wait_seconds, waited)
@@ -0,0 +1,137 @@
+import uvmcc.lichess_api as L
+import uvmcc.lichess_models as LM
+from uvmcc.uvmcc_logging import logger
+
+from typing import Any, AsyncIterator, Callable, Dict, Tuple
+
+import aiohttp
+import asyncio
+import random
+
+
+StreamItemT = Tuple[LM.StreamPacket, bool | None]
+
+
+def _stream_from_lichess(game_id: str) -> AsyncIterator[Dict[str, Any]]:
+    return L.CLIENT.stream_game(game_id)
+
+
+def _is_retryable(e: BaseException) -> bool:
+    if isinstance(e, aiohttp.ClientResponseError):
+        # Not found, etc. won't get better by asking again
+        return e.status == 429 or e.status >= 500
+    return isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError))
+
+
+class ResumableGameStream:
+    """
+    A Lichess game stream that survives dropped connections. Iterating over it yields
+    ``(packet, is_new_move)`` items, with the packets as ``LM.GameInfo`` (first and last,
+    where ``is_new_move`` is ``None``) and ``LM.GameMove`` models. ``is_new_move`` says
+    whether the move was played after the stream started. If the connection drops
+    (or Lichess closes it) before the game is over, it reconnects with jittered exponential
+    backoff and picks up where it left off.
+
+    Lichess replays every move of a game at the start of each connection. Moves are counted
+    by ply, and the ones already yielded are skipped, so nothing is yielded twice. Moves
+    played while we were disconnected are yielded as new moves. Already-played moves also
+    get their fullmove number fixed (https://github.com/lichess-org/lila/issues/12907).
+
+    Gives up (raising the last error) after ``MAX_CONSECUTIVE_FAILURES`` reconnects in a row
+    that don't yield anything new.
+    """
+
+    MIN_BACKOFF_SECONDS = 0.5
+    MAX_BACKOFF_SECONDS = 30.0
+    MAX_CONSECUTIVE_FAILURES = 8
+
+    def __init__(self,
+                 game_id: str,
+                 packets_factory: Callable[[str], AsyncIterator[Dict[str, Any]]] = _stream_from_lichess):
+        self.game_id = game_id
+        self._packets_factory = packets_factory
+
+        # Ply (moves from the start of the game, including ``startedAtTurn``) of the last move yielded
+        self.last_ply: int | None = None
+        self.finished = False
+        self.reconnects = 0
+        self.resent_skipped = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'reconnects': self.reconnects,
+                'resent_skipped': self.resent_skipped,
+                'last_ply': self.last_ply}
+
+    def __aiter__(self) -> AsyncIterator[StreamItemT]:
+        return self._items()
+
+    async def _items(self) -> AsyncIterator[StreamItemT]:
+        backoff = ResumableGameStream.MIN_BACKOFF_SECONDS
+        failures = 0
+        sent_first_packet = False
+        while True:
+            last_ply_before = self.last_ply
+            try:
+                async for item in self._connection_items(sent_first_packet):
+                    sent_first_packet = True
+                    yield item
+                if self.finished:
+                    return
+                # Lichess closed the stream, but the game isn't over
+                error: BaseException = ConnectionResetError('Stream closed before the game ended')
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                error = e
+
+            if self.last_ply != last_ply_before:
+                # That connection got somewhere, so it's not a repeated failure
+                failures = 0
+                backoff = ResumableGameStream.MIN_BACKOFF_SECONDS
+            failures += 1
+            if failures > ResumableGameStream.MAX_CONSECUTIVE_FAILURES:
+                logger.error(f'ResumableGameStream: giving up on {self.game_id} after {failures - 1} reconnects')
+                raise error
+
+            delay = backoff * random.uniform(0.5, 1.0)
+            logger.warning(f'ResumableGameStream: stream of {self.game_id} dropped at ply {self.last_ply} '
+                           f'({type(error).__name__}: {error}), reconnecting in {delay:.1f}s')
+            await asyncio.sleep(delay)
+            backoff = min(2 * backoff, ResumableGameStream.MAX_BACKOFF_SECONDS)
+            self.reconnects += 1
+
+    async def _connection_items(self, resuming: bool) -> AsyncIterator[StreamItemT]:
+        """ Label the packets of one connection, leaving out what earlier connections yielded. """
+        info = None
+        ply = 0
+        async for packet in self._packets_factory(self.game_id):
+            if info is None:
+                # First packet, about the game. ``turns`` is how many plies were played when we connected.
+                info = LM.GameInfo.from_json(packet)
+                ply = info.started_at_turn
+                if info.is_over:
+                    # Finished while we weren't connected, so this is the last packet too
+                    self.finished = True
+                    yield info, None
+                    return
+                if not resuming:
+                    yield info, None
+                continue
+            if 'id' in packet:
+                # Last packet, the game is over
+                self.finished = True
+                yield LM.GameInfo.from_json(packet), None
+                return
+
+            ply += 1
+            if self.last_ply is not None and ply <= self.last_ply:
+                self.resent_skipped += 1
+                continue
+
+            already_played = ply <= info.turns
+            if already_played:
+                fen = packet['fen']
+                packet['fen'] = fen[:fen.rindex(' ') + 1] + str(ply // 2 + 1)
+            self.last_ply = ply
+            # Moves we missed while reconnecting are new to whoever is following along
+            yield LM.GameMove.from_json(packet), not already_played or resuming
@@ -0,0 +1,273 @@
+import uvmcc.export_batcher as EB
+import uvmcc.lichess_api as L
+import uvmcc.lichess_models as LM
+import uvmcc.rate_limit as R
+import uvmcc.roster_utils as RU
+from uvmcc.uvmcc_logging import logger
+
+from typing import Any, AsyncIterator, Awaitable, Callable, Collection, Dict, List, Set
+
+import aiohttp
+import asyncio
+import random
+import time
+
+
+GameJson = Dict[str, Any]
+
+
+def _stream_from_lichess(*user_ids: str) -> AsyncIterator[GameJson]:
+    return L.CLIENT.stream_games_by_users(*user_ids, with_current_games=True,
+                                           priority=R.Priority.BACKGROUND)
+
+
+async def _export_from_lichess(*game_ids: str) -> List[GameJson]:
+    return await EB.BATCHER.export(*game_ids, moves=False, priority=R.Priority.BACKGROUND)
+
+
+class RosterGameStream:
+    """
+    Which Lichess users in ``chess_usernames`` are playing right now, pushed by Lichess instead
+    of polled per command.
+
+    One long-lived ``/api/stream/games-by-users`` connection follows the whole roster (up to
+    ``L.LichessClient.STREAM_GAMES_BY_USERS_MAX_IDS`` users) and keeps a table of their live
+    games. Every game is exported once when it starts, and kept as an ``LM.LiveGame``. The roster is re-read every
+    ``roster_check_seconds``, and the stream reconnects when it changes; when the connection
+    fails, it reconnects with jittered exponential backoff.
+
+    Listeners added with ``add_listener()`` are called with each game that starts while the
+    stream is up (not ones that were already going when it connected for the first time).
+    """
+
+    ROSTER_CHECK_SECONDS = 10.0
+    # Lichess sends games already being played right after connecting, but doesn't say
+    # when it's done, so the table is trusted once the connection has been up this long
+    SETTLE_SECONDS = 2.0
+    MIN_BACKOFF_SECONDS = 1.0
+    MAX_BACKOFF_SECONDS = 60.0
+
+    def __init__(self,
+                 stream_factory: Callable[..., AsyncIterator[GameJson]] = _stream_from_lichess,
+                 export: Callable[..., Awaitable[List[GameJson]]] = _export_from_lichess,
+                 roster: Callable[[], Awaitable[Collection[str]]] = RU.lichess_roster,
+                 *,
+                 roster_check_seconds: float = ROSTER_CHECK_SECONDS,
+                 settle_seconds: float = SETTLE_SECONDS):
+        self._stream_factory = stream_factory
+        self._export = export
+        self._roster_source = roster
+        self.roster_check_seconds = roster_check_seconds
+        self.settle_seconds = settle_seconds
+
+        # Lowercased usernames the current connection follows
+        self._roster: frozenset[str] = frozenset()
+        # Game id -> exported game, for every live game that's been exported
+        self._games: Dict[str, LM.LiveGame] = {}
+        # Lowercased username -> id of the live game they're playing
+        self._game_ids_by_user: Dict[str, str] = {}
+        # Live games that haven't been exported yet
+        self._to_export: Set[str] = set()
+        # Live games that were already going, or already announced
+        self._seen_game_ids: Set[str] = set()
+
+        self._settled_at: float | None = None
+        self._settled_once = False
+        self._task: asyncio.Task | None = None
+        self._export_task: asyncio.Task | None = None
+        self._listeners = RU.Listeners('RosterGameStream')
+
+        self.connects = 0
+        self.roster_changes = 0
+        self.failures = 0
+        self.games_started = 0
+        self.games_finished = 0
+        self.exports = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'connects': self.connects,
+                'roster_changes': self.roster_changes,
+                'failures': self.failures,
+                'games_started': self.games_started,
+                'games_finished': self.games_finished,
+                'exports': self.exports,
+                'roster': len(self._roster),
+                'live_games': len(self._game_ids_by_user)}
+
+    @property
+    def is_live(self) -> bool:
+        """ Whether the table is up to date with Lichess, as far as we know. """
+        return self._settled_at is not None
+
+    def start(self):
+        """ Start following the roster, if not already (call inside the event loop). """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._export_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.wait({task})
+        self._task = self._export_task = None
+        self._settled_at = None
+
+    def add_listener(self, listener: Callable[[LM.LiveGame], Awaitable[Any]]):
+        self._listeners.add(listener)
+
+    def games_for(self, usernames: Collection[str]) -> Dict[str, LM.LiveGame] | None:
+        """
+        Get the live game of everyone in ``usernames`` who's playing, by lowercased username, or
+        ``None`` if the table can't answer for all of them (not connected yet, or some aren't
+        on the roster). Games that are still being exported are left out.
+        """
+        keys = [u.lower() for u in usernames]
+        if not self.is_live or not self._roster.issuperset(keys):
+            return None
+        games = {}
+        for k in keys:
+            game = self._games.get(self._game_ids_by_user.get(k))
+            if game is not None:
+                games[k] = game
+        return games
+
+    async def _read_roster(self) -> frozenset[str]:
+        usernames = sorted({u.lower() for u in await self._roster_source()})
+        if len(usernames) > L.LichessClient.STREAM_GAMES_BY_USERS_MAX_IDS:
+            logger.warning(f'RosterGameStream: only following the first '
+                           f'{L.LichessClient.STREAM_GAMES_BY_USERS_MAX_IDS} of {len(usernames)} users')
+        return frozenset(usernames[:L.LichessClient.STREAM_GAMES_BY_USERS_MAX_IDS])
+
+    async def _run(self):
+        backoff = RosterGameStream.MIN_BACKOFF_SECONDS
+        while True:
+            roster = await self._read_roster()
+            if not roster:
+                self._follow_nobody()
+                await asyncio.sleep(self.roster_check_seconds)
+                continue
+
+            connection = asyncio.create_task(self._follow(roster))
+            connected_at = time.monotonic()
+            roster_changed = False
+            try:
+                while not connection.done():
+                    await asyncio.wait({connection}, timeout=self.roster_check_seconds)
+                    if not connection.done() and await self._read_roster() != roster:
+                        roster_changed = True
+                        connection.cancel()
+                        await asyncio.wait({connection})
+            finally:
+                # Also when we're stopped
+                connection.cancel()
+                await asyncio.wait({connection})
+
+            self._settled_at = None
+            if roster_changed:
+                self.roster_changes += 1
+                logger.debug('RosterGameStream: roster changed, reconnecting')
+                continue
+
+            if connection.exception() is not None:
+                self.failures += 1
+                e = connection.exception()
+                logger.error(f'RosterGameStream: stream FAILED: {type(e).__name__}: {e}')
+            else:
+                logger.warning('RosterGameStream: stream closed by Lichess')
+
+            # A connection that stayed up for a while was healthy, so start backing off from scratch
+            if time.monotonic() - connected_at > RosterGameStream.MAX_BACKOFF_SECONDS:
+                backoff = RosterGameStream.MIN_BACKOFF_SECONDS
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.0))
+            backoff = min(2 * backoff, RosterGameStream.MAX_BACKOFF_SECONDS)
+
+    def _follow_nobody(self):
+        self._roster = frozenset()
+        self._games.clear()
+        self._game_ids_by_user.clear()
+        self._to_export.clear()
+        self._settled_at = time.monotonic()
+        self._settled_once = True
+
+    async def _follow(self, roster: frozenset[str]):
+        """ Follow one connection's packets until it closes. """
+        self.connects += 1
+        self._roster = roster
+        self._settled_at = None
+        # Lichess resends every current game on connecting
+        previous_game_ids = set(self._game_ids_by_user.values())
+        self._games.clear()
+        self._game_ids_by_user.clear()
+        self._to_export.clear()
+
+        settle = asyncio.get_running_loop().call_later(self.settle_seconds, self._settle, previous_game_ids)
+        try:
+            async for packet in self._stream_factory(*sorted(roster)):
+                self._on_packet(packet, roster)
+        finally:
+            settle.cancel()
+
+    def _settle(self, previous_game_ids: Set[str]):
+        self._settled_at = time.monotonic()
+        self._settled_once = True
+        # Forget games that finished before the last connection (and maybe while we weren't connected)
+        self._seen_game_ids &= set(self._game_ids_by_user.values()) | previous_game_ids
+
+    def _on_packet(self, packet: GameJson, roster: frozenset[str]):
+        game_id = packet['id']
+        players = [p.get('userId', '').lower() for p in packet.get('players', {}).values()]
+
+        if packet.get('status', 0) >= LM.FIRST_FINISHED_STATUS_ID:
+            self.games_finished += 1
+            self._games.pop(game_id, None)
+            self._to_export.discard(game_id)
+            self._seen_game_ids.discard(game_id)
+            for user_id in players:
+                if self._game_ids_by_user.get(user_id) == game_id:
+                    del self._game_ids_by_user[user_id]
+            return
+
+        self.games_started += 1
+        if not self._settled_once:
+            # Already going when we first connected, so not announced
+            self._seen_game_ids.add(game_id)
+        for user_id in players:
+            if user_id in roster:
+                self._game_ids_by_user[user_id] = game_id
+        if game_id not in self._games:
+            self._to_export.add(game_id)
+            if self._export_task is None or self._export_task.done():
+                self._export_task = asyncio.create_task(self._export_pending())
+
+    async def _export_pending(self):
+        """ Export the games that just started, all at once. """
+        # Let the rest of a burst of packets arrive first
+        await asyncio.sleep(0)
+        while self._to_export:
+            game_ids = sorted(self._to_export)
+            self.exports += 1
+            try:
+                games = await self._export(*game_ids)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f'RosterGameStream: failed to export {len(game_ids)} live games '
+                             f'({type(e).__name__}: {e})')
+                await asyncio.sleep(RosterGameStream.MIN_BACKOFF_SECONDS)
+                continue
+
+            # Leave out games that finished or stopped being followed in the meantime, and
+            # ones Lichess couldn't find (ex. aborted right away)
+            live_game_ids = set(self._game_ids_by_user.values())
+            self._to_export.difference_update(game_ids)
+            for game_json in games:
+                if game_json['id'] in live_game_ids:
+                    game = self._games[game_json['id']] = LM.LiveGame.from_json(game_json)
+                    self._announce(game)
+
+    def _announce(self, game: LM.LiveGame):
+        if game.id in self._seen_game_ids:
+            return
+        self._seen_game_ids.add(game.id)
+        self._listeners.notify(game, about=f'game {game.id}')
+
+
+ROSTER = RosterGameStream()
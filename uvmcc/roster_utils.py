@@ -0,0 +1,47 @@
+import uvmcc.database_utils as D
+import uvmcc.username_cache as UC
+import uvmcc.utils as U
+from uvmcc.uvmcc_logging import logger
+
+from typing import Any, Awaitable, Callable, Collection, List, Set
+
+import asyncio
+
+
+async def lichess_roster() -> Collection[str]:
+    """ Lichess usernames in ``chess_usernames``, or none if the table can't be loaded. """
+    if await UC.CACHE.ensure_loaded() != D.QueryExitCode.SUCCESS:
+        return []
+    return UC.CACHE.usernames(site=U.SupportedSites.LICHESS)
+
+
+class Listeners:
+    """
+    Callbacks of a background follower of the roster (ex. ``RS.ROSTER``). ``notify()`` calls
+    each one in its own task, so a slow listener doesn't hold up the follower, and a failing
+    one is logged instead of raising.
+    """
+
+    def __init__(self, owner: str):
+        # Name of whoever notifies, for the logs
+        self.owner = owner
+        self._listeners: List[Callable[..., Awaitable[Any]]] = []
+        self._tasks: Set[asyncio.Task] = set()
+
+    def add(self, listener: Callable[..., Awaitable[Any]]):
+        self._listeners.append(listener)
+
+    def notify(self, *args, about: str | None = None):
+        """ Call every listener with ``args``. ``about`` says what it's about in failure logs. """
+        for listener in self._listeners:
+            task = asyncio.create_task(self._call(listener, args, about))
+            # Keep a reference until it's done, so it isn't garbage collected
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _call(self, listener: Callable[..., Awaitable[Any]], args: tuple, about: str | None):
+        try:
+            await listener(*args)
+        except Exception as e:
+            logger.error(f'{self.owner}: listener {listener.__qualname__} FAILED'
+                         f'{" for " + about if about is not None else ""}: {type(e).__name__}: {e}')
@@ -0,0 +1,125 @@
+import uvmcc.chess_com_api as CC
+import uvmcc.constants as C
+import uvmcc.lichess_api as L
+from uvmcc.uvmcc_logging import logger
+
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import asyncio
+import time
+
+
+StatusJson = Dict[str, Any]
+
+
+async def _fetch_from_lichess(*user_ids: str) -> List[StatusJson]:
+    return await L.CLIENT.get_realtime_statuses(*user_ids, with_game_ids=True)
+
+
+async def _fetch_from_chess_com(*usernames: str) -> List[StatusJson]:
+    """ Chess.com profiles, in the same shape as Lichess statuses (never ``playing``, see ``CC.is_online()``). """
+    return [{'id': p['username'], 'name': CC.proper_username(p), 'online': CC.is_online(p)}
+            for p in await CC.CLIENT.get_players(*usernames)]
+
+
+class RealtimeStatusCache:
+    """
+    Short-lived cache of Lichess realtime user statuses (``/api/users/status`` with game ids),
+    keyed per username so overlapping rosters share entries.
+
+    Concurrent lookups are coalesced (single-flight): if a username is already being fetched,
+    later callers wait on that request instead of starting their own, so N simultaneous
+    ``/show`` calls for the same roster cost about one upstream request.
+
+    ``CHESS_COM_CACHE`` does the same for Chess.com members, with statuses built from their profiles.
+    """
+
+    def __init__(self,
+                 fetch: Callable[..., Awaitable[List[StatusJson]]] = _fetch_from_lichess,
+                 *,
+                 ttl_seconds: float = C.REALTIME_STATUS_TTL_SECONDS):
+        self._fetch = fetch
+        self.ttl_seconds = ttl_seconds
+
+        # Lowercased username -> (time.monotonic() when fetched, status or ``None`` if no such user)
+        self._entries: Dict[str, Tuple[float, StatusJson | None]] = {}
+        # Lowercased username -> the upstream request that will resolve it
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'upstream_calls': self.upstream_calls,
+                'size': len(self._entries)}
+
+    def invalidate(self, *usernames: str):
+        """ Forget the cached statuses for ``usernames``, or for everyone if none are given. """
+        if not usernames:
+            self._entries.clear()
+        for username in usernames:
+            self._entries.pop(username.lower(), None)
+
+    async def get_statuses(self, *usernames: str) -> List[StatusJson]:
+        """
+        Like ``L.CLIENT.get_realtime_statuses(*usernames, with_game_ids=True)``: get the statuses
+        in the same order as ``usernames`` (without duplicates), leaving out ones that don't exist.
+        """
+        now = time.monotonic()
+        statuses: Dict[str, StatusJson | None] = {}
+        waiting_on: Dict[str, asyncio.Task] = {}
+        to_fetch: List[str] = []
+
+        keys = list(dict.fromkeys(u.lower() for u in usernames))
+        for k in keys:
+            entry = self._entries.get(k)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                self.hits += 1
+                statuses[k] = entry[1]
+            elif k in self._in_flight:
+                self.coalesced += 1
+                waiting_on[k] = self._in_flight[k]
+            else:
+                self.misses += 1
+                to_fetch.append(k)
+
+        if to_fetch:
+            # Run the request in its own task, so one caller being cancelled
+            # doesn't fail everyone else who's waiting on it
+            task = asyncio.create_task(self._fetch_and_store(to_fetch))
+            for k in to_fetch:
+                self._in_flight[k] = task
+                waiting_on[k] = task
+
+        for task in set(waiting_on.values()):
+            fetched = await asyncio.shield(task)
+            statuses.update((k, fetched[k]) for k in waiting_on if waiting_on[k] is task)
+
+        logger.debug(f'RealtimeStatusCache.get_statuses(): {len(keys)} usernames, stats={self.stats()}')
+        return [statuses[k] for k in keys if statuses[k] is not None]
+
+    async def _fetch_and_store(self, keys: List[str]) -> Dict[str, StatusJson | None]:
+        try:
+            self.upstream_calls += 1
+            response = await self._fetch(*keys)
+        finally:
+            for k in keys:
+                self._in_flight.pop(k, None)
+
+        fetched: Dict[str, StatusJson | None] = dict.fromkeys(keys)
+        fetched.update((s['id'].lower(), s) for s in response)
+
+        now = time.monotonic()
+        self._entries = {k: v for k, v in self._entries.items() if now - v[0] < self.ttl_seconds}
+        self._entries.update((k, (now, v)) for k, v in fetched.items())
+
+        return fetched
+
+
+CACHE = RealtimeStatusCache()
+CHESS_COM_CACHE = RealtimeStatusCache(_fetch_from_chess_com)
@@ -0,0 +1,151 @@
+import uvmcc.resumable_stream as RSM
+from uvmcc.uvmcc_logging import logger
+
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Set
+
+import asyncio
+
+
+StreamItemT = RSM.StreamItemT
+
+# Put in subscriber queues when the upstream stream ends
+_END = object()
+
+
+class UpstreamFailed(Exception):
+    """ Raised by ``GameStreamHub.subscribe()`` when the shared upstream stream fails (see ``__cause__``). """
+
+
+class _GameStream:
+    """ One upstream stream for a game, and the queues of everyone subscribed to it. """
+
+    def __init__(self, game_id: str):
+        self.game_id = game_id
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.latest: StreamItemT | None = None
+        self.task: asyncio.Task | None = None
+        self.upstream: AsyncIterable[StreamItemT] | None = None
+
+        # How far behind subscribers fell
+        self.items = 0
+        self.dropped = 0
+        self.max_queue_depth = 0
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {'items': self.items,
+                 'dropped': self.dropped,
+                 'max_queue_depth': self.max_queue_depth}
+        if hasattr(self.upstream, 'stats'):
+            stats.update(self.upstream.stats())
+        return stats
+
+
+class GameStreamHub:
+    """
+    Keep exactly one upstream Lichess game stream per game id, no matter how many ``/watch``
+    commands are following it, and fan its items out to every subscriber.
+
+    Each subscriber has its own bounded queue. A subscriber that falls behind loses its
+    oldest queued items rather than holding up the others (and the end of the stream is
+    always delivered), so reading from Lichess never waits on Discord. Late joiners
+    immediately get the latest item seen so far. The upstream stream is closed as soon as
+    its last subscriber leaves. If it fails, every subscriber gets ``UpstreamFailed``
+    instead of the end of the stream.
+
+    By default, upstreams are ``RSM.ResumableGameStream``s, so a dropped connection doesn't
+    end the stream for everyone.
+    """
+
+    SUBSCRIBER_QUEUE_SIZE = 32
+
+    def __init__(self,
+                 stream_factory: Callable[[str], AsyncIterable[StreamItemT]] = RSM.ResumableGameStream):
+        self._stream_factory = stream_factory
+        self._streams: Dict[str, _GameStream] = {}
+
+        self.upstreams_opened = 0
+        self.dropped = 0
+        self.max_queue_depth = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'upstreams_opened': self.upstreams_opened,
+                'upstreams': len(self._streams),
+                'dropped': self.dropped,
+                'max_queue_depth': self.max_queue_depth}
+
+    def num_subscribers(self, game_id: str) -> int:
+        stream = self._streams.get(game_id)
+        return len(stream.subscribers) if stream is not None else 0
+
+    @property
+    def num_upstreams(self) -> int:
+        return len(self._streams)
+
+    async def subscribe(self, game_id: str) -> AsyncIterator[StreamItemT]:
+        """
+        Yield the same ``(packet, is_new_move)`` items as iterating over
+        ``RSM.ResumableGameStream(game_id)``, from a stream shared with every other subscriber
+        to ``game_id``. Raises ``UpstreamFailed`` if that stream fails.
+        """
+        stream = self._streams.get(game_id)
+        if stream is None:
+            stream = self._streams[game_id] = _GameStream(game_id)
+            self.upstreams_opened += 1
+            stream.task = asyncio.create_task(self._pump(stream))
+            logger.debug(f'GameStreamHub: opened upstream for {game_id}')
+
+        queue = asyncio.Queue(maxsize=GameStreamHub.SUBSCRIBER_QUEUE_SIZE)
+        if stream.latest is not None:
+            queue.put_nowait(stream.latest)
+        stream.subscribers.add(queue)
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise UpstreamFailed(f'Stream of {game_id} failed') from item
+                yield item
+        finally:
+            stream.subscribers.discard(queue)
+            if not stream.subscribers and self._streams.get(game_id) is stream:
+                del self._streams[game_id]
+                stream.task.cancel()
+                logger.debug(f'GameStreamHub: closed upstream for {game_id} (no subscribers left): {stream.stats()}')
+
+    async def _pump(self, stream: _GameStream):
+        stream.upstream = self._stream_factory(stream.game_id)
+        # What subscribers get last: the end of the stream, or the error it failed with
+        end: Any = _END
+        try:
+            async for item in stream.upstream:
+                stream.latest = item
+                stream.items += 1
+                for queue in stream.subscribers:
+                    self._put_dropping_oldest(stream, queue, item)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f'GameStreamHub: upstream for {stream.game_id} FAILED: {type(e).__name__}. '
+                         f'Stack trace:\n{e}')
+            end = e
+        finally:
+            if self._streams.get(stream.game_id) is stream:
+                del self._streams[stream.game_id]
+
+        logger.debug(f'GameStreamHub: upstream for {stream.game_id} ended: {stream.stats()}')
+        for queue in stream.subscribers:
+            self._put_dropping_oldest(stream, queue, end)
+
+    def _put_dropping_oldest(self, stream: _GameStream, queue: asyncio.Queue, item: Any):
+        if queue.full():
+            queue.get_nowait()
+            stream.dropped += 1
+            self.dropped += 1
+        queue.put_nowait(item)
+        stream.max_queue_depth = max(stream.max_queue_depth, queue.qsize())
+        self.max_queue_depth = max(self.max_queue_depth, queue.qsize())
+
+
+HUB = GameStreamHub()
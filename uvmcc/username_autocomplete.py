@@ -0,0 +1,149 @@
+import uvmcc.constants as C
+import uvmcc.database_utils as D
+import uvmcc.lichess_api as L
+import uvmcc.username_cache as UC
+from uvmcc.uvmcc_logging import logger
+
+from typing import Awaitable, Callable, Dict, Hashable, List, Tuple
+
+import aiohttp
+import asyncio
+import collections
+import time
+
+
+async def _fetch_from_lichess(term: str) -> List[str]:
+    return await L.CLIENT.autocomplete_usernames(term)
+
+
+class UsernameAutocompleter:
+    """
+    Lichess username suggestions for ``/add``, as someone types.
+
+    - Requests are debounced per Discord user: a new keystroke cancels that user's pending or
+      in-flight request, so only the latest prefix is looked up and stale responses are dropped.
+    - Results are kept in an LRU cache with a TTL, keyed by prefix. A result with fewer than
+      ``L.LichessClient.AUTOCOMPLETE_MAX_RESULTS`` names is every match for its prefix, so
+      longer prefixes are answered by filtering it instead of asking Lichess again.
+    - Matching usernames already in our database (``UC.CACHE``) are listed first.
+    """
+
+    DEBOUNCE_SECONDS = 0.15
+    MAX_CACHED_PREFIXES = 1024
+
+    def __init__(self,
+                 fetch: Callable[[str], Awaitable[List[str]]] = _fetch_from_lichess,
+                 *,
+                 ttl_seconds: float = C.USERNAME_AUTOCOMPLETE_TTL_SECONDS,
+                 debounce_seconds: float = DEBOUNCE_SECONDS,
+                 max_cached_prefixes: int = MAX_CACHED_PREFIXES):
+        self._fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self.debounce_seconds = debounce_seconds
+        self.max_cached_prefixes = max_cached_prefixes
+
+        # Lowercased prefix -> (time.monotonic() when fetched, usernames), least recently used first
+        self._entries: collections.OrderedDict[str, Tuple[float, List[str]]] = collections.OrderedDict()
+        # Whoever is typing -> their pending lookup
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+        self.hits = 0
+        self.filtered_hits = 0
+        self.misses = 0
+        self.superseded = 0
+        self.upstream_calls = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits,
+                'filtered_hits': self.filtered_hits,
+                'misses': self.misses,
+                'superseded': self.superseded,
+                'upstream_calls': self.upstream_calls,
+                'size': len(self._entries)}
+
+    async def complete(self, prefix: str, *, user_key: Hashable = None) -> List[str]:
+        """
+        Get up to ``C.DISCORD_MAX_AUTOCOMPLETE_CHOICES`` usernames starting with ``prefix``:
+        ones in our database first, then ones from Lichess. ``user_key`` identifies who is
+        typing (ex. their Discord id), so their superseded lookups can be cancelled.
+        """
+        prefix = prefix.strip()
+        remote = await self._remote_matches(prefix, user_key=user_key)
+
+        local = []
+        if await UC.CACHE.ensure_loaded() == D.QueryExitCode.SUCCESS:
+            local = UC.CACHE.complete_username(prefix, limit=C.DISCORD_MAX_AUTOCOMPLETE_CHOICES)
+
+        merged: Dict[str, str] = {}
+        for username in [*local, *remote]:
+            merged.setdefault(username.lower(), username)
+        return [*merged.values()][:C.DISCORD_MAX_AUTOCOMPLETE_CHOICES]
+
+    def _cached(self, key: str) -> List[str] | None:
+        """ Get the cached usernames for ``key``, or derive them from a complete shorter prefix. """
+        now = time.monotonic()
+        for n in range(len(key), L.LichessClient.AUTOCOMPLETE_MIN_TERM_LENGTH - 1, -1):
+            entry = self._entries.get(key[:n])
+            if entry is None:
+                continue
+            fetched_at, usernames = entry
+            if now - fetched_at >= self.ttl_seconds:
+                del self._entries[key[:n]]
+                continue
+            if n == len(key):
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return usernames
+            if len(usernames) < L.LichessClient.AUTOCOMPLETE_MAX_RESULTS:
+                self.filtered_hits += 1
+                self._entries.move_to_end(key[:n])
+                return [u for u in usernames if u.lower().startswith(key)]
+        return None
+
+    def _store(self, key: str, usernames: List[str]):
+        self._entries[key] = (time.monotonic(), usernames)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_cached_prefixes:
+            self._entries.popitem(last=False)
+
+    async def _remote_matches(self, prefix: str, *, user_key: Hashable) -> List[str]:
+        previous = self._in_flight.pop(user_key, None)
+        if previous is not None and not previous.done():
+            previous.cancel()
+
+        key = prefix.lower()
+        if len(key) < L.LichessClient.AUTOCOMPLETE_MIN_TERM_LENGTH:
+            return []
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        self.misses += 1
+        task = self._in_flight[user_key] = asyncio.create_task(self._debounced_fetch(prefix, key))
+        try:
+            # Wait without propagating the lookup's cancellation, so a superseded
+            # request just comes back empty (Discord ignores it anyway)
+            await asyncio.wait({task})
+        finally:
+            if self._in_flight.get(user_key) is task:
+                del self._in_flight[user_key]
+
+        if task.cancelled():
+            self.superseded += 1
+            return []
+        e = task.exception()
+        if isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError)):
+            logger.error(f'UsernameAutocompleter: failed to get suggestions for {prefix!r} from Lichess '
+                         f'({type(e).__name__}: {e})')
+            return []
+        return task.result()  # Raises any other exception
+
+    async def _debounced_fetch(self, prefix: str, key: str) -> List[str]:
+        await asyncio.sleep(self.debounce_seconds)
+        self.upstream_calls += 1
+        usernames = await self._fetch(prefix)
+        self._store(key, usernames)
+        return usernames
+
+
+AUTOCOMPLETER = UsernameAutocompleter()
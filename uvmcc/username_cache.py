@@ -0,0 +1,210 @@
+import uvmcc.database_utils as D
+from uvmcc.prefix_index import UsernamePrefixIndex
+from uvmcc.uvmcc_logging import logger
+
+from typing import Callable, Dict, List, NamedTuple, Iterable, Tuple
+
+import discord
+
+import asyncio
+import functools
+
+
+class ChessUsernameRecord(NamedTuple):
+    """ One row of the ``chess_usernames`` table. """
+    username: str
+    site: str
+    guild_id: str | None = None
+    discord_id: str | None = None
+
+
+def _key(s: str) -> str:
+    """ ``username`` and ``site`` are CITEXT columns, so index them case-insensitively. """
+    return s.lower()
+
+
+def _record_key(username: str, site: str) -> Tuple[str, str]:
+    """ The table's primary key is ``(username, site)``, since a handle can be on more than one site. """
+    return _key(username), _key(site)
+
+
+class ChessUsernamesCache:
+    """
+    Process-local, read-through copy of the ``chess_usernames`` table, indexed by
+    ``(username, site)``, by ``discord_id``, by site and by username prefix (for autocomplete).
+
+    The table is loaded from the database on the first read. After that, reads are
+    served from memory: the cogs that write to ``chess_usernames`` must update the
+    cache in the same step (see ``put()``/``discard()``), and ``reconcile()`` should
+    be called periodically to pick up any edits made outside of the bot.
+    """
+
+    def __init__(self):
+        self._by_key: Dict[Tuple[str, str], ChessUsernameRecord] = {}
+        self._by_discord_id: Dict[str, Dict[Tuple[str, str], ChessUsernameRecord]] = {}
+        self._by_site: Dict[str, Dict[str, ChessUsernameRecord]] = {}
+        self._prefix_index = UsernamePrefixIndex()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        # Writes made while a load's query is running, or ``None`` if no load is.
+        # The query may have read the table before they happened, so they're re-applied after.
+        self._writes_during_load: List[Callable[[], None]] | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def ensure_loaded(self,
+                            *,
+                            auto_respond_on_fail: discord.ApplicationContext | None = None) -> D.QueryExitCode:
+        """
+        Load the table from the database if that hasn't happened yet. Concurrent callers
+        share a single query.
+        """
+        if self._loaded:
+            return D.QueryExitCode.SUCCESS
+
+        async with self._load_lock:
+            if self._loaded:
+                return D.QueryExitCode.SUCCESS
+            return await self._load(auto_respond_on_fail=auto_respond_on_fail)
+
+    async def reconcile(self) -> D.QueryExitCode:
+        """
+        Re-read the whole table and replace the cached copy, logging any rows that
+        changed without going through the cache (ex. manual edits to the database).
+        ``put()``/``discard()`` calls made while the table is being read are applied
+        again on top, since the read may predate them.
+        """
+        async with self._load_lock:
+            return await self._load(log_changes=True)
+
+    async def _load(self,
+                    *,
+                    auto_respond_on_fail: discord.ApplicationContext | None = None,
+                    log_changes: bool = False) -> D.QueryExitCode:
+        self._writes_during_load = []
+        try:
+            exit_code, results = await D.db_query('SELECT username, site, guild_id, discord_id '
+                                                  'FROM chess_usernames',
+                                                  auto_respond_on_fail=auto_respond_on_fail)
+        finally:
+            writes, self._writes_during_load = self._writes_during_load, None
+        if exit_code != D.QueryExitCode.SUCCESS:
+            logger.error('ChessUsernamesCache: failed to load chess_usernames')
+            return exit_code
+
+        before = dict(self._by_key)
+        self._replace_all(ChessUsernameRecord(*row) for row in results)
+        for write in writes:
+            write()
+        self._loaded = True
+
+        if log_changes and before != self._by_key:
+            added = self._by_key.keys() - before.keys()
+            removed = before.keys() - self._by_key.keys()
+            changed = {k for k in self._by_key.keys() & before.keys() if self._by_key[k] != before[k]}
+            logger.info(f'ChessUsernamesCache.reconcile(): out-of-band changes to chess_usernames '
+                        f'(added={sorted(added)}, removed={sorted(removed)}, changed={sorted(changed)})')
+
+        return exit_code
+
+    def _replace_all(self, records: Iterable[ChessUsernameRecord]):
+        self._by_key.clear()
+        self._by_discord_id.clear()
+        self._by_site.clear()
+        for record in records:
+            self._index(record)
+        self._prefix_index.rebuild((r.username, r.site) for r in self._by_key.values())
+
+    def _index(self, record: ChessUsernameRecord):
+        k = _record_key(record.username, record.site)
+        self._by_key[k] = record
+        self._by_site.setdefault(_key(record.site), {})[_key(record.username)] = record
+        if record.discord_id is not None:
+            self._by_discord_id.setdefault(record.discord_id, {})[k] = record
+
+    def _unindex(self, record: ChessUsernameRecord):
+        k = _record_key(record.username, record.site)
+        del self._by_key[k]
+
+        site_records = self._by_site[_key(record.site)]
+        del site_records[_key(record.username)]
+        if not site_records:
+            del self._by_site[_key(record.site)]
+
+        if record.discord_id is not None:
+            discord_id_records = self._by_discord_id[record.discord_id]
+            del discord_id_records[k]
+            if not discord_id_records:
+                del self._by_discord_id[record.discord_id]
+
+    ''' Writes - call these right after the matching database write succeeds '''
+
+    def put(self, record: ChessUsernameRecord):
+        """ Insert or replace the cached row for ``(record.username, record.site)``. """
+        self._apply(functools.partial(self._put, record))
+
+    def discard(self, username: str, site: str | None = None):
+        """ Remove the cached row for ``(username, site)`` (or ``username`` on every site), if any. """
+        self._apply(functools.partial(self._discard, username, site))
+
+    def _apply(self, write: Callable[[], None]):
+        write()
+        if self._writes_during_load is not None:
+            self._writes_during_load.append(write)
+
+    def _put(self, record: ChessUsernameRecord):
+        old = self._by_key.get(_record_key(record.username, record.site))
+        if old is not None:
+            self._unindex(old)
+            self._prefix_index.remove(old.username, old.site)
+        self._index(record)
+        self._prefix_index.add(record.username, record.site)
+
+    def _discard(self, username: str, site: str | None):
+        sites = [site] if site is not None else self._prefix_index.sites(username)
+        for s in sites:
+            old = self._by_key.get(_record_key(username, s))
+            if old is not None:
+                self._unindex(old)
+                self._prefix_index.remove(old.username, old.site)
+
+    ''' Reads - only meaningful once ``ensure_loaded()`` has succeeded '''
+
+    def get(self, username: str, site: str) -> ChessUsernameRecord | None:
+        return self._by_key.get(_record_key(username, site))
+
+    def records(self,
+                *,
+                site: str | None = None,
+                discord_id: str | None = None) -> List[ChessUsernameRecord]:
+        """ Get the cached rows matching all the given filters, sorted by username. """
+        if discord_id is not None:
+            records = self._by_discord_id.get(discord_id, {}).values()
+            if site is not None:
+                records = (r for r in records if _key(r.site) == _key(site))
+        elif site is not None:
+            records = self._by_site.get(_key(site), {}).values()
+        else:
+            records = self._by_key.values()
+
+        return sorted(records, key=lambda r: _record_key(r.username, r.site))
+
+    def usernames(self,
+                  *,
+                  site: str | None = None,
+                  discord_id: str | None = None) -> List[str]:
+        """ Get the cached usernames matching all the given filters, sorted. """
+        return [r.username for r in self.records(site=site, discord_id=discord_id)]
+
+    def complete_username(self, prefix: str, *, limit: int | None = None) -> List[str]:
+        """ Get up to ``limit`` cached usernames starting with ``prefix`` (case-insensitive), sorted. """
+        return self._prefix_index.complete(prefix, limit=limit)
+
+    def sites_for(self, username: str) -> List[str]:
+        """ Get the sites ``username`` is cached for (exact, case-insensitive match). """
+        return self._prefix_index.sites(username)
+
+
+CACHE = ChessUsernamesCache()
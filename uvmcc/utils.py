@@ -1,15 +1,10 @@
 import uvmcc.constants as C
-import uvmcc.FenUtils as F
+import uvmcc.lichess_models as LM
 
-from typing import Tuple, Any, Sequence, Iterable, Dict, AsyncIterator, TypedDict, NotRequired
-
-import chess
-import chess.pgn
+from typing import Any, Sequence, Iterable
 
 import enum
 import itertools
-import aiohttp
-import ndjson
 import random
 import datetime
 
@@ -20,15 +15,6 @@ class SupportedSites(enum.StrEnum):
 SUPPORTED_SITES_LIST = [*SupportedSites]
 
 
-class ClockJson(TypedDict):
-    """
-    Game clock description (following Lichess API's output).
-    """
-    initial: int
-    increment: int
-    totalTime: NotRequired[int]
-
-
 def random_code(length: int,
                 *,
                 alphabet: str = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ') -> str:
@@ -53,32 +39,32 @@ def format_discord_relative_time(unix_time: int | float = datetime.datetime.now(
         unix_time += td.total_seconds()
     return f'<t:{round(unix_time)}:R>'
 
-def format_lichess_time_control(clock_json: ClockJson) -> str:
+def format_lichess_time_control(clock: LM.Clock) -> str:
     """
-    Get a string like "5+3" from the Lichess API's clock description JSON format.
+    Get a string like "5+3" from a Lichess game's clock.
     For times where ``initial`` is less than 60 seconds are formatted as a fraction
     (¼, ½, or ¾) and raise an error if ``initial`` is not equal to 3 or not divisible
     by 15.
 
     Examples:
-    >>> format_lichess_time_control({'initial': 300, 'increment': 3})
+    >>> format_lichess_time_control(LM.Clock(initial=300, increment=3))
     '5+3'
-    >>> format_lichess_time_control({'initial': 180, 'increment': 2})
+    >>> format_lichess_time_control(LM.Clock(initial=180, increment=2))
     '3+2'
-    >>> format_lichess_time_control({'initial': 45, 'increment': 0})
+    >>> format_lichess_time_control(LM.Clock(initial=45, increment=0))
     '¾+0'
-    >>> format_lichess_time_control({'initial': 3, 'increment': 1})
+    >>> format_lichess_time_control(LM.Clock(initial=3, increment=1))
     '0+1'
-    >>> format_lichess_time_control({'initial': 20, 'increment': 0})
+    >>> format_lichess_time_control(LM.Clock(initial=20, increment=0))
     Traceback (most recent call last):
     ...
-    ValueError: Invalid initial time. clock_json:
-    {'initial': 20, 'increment': 0}
-    >>> format_lichess_time_control({'initial': 15, 'increment': 0})
+    ValueError: Invalid initial time. clock:
+    Clock(initial=20, increment=0)
+    >>> format_lichess_time_control(LM.Clock(initial=15, increment=0))
     '¼+0'
     """
-    init = clock_json['initial']
-    incr = clock_json['increment']
+    init = clock.initial
+    incr = clock.increment
 
     if init < 60:
         if init == 3:
@@ -91,7 +77,7 @@ def format_lichess_time_control(clock_json: ClockJson) -> str:
         elif init == 45:
             return f'¾+{incr}'
         else:
-            raise ValueError(f'Invalid initial time. clock_json:\n{clock_json}')
+            raise ValueError(f'Invalid initial time. clock:\n{clock}')
     else:
         # Integer-divide only if initial is a multiple of 60
         return f'{init // 60 if init % 60 == 0 else init / 60}+{incr}'
@@ -104,102 +90,6 @@ def is_valid_discord_tag(maybe_tag: str) -> bool:
     import re
     return bool(re.match(re.compile('^.{2,32}#[0-9]{4}$'), maybe_tag))
 
-def get_board_image_url(fen: str,
-                        *,
-                        orientation: chess.COLOR_NAMES = chess.COLOR_NAMES[chess.WHITE],
-                        last_move_uci: str = None,
-                        size: int = 360) -> str:
-    """
-    Return a URL for a PNG image of a chess board with the given ``fen`` highlighting the last move (optional).
-    Uses [web-boardimage](https://github.com/niklasf/web-boardimage).
-    """
-
-    # Validate that fen is possible
-    # TODO use instead ex. ``constants._temp_board``
-    b = chess.Board(fen)
-
-    # Truncate FEN to just the board layout part
-    fen_trunc = b.board_fen()
-
-    # TODO - what happens if we change 'png' to 'svg'?
-    return f'https://backscattering.de/web-boardimage/board.png' \
-           f'?fen={fen_trunc}' \
-           f'&orientation={orientation}' \
-           f'{"&lastMove=" + last_move_uci if last_move_uci is not None else ""}' \
-           f'&size={size}'
-
-async def stream_moves_lichess(game_id: str = None) -> AsyncIterator[Tuple[Dict[str, Any], bool | None]]:
-    """
-    Asynchronously stream incoming moves of a live game on Lichess by its ``game_id``.
-    Yields both the game data and a ``bool`` (or ``None``, for the first and last packets)
-    indicating if the data is about a "new" move, i.e. one that was after the first API
-    call was made.
-    https://lichess.org/api#tag/Games/operation/streamGame
-    """
-    async with aiohttp.ClientSession(raise_for_status=False) as session:
-        async with session.get(f'https://lichess.org/api/stream/game/{game_id}') as r:
-            # TODO Currently there's a bug in this endpoint where the fullmove number
-            #      in the FEN is `1` for every already-played move. New moves (played
-            #      after the request is made) get the correct fullmove number, and the
-            #      initial and final packets seem to both also have the correct number.
-            #      Only fix currently is manually keeping track of fullmove number.
-            #      https://github.com/lichess-org/lila/issues/12907
-            actual_current_fullmove_num: int = 0  # pre-increments below
-            past_already_played_moves: bool = False
-
-            async for i, packet in aenumerate(r.content):
-                packet = ndjson.loads(packet)[0]
-                if i == 0:
-                    # First packet
-                    assert 'id' in packet, f'error: "game_id" not in first ndjson line: {packet}'
-                    # TODO: keep this for when API bug fixed
-                    # live_fullmove_num = int(F.FenUtils.get_component(packet['fen'],
-                    #                                                  F.FenComponent.FULLMOVE_NUM,
-                    #                                                  validate=False))
-                    yield packet, None
-                    continue
-                elif 'id' in packet:
-                    # Last packet
-                    yield packet, None
-                    break
-
-                if past_already_played_moves:
-                    # Fullmove number should be correct here, we can abandon
-                    # keeping ``actual_current_fullmove_num`` updated
-                    yield packet, True
-                    continue
-
-                fen = packet['fen']
-                if F.FenUtils.get_component(fen,
-                                            F.FenComponent.FULLMOVE_NUM,
-                                            validate=False) != '1':
-                    past_already_played_moves = True
-                    continue
-
-                # Fullmove number needs correcting
-                if F.FenUtils.get_component(fen,
-                                            F.FenComponent.ACTIVE_COLOR,
-                                            validate=False) == 'w':
-                    actual_current_fullmove_num += 1
-
-                idx = F.FenUtils.index_of_component_start(fen,
-                                                          F.FenComponent.FULLMOVE_NUM,
-                                                          validate=False)
-                packet['fen'] = fen[:idx] + str(actual_current_fullmove_num)
-
-                yield packet, False
-
-async def aenumerate(asequence: AsyncIterator[Any] | aiohttp.StreamReader,
-                     start: int = 0) -> AsyncIterator[Tuple[int, Any]]:
-    """
-    Asynchronously enumerate an async iterator from a given start value.
-    https://gist.github.com/tebeka/8c6b0589f5783bc4115a?permalink_comment_id=4247109#gistcomment-4247109
-    """
-    n = start
-    async for elem in asequence:
-        yield n, elem
-        n += 1
-
 def to_fullmoves(*, ply: int) -> int:
     """
     Convert the ``ply`` to its fullmove number. Note that plies are 0-indexed in ``python-chess``